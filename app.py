@@ -1,8 +1,13 @@
 import streamlit as st
 import pandas as pd
 from pathlib import Path
-import unicodedata
 import os
+from ingestion import APP_COLUMNS, load_matches, match_files, unify_categories
+from artifacts import ARTIFACTS_DIRNAME, load_artifact
+from match_cache import MatchCache
+from team_form import TeamMatchTable
+from head_to_head import H2HIndex
+from team_names import TeamNameResolver
 
 # --- CONFIGURACIÓN INICIAL ---
 st.set_page_config(page_title="Analista Pro 25/26", layout="wide", page_icon="⚽")
@@ -72,42 +77,60 @@ def get_data_dir():
     elif Path("datos").exists(): return Path("datos")
     return None
 
+def prepare_processed(df, prepare):
+    # La tabla procesada concatena todos los CSV: se aplica `prepare` a cada archivo de origen
+    # (Season es el nombre del archivo) y se descartan las columnas vacías, que en la carga
+    # por archivo no existirían
+    parts = []
+    for season, d in df.groupby('Season', observed=True, sort=False):
+        d = d.drop(columns='Season').dropna(axis=1, how='all')
+        parts.append(prepare(Path(f"{season}.csv"), d))
+    return unify_categories(pd.concat(parts, ignore_index=True))
+
 @st.cache_data
 def load_all_matches():
     data_dir = get_data_dir()
     if data_dir is None: return pd.DataFrame()
-    files = list(data_dir.glob("*.csv"))
-    files = [f for f in files if "jugadores" not in f.name]
+    files = match_files(data_dir)
     
     if not files: return pd.DataFrame()
+    
+    def prepare(f, d):
+        # DETECCIÓN DE DIVISIÓN POR NOMBRE DE ARCHIVO
+        # Si el archivo se llama SP1.csv es Primera, SP2.csv es Segunda
+        if "SP1" in f.name:
+            d['Div'] = 'SP1'
+        elif "SP2" in f.name:
+            d['Div'] = 'SP2'
+        elif 'Div' not in d.columns:
+            d['Div'] = 'SP1' # Fallback
         
-    dfs = []
-    for f in files:
-        try:
-            d = pd.read_csv(f, encoding='latin1')
-            d.columns = [c.strip() for c in d.columns]
-            
-            # DETECCIÓN DE DIVISIÓN POR NOMBRE DE ARCHIVO
-            # Si el archivo se llama SP1.csv es Primera, SP2.csv es Segunda
-            if "SP1" in f.name:
-                d['Div'] = 'SP1'
-            elif "SP2" in f.name:
-                d['Div'] = 'SP2'
-            elif 'Div' not in d.columns:
-                d['Div'] = 'SP1' # Fallback
-            
-            if 'Date' in d.columns:
-                d['Date'] = pd.to_datetime(d['Date'], dayfirst=True, errors='coerce')
-            
-            # Asegurar columnas estadísticas
-            for col in ['HS','AS','HST','AST','HC','AC','HF','AF','HY','AY']:
-                if col not in d.columns: d[col] = 0
-            
-            dfs.append(d)
-        except: continue
+        # Asegurar columnas estadísticas
+        for col in ['HS','AS','HST','AST','HC','AC','HF','AF','HY','AY']:
+            if col not in d.columns: d[col] = 0
         
-    if not dfs: return pd.DataFrame()
-    return pd.concat(dfs, ignore_index=True).sort_values('Date', ascending=True)
+        return d
+    
+    # Tabla precalculada por el modo batch (python data_processor.py --batch) si sigue al día
+    df = load_artifact(data_dir / ARTIFACTS_DIRNAME, 'partidos', columns=APP_COLUMNS + ['Season'], sources=files)
+    if df is not None and not df.empty:
+        return prepare_processed(df, prepare).sort_values('Date', ascending=True)
+    
+    # Lectura en paralelo de las columnas que usa la app, desde la caché Arrow (solo se relee lo que cambia)
+    df = load_matches(files, columns=APP_COLUMNS, cache=MatchCache(data_dir / ".cache"), transform=prepare)
+    if df.empty: return df
+    return df.sort_values('Date', ascending=True)
+
+@st.cache_resource
+def load_team_table(_df, n_rows, last_date):
+    # Una fila por equipo y partido, construida una vez por conjunto de datos (n_rows y last_date
+    # identifican la carga; el DataFrame no se hashea)
+    return TeamMatchTable(_df)
+
+@st.cache_resource
+def load_h2h_index(_df, n_rows, last_date):
+    # Pareja de equipos -> partidos; las tablas H2H formateadas se guardan dentro del índice
+    return H2HIndex(_df)
 
 @st.cache_data
 def load_players():
@@ -125,34 +148,16 @@ def load_players():
         return df
     except: return pd.DataFrame()
 
-# --- UTILIDADES ---
-def normalize_str(s):
-    if not isinstance(s, str): return str(s)
-    return ''.join(c for c in unicodedata.normalize('NFD', s.lower()) if unicodedata.category(c) != 'Mn')
-
-def fuzzy_match_team(team_name, df_players):
-    if team_name is None: return None
-    if df_players.empty or 'team' not in df_players.columns: return None
-    
-    # 1. Busqueda por Mapeo Directo (Prioridad Máxima)
-    if team_name in TEAM_MAPPING:
-        target = normalize_str(TEAM_MAPPING[team_name])
-    else:
-        target = normalize_str(team_name)
-    
-    player_teams = df_players['team'].dropna().unique()
-    
-    # 2. Búsqueda exacta
-    for t in player_teams:
-        if normalize_str(t) == target: return t
-        
-    # 3. Búsqueda parcial
-    for t in player_teams:
-        norm = normalize_str(t)
-        if target in norm or norm in target: return t
-            
-    return None
+@st.cache_resource
+def load_team_resolver(_df_matches, _df_players, n_matches, n_players):
+    # Nombre de los partidos -> equipo del fichero de jugadores, resuelto una vez por carga
+    match_teams = pd.concat([_df_matches['HomeTeam'], _df_matches['AwayTeam']]).astype('object').unique() if not _df_matches.empty else []
+    player_teams = _df_players['team'].dropna().unique() if 'team' in _df_players.columns else []
+    resolver = TeamNameResolver(match_teams, player_teams, aliases=TEAM_MAPPING)
+    resolver.report()
+    return resolver
 
+# --- UTILIDADES ---
 def generate_streak_html(results):
     html = ""
     for r in results:
@@ -162,53 +167,8 @@ def generate_streak_html(results):
         html += f"<span class='{color}'>{r}</span> "
     return html
 
-def get_advanced_form(df, team, games=5, filter_mode='Auto'):
-    if df.empty or team is None: return None
-    
-    # Filtro: Usamos los partidos cargados ordenados
-    df_curr = df.sort_values('Date', ascending=True)
-    
-    if filter_mode == 'Home': matches = df_curr[df_curr['HomeTeam'] == team]
-    elif filter_mode == 'Away': matches = df_curr[df_curr['AwayTeam'] == team]
-    else: matches = df_curr[(df_curr['HomeTeam'] == team) | (df_curr['AwayTeam'] == team)]
-    
-    matches = matches.sort_values('Date', ascending=True).tail(games)
-    
-    if matches.empty: return None
-    
-    stats = {'gf': [], 'ga': [], 'sh': [], 'sot': [], 'corn': [], 'card': [], 'foul': [], 'res': []}
-    log = []
-
-    for _, r in matches.iterrows():
-        is_home = (r['HomeTeam'] == team)
-        opp = r['AwayTeam'] if is_home else r['HomeTeam']
-        d_str = r['Date'].strftime("%d/%m")
-        
-        if is_home:
-            gf, ga = r['FTHG'], r['FTAG']; sh, sot = r['HS'], r['HST']
-            co, ca, fo = r['HC'], r['HY'], r['HF']; tag = "(C)"
-        else:
-            gf, ga = r['FTAG'], r['FTHG']; sh, sot = r['AS'], r['AST']
-            co, ca, fo = r['AC'], r['AY'], r['AF']; tag = "(F)"
-            
-        res = '✅' if gf > ga else ('❌' if gf < ga else '➖')
-        
-        stats['gf'].append(gf); stats['ga'].append(ga)
-        stats['sh'].append(sh); stats['sot'].append(sot)
-        stats['corn'].append(co); stats['card'].append(ca); stats['foul'].append(fo)
-        stats['res'].append(res)
-        log.append(f"{d_str} {res} {int(gf)}-{int(ga)} vs {opp} {tag}")
-
-    c = len(matches)
-    return {
-        'gf': sum(stats['gf'])/c, 'ga': sum(stats['ga'])/c,
-        'sh': sum(stats['sh'])/c, 'sot': sum(stats['sot'])/c,
-        'corn': sum(stats['corn'])/c, 'card': sum(stats['card'])/c, 
-        'foul': sum(stats['foul'])/c, 'log': log, 'raw_results': stats['res']
-    }
-
-def get_player_rankings(df_players, team_name):
-    real_team = fuzzy_match_team(team_name, df_players)
+def get_player_rankings(df_players, team_name, resolver):
+    real_team = resolver.player_team(team_name)
     if not real_team: return None, None, None
     
     df_p = df_players[df_players['team'] == real_team].copy()
@@ -230,21 +190,6 @@ def get_player_rankings(df_players, team_name):
     
     return scorers, shooters, bad_boys
 
-def get_h2h_history(df, t1, t2):
-    if t1 is None or t2 is None: return None
-    mask = ((df['HomeTeam'] == t1) & (df['AwayTeam'] == t2)) | ((df['HomeTeam'] == t2) & (df['AwayTeam'] == t1))
-    h2h = df[mask].sort_values('Date', ascending=False)
-    if h2h.empty: return None
-    
-    data = []
-    for _, r in h2h.iterrows():
-        data.append({
-            "Fecha": r['Date'].strftime("%d/%m/%Y"), "Local": r['HomeTeam'],
-            "Res": f"{int(r['FTHG'])}-{int(r['FTAG'])}", "Visitante": r['AwayTeam'],
-            "1": r.get('B365H', '-'), "X": r.get('B365D', '-'), "2": r.get('B365A', '-')
-        })
-    return pd.DataFrame(data)
-
 # --- SELECTOR DE EQUIPOS UNIVERSAL (ARREGLADO) ---
 def render_team_selector(df_matches, key_suffix, label="Equipo"):
     """ Selector con filtro real 1ª/2ª División """
@@ -269,7 +214,10 @@ def render_team_selector(df_matches, key_suffix, label="Equipo"):
 
 # --- INTERFAZ PRINCIPAL ---
 full_df = load_all_matches()
+team_table = load_team_table(full_df, len(full_df), full_df['Date'].max()) if not full_df.empty else None
+h2h_index = load_h2h_index(full_df, len(full_df), full_df['Date'].max()) if not full_df.empty else None
 df_players = load_players()
+team_resolver = load_team_resolver(full_df, df_players, len(full_df), len(df_players))
 
 st.sidebar.title("Analista Pro")
 if full_df.empty:
@@ -281,6 +229,8 @@ else:
         st.sidebar.success("✅ 1ª y 2ª División cargadas.")
     else:
         st.sidebar.warning("ℹ️ Solo 1ª División detectada (Falta SP2.csv).")
+    if team_resolver.orphan_player_teams:
+        st.sidebar.warning(f"⚠️ Equipos de jugadores sin partidos: {', '.join(team_resolver.orphan_player_teams)}")
 
 tabs = st.tabs(["🆚 Comparador", "🛡️ Ficha Equipo", "⚽ Ficha Jugador", "🏟️ Plantilla"])
 
@@ -300,8 +250,8 @@ with tabs[0]:
     if local and visitante:
         n_games = st.slider("Analizar últimos X partidos", 5, 20, 5)
         
-        stats_loc = get_advanced_form(full_df, local, n_games, "Home")
-        stats_vis = get_advanced_form(full_df, visitante, n_games, "Away")
+        stats_loc = team_table.form(local, n_games, "Home")
+        stats_vis = team_table.form(visitante, n_games, "Away")
         
         if stats_loc and stats_vis:
             st.subheader(f"📊 {local} (Casa) vs {visitante} (Fuera)")
@@ -330,8 +280,8 @@ with tabs[0]:
             
             # Jugadores
             st.subheader("🔥 Jugadores Clave")
-            scorers_L, shooters_L, cards_L = get_player_rankings(df_players, local)
-            scorers_V, shooters_V, cards_V = get_player_rankings(df_players, visitante)
+            scorers_L, shooters_L, cards_L = get_player_rankings(df_players, local, team_resolver)
+            scorers_V, shooters_V, cards_V = get_player_rankings(df_players, visitante, team_resolver)
             
             cp1, cp2 = st.columns(2)
             with cp1:
@@ -351,7 +301,7 @@ with tabs[0]:
 
             # H2H
             st.divider()
-            h2h = get_h2h_history(full_df, local, visitante)
+            h2h = h2h_index.history(local, visitante)
             with st.expander("📚 Historial H2H"):
                 if h2h is not None: st.dataframe(h2h, hide_index=True, use_container_width=True)
                 else: st.write("Sin enfrentamientos previos.")
@@ -366,7 +316,7 @@ with tabs[1]:
     team_sel = render_team_selector(full_df, "tab2", "Equipo")
     
     if team_sel:
-        stats = get_advanced_form(full_df, team_sel, 20, 'General')
+        stats = team_table.form(team_sel, 20, 'General')
         if stats:
             st.markdown(f"### 📊 Rendimiento: {team_sel}")
             st.caption("Medias últimos 20 partidos")
@@ -392,7 +342,7 @@ with tabs[2]:
     team_p = render_team_selector(full_df, "tab3", "Equipo del Jugador")
     
     if team_p:
-        real_team = fuzzy_match_team(team_p, df_players)
+        real_team = team_resolver.player_team(team_p)
         if real_team:
             players = sorted(df_players[df_players['team'] == real_team]['player'].unique())
             player_sel = st.selectbox("Selecciona Jugador", players, index=None)
@@ -424,7 +374,7 @@ with tabs[3]:
     team_sq = render_team_selector(full_df, "tab4", "Equipo")
     
     if team_sq:
-        real_team = fuzzy_match_team(team_sq, df_players)
+        real_team = team_resolver.player_team(team_sq)
         if real_team:
             df_sq = df_players[df_players['team'] == real_team]
             summ = df_sq.groupby('player').agg({
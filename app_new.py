@@ -2,6 +2,9 @@ import streamlit as st
 import pandas as pd
 import data_updater
 import news_engine
+from ingestion import IA_COLUMNS, load_matches, match_files
+from match_cache import MatchCache
+from head_to_head import H2HIndex
 from pathlib import Path
 
 # Configuración
@@ -15,22 +18,19 @@ def run_updater():
 @st.cache_data
 def load_data():
     """Carga datos de partidos (Resultados)"""
-    files = list(Path("datos").glob("*.csv"))
-    league_files = [f for f in files if "jugadores" not in f.name]
+    league_files = match_files(Path("datos"))
     if not league_files: 
         return None
     
-    df_list = []
-    for f in league_files:
-        try:
-            temp_df = pd.read_csv(f)
-            if 'Date' in temp_df.columns:
-                temp_df['Date'] = pd.to_datetime(temp_df['Date'], dayfirst=True, errors='coerce')
-            df_list.append(temp_df)
-        except Exception as e:
-            print(f"Error al cargar {f}: {e}")
-            continue
-    return pd.concat(df_list, ignore_index=True) if df_list else None
+    # Solo las columnas que usa la pestaña de IA, en paralelo y desde la caché Arrow.
+    # La fecha llega ya parseada (formato detectado por archivo en ingestion)
+    df = load_matches(league_files, columns=IA_COLUMNS, cache=MatchCache(Path("datos") / ".cache"))
+    return df if not df.empty else None
+
+@st.cache_resource
+def load_h2h_index(_df, n_rows, last_date):
+    """Índice de enfrentamientos directos, construido una vez por conjunto de datos"""
+    return H2HIndex(_df)
 
 @st.cache_data
 def load_player_data():
@@ -185,7 +185,7 @@ def render_player_props_tab(df_players):
             else:
                 st.warning("No se encontraron oportunidades que cumplan los criterios.")
 
-def render_ia_tab(df):
+def render_ia_tab(df, h2h_index=None):
     """Renderiza la pestaña de análisis con IA."""
     st.header("🧠 Inteligencia Artificial: Contexto Real")
     st.markdown("Esta herramienta cruza **Estadística Fría** con **Noticias de Última Hora**.")
@@ -230,8 +230,8 @@ def render_ia_tab(df):
                 st.subheader("📊 Datos Duros")
                 st.info(f"Promedio Goles Local ({local}): {avg_goles_local}")
                 st.write("**Historial H2H reciente:**")
-                h2h = df[((df['HomeTeam']==local) & (df['AwayTeam']==visitante)) | 
-                         ((df['HomeTeam']==visitante) & (df['AwayTeam']==local))].tail(5)
+                if h2h_index is None: h2h_index = H2HIndex(df)
+                h2h = h2h_index.matches(local, visitante).tail(5)
                 if not h2h.empty:
                     st.dataframe(h2h[['Date', 'HomeTeam', 'AwayTeam', 'FTR']], 
                                 hide_index=True, use_container_width=True)
@@ -279,6 +279,7 @@ def main():
     # Inicializar datos
     run_updater()
     df = load_data()
+    h2h_index = load_h2h_index(df, len(df), df['Date'].max()) if df is not None else None
     df_players = load_player_data()
     
     # Barra lateral
@@ -298,7 +299,7 @@ def main():
         render_player_props_tab(df_players)
     
     with tabs[4]:  # Contexto y Predicción IA
-        render_ia_tab(df)
+        render_ia_tab(df, h2h_index)
     
     # Nota sobre las otras pestañas
     with tabs[0]:
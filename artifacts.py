@@ -0,0 +1,134 @@
+"""
+Artefactos precalculados del pipeline
+Tablas en Arrow IPC (Feather) escritas por el modo batch de data_processor, con un
+manifiesto que registra los CSV de origen para saber si siguen al día
+"""
+
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+# Subdirectorio de data_dir donde se guardan los artefactos (match_files no entra en él)
+ARTIFACTS_DIRNAME = "procesado"
+MANIFEST_NAME = "manifest.json"
+# Subir cuando cambie el contenido de las tablas: invalida los artefactos anteriores
+FORMAT_VERSION = 1
+
+
+def source_stats(files: Iterable[Path]) -> Dict[str, dict]:
+    """
+    Tamaño y mtime de cada CSV de origen (sin leer el contenido).
+
+    Args:
+        files: Rutas de los CSV
+
+    Returns:
+        Diccionario nombre de archivo -> {'size', 'mtime_ns'}
+    """
+    stats = {}
+    for path in files:
+        stat = Path(path).stat()
+        stats[Path(path).name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return stats
+
+
+def _read_manifest(output_dir: Path) -> Optional[dict]:
+    try:
+        manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def write_artifacts(tables: Dict[str, pd.DataFrame], output_dir: str,
+                    sources: Iterable[Path], summary: Optional[dict] = None) -> Dict[str, Path]:
+    """
+    Guarda las tablas como Feather y, al final, el manifiesto.
+    Cada escritura usa nombres de archivo nuevos ('partidos-<generación>.arrow') y solo el
+    manifiesto se reemplaza (con un rename atómico): hasta ese momento el manifiesto
+    anterior sigue apuntando a sus propias tablas, que no se tocan. Después se borran las
+    tablas que no usan ni el manifiesto nuevo ni el anterior (un lector que acaba de leer
+    el anterior todavía puede abrirlas).
+
+    Args:
+        tables: Nombre del artefacto -> DataFrame
+        output_dir: Directorio de salida
+        sources: CSV de origen de las tablas
+        summary: Datos adicionales a guardar en el manifiesto
+
+    Returns:
+        Diccionario nombre del artefacto -> ruta escrita
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = _read_manifest(output_dir)
+    generation = uuid.uuid4().hex[:12]
+    paths = {}
+    for name, df in tables.items():
+        path = output_dir / f"{name}-{generation}.arrow"
+        # Feather exige un índice por defecto
+        df.reset_index(drop=True).to_feather(path)
+        paths[name] = path
+
+    manifest = {
+        'version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'sources': source_stats(sources),
+        'tables': {name: {'file': path.name, 'rows': len(tables[name]),
+                          'columns': [str(c) for c in tables[name].columns]}
+                   for name, path in paths.items()},
+        'summary': summary or {},
+    }
+    tmp_path = output_dir / f"{MANIFEST_NAME}.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=1, ensure_ascii=False, default=str), encoding='utf-8')
+    os.replace(tmp_path, output_dir / MANIFEST_NAME)
+
+    keep = {path.name for path in paths.values()}
+    if previous is not None:
+        keep |= {entry['file'] for entry in previous['tables'].values()}
+    for path in output_dir.glob('*.arrow'):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+    return paths
+
+
+def load_artifact(output_dir: str, name: str, columns: Optional[List[str]] = None,
+                  sources: Optional[Iterable[Path]] = None) -> Optional[pd.DataFrame]:
+    """
+    Lee un artefacto si existe y está al día.
+
+    Args:
+        output_dir: Directorio de los artefactos
+        name: Nombre del artefacto ('partidos', 'oportunidades')
+        columns: Columnas a leer (None = todas). Las que no existan se ignoran
+        sources: CSV de origen actuales; si se indican y no coinciden (archivos nuevos,
+            borrados o modificados) el artefacto se considera obsoleto
+
+    Returns:
+        DataFrame, o None si no hay artefacto válido
+    """
+    output_dir = Path(output_dir)
+    manifest = _read_manifest(output_dir)
+    if manifest is None or name not in manifest['tables']:
+        return None
+    if sources is not None and source_stats(sources) != manifest['sources']:
+        return None
+
+    entry = manifest['tables'][name]
+    path = output_dir / entry['file']
+    if columns is not None:
+        wanted = set(columns)
+        columns = [col for col in entry['columns'] if col in wanted]
+    try:
+        return pd.read_feather(path, columns=columns)
+    except FileNotFoundError:
+        # Tabla de una generación ya borrada por una escritura posterior
+        return None
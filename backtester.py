@@ -0,0 +1,271 @@
+"""
+Backtesting walk-forward de patrones de valor
+Descubre patrones con las temporadas de entrenamiento y los apuesta en la siguiente temporada,
+que el descubrimiento no ha visto
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from data_processor import (DEFAULT_METRIC_THRESHOLDS, build_condition_matrix, build_event_matrices,
+                            score_conditions)
+from ingestion import MATCH_KEY
+
+# Mes en que empieza una temporada (las de football-data.co.uk arrancan en agosto)
+SEASON_START_MONTH = 7
+
+# Temporada en el nombre del archivo de origen: Season = 'SP1_1920' -> 19/20
+SOURCE_SEASON_PATTERN = re.compile(r'_(\d{2})(\d{2})$')
+
+# Estado compartido por los workers (se envía una vez en el initializer del pool)
+_STATE: dict = {}
+
+
+def season_of(dates: pd.Series) -> np.ndarray:
+    """
+    Año de inicio de la temporada de cada fecha (agosto 2004 - mayo 2005 -> 2004).
+
+    Args:
+        dates: Serie de fechas
+
+    Returns:
+        Array de enteros con el año de inicio
+    """
+    dates = pd.to_datetime(dates)
+    years = dates.dt.year.to_numpy()
+    return years - (dates.dt.month.to_numpy() < SEASON_START_MONTH)
+
+
+def match_seasons(df: pd.DataFrame) -> np.ndarray:
+    """
+    Año de inicio de la temporada de cada partido según su archivo de origen (columna
+    Season: 'SP1_1920' -> 2019). La fecha no basta: la 2019/20 terminó en julio de 2020.
+
+    Los archivos sin temporada en el nombre (SP1.csv) son de una sola temporada, la de su
+    primer partido; sin columna Season se usa season_of.
+
+    Args:
+        df: DataFrame con Date y, opcionalmente, Season
+
+    Returns:
+        Array de enteros con el año de inicio
+    """
+    if 'Season' not in df.columns:
+        return season_of(df['Date'])
+
+    # Sobre los archivos distintos (un puñado), no fila a fila
+    codes, sources = pd.factorize(df['Season'].astype('object'))
+    source_seasons = np.full(len(sources), -1, dtype=np.int64)
+    for i, source in enumerate(sources):
+        match = SOURCE_SEASON_PATTERN.search(str(source))
+        if match and int(match.group(2)) == (int(match.group(1)) + 1) % 100:
+            year = int(match.group(1))
+            source_seasons[i] = year + (2000 if year < 90 else 1900)
+
+    seasons = np.where(codes >= 0, source_seasons[np.maximum(codes, 0)], -1)
+    # Por fecha solo las filas que lo necesitan (season_of es lo más caro)
+    undated = np.flatnonzero(seasons < 0)
+    if len(undated):
+        by_date = season_of(df['Date'].iloc[undated])
+        seasons[undated] = by_date
+        for i in np.flatnonzero(source_seasons < 0):
+            in_source = codes[undated] == i
+            if in_source.any():
+                seasons[undated[in_source]] = by_date[in_source].min()
+    return seasons
+
+
+def season_label(start_year: int) -> str:
+    return f"{start_year}/{(start_year + 1) % 100:02d}"
+
+
+def max_drawdown(profits: np.ndarray) -> float:
+    """
+    Máxima caída del beneficio acumulado respecto a su máximo previo.
+
+    Args:
+        profits: Beneficio de cada apuesta (o partido) en orden cronológico
+
+    Returns:
+        Drawdown máximo en unidades de stake (>= 0)
+    """
+    equity = np.concatenate([[0.0], np.cumsum(profits)])
+    return float((np.maximum.accumulate(equity) - equity).max())
+
+
+def _init_worker(state: dict) -> None:
+    _STATE.clear()
+    _STATE.update(state)
+
+
+def _run_fold(fold: tuple) -> tuple:
+    """
+    Ejecuta un fold: descubrimiento en las temporadas de entrenamiento y apuestas
+    en la temporada de test. Todo son operaciones matriciales sobre columnas del fold.
+    """
+    train_seasons, test_season = fold
+    s = _STATE
+    seasons = s['seasons']
+    train = np.isin(seasons, train_seasons)
+    test = seasons == test_season
+
+    # Umbrales por cuantiles solo con datos de entrenamiento (sin fuga de información)
+    if s['grid_size'] is not None:
+        metric_values = s['metric_values']
+        patterns, conditions = [], []
+        for metric_col, values in metric_values.items():
+            train_values = values[train]
+            train_values = train_values[~np.isnan(train_values)]
+            if len(train_values) == 0:
+                continue
+            thresholds = np.unique(np.round(np.quantile(train_values, s['quantiles']), 2))
+            conditions.append(values[None, :] >= thresholds[:, None])
+            patterns.extend((metric_col, float(t)) for t in thresholds)
+        conditions = np.vstack(conditions) if conditions else np.zeros((0, len(seasons)), dtype=bool)
+    else:
+        patterns, conditions = s['patterns'], s['conditions']
+
+    outcomes, valid, odds = s['outcomes'], s['valid'], s['odds']
+
+    # 1. Descubrimiento (in-sample) en las temporadas de entrenamiento
+    stats = score_conditions(conditions[:, train], outcomes[:, train], valid[:, train], odds[:, train])
+    n = stats['n'][:, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probability = stats['hits'] / n
+    ev = probability * stats['avg_odds'] - 1
+    selected = ((n >= s['min_sample_size']) & (probability >= s['min_accuracy'])
+                & (stats['n_odds'] > 0) & (ev > s['min_ev']))
+    pattern_idx, event_idx = np.nonzero(selected)
+
+    # 2. Apuestas (out-of-sample) en la temporada de test: stake 1 por patrón que se cumple
+    bets = conditions[pattern_idx][:, test] & valid[event_idx][:, test]
+    won = outcomes[event_idx][:, test].astype(bool)
+    profit = np.where(bets, np.where(won, odds[event_idx][:, test] - 1, -1.0), 0.0)
+
+    n_bets = bets.sum(axis=1)
+    n_hits = (bets & won).sum(axis=1)
+    pattern_profit = profit.sum(axis=1)
+
+    detail = pd.DataFrame({
+        'Temporada': season_label(test_season),
+        'Patrón': [f"{patterns[p][0]} >= {patterns[p][1]}" for p in pattern_idx],
+        'Evento': [s['event_names'][e] for e in event_idx],
+        'EV Entrenamiento': ev[pattern_idx, event_idx],
+        'Apuestas': n_bets,
+        'Aciertos': n_hits,
+        'Beneficio': pattern_profit,
+    })
+
+    total_bets = int(n_bets.sum())
+    summary = {
+        'Temporada': season_label(test_season),
+        'Entrenamiento': f"{season_label(min(train_seasons))} - {season_label(max(train_seasons))}",
+        'Patrones': len(pattern_idx),
+        'Apuestas': total_bets,
+        'Aciertos': int(n_hits.sum()),
+        'Tasa de Acierto': n_hits.sum() / total_bets if total_bets else np.nan,
+        'Beneficio': float(pattern_profit.sum()),
+        'ROI': pattern_profit.sum() / total_bets if total_bets else np.nan,
+        # Las columnas ya están en orden cronológico: beneficio por partido y acumulado
+        'Drawdown Máx': max_drawdown(profit.sum(axis=0)),
+        'EV Medio Entrenamiento': float(ev[pattern_idx, event_idx].mean()) if len(pattern_idx) else np.nan,
+    }
+    return summary, detail
+
+
+def walk_forward(df: pd.DataFrame, train_window: Optional[int] = None, min_train_seasons: int = 3,
+                 min_sample_size: int = 30, min_accuracy: float = 0.60, min_ev: float = 0.0,
+                 metric_thresholds: Optional[dict] = None, grid_size: Optional[int] = None,
+                 max_workers: Optional[int] = None) -> tuple:
+    """
+    Backtest walk-forward: para cada temporada, redescubre los patrones con las anteriores
+    y los apuesta (stake 1) en esa temporada.
+
+    Args:
+        df: DataFrame procesado (métricas rolling, resultados y cuotas)
+        train_window: Temporadas de entrenamiento por fold (None = todas las anteriores)
+        min_train_seasons: Temporadas mínimas antes del primer fold de test
+        min_sample_size: Tamaño mínimo de muestra para seleccionar un patrón
+        min_accuracy: Porcentaje mínimo de acierto para seleccionar un patrón
+        min_ev: EV mínimo en entrenamiento para apostar un patrón
+        metric_thresholds: Umbrales por métrica (default: DEFAULT_METRIC_THRESHOLDS)
+        grid_size: Si se indica, umbrales por cuantiles calculados en cada fold de entrenamiento
+        max_workers: Número de procesos (default: núcleos disponibles; 1 = sin pool)
+
+    Returns:
+        Tupla (resumen por temporada, detalle por temporada × patrón × evento)
+    """
+    df = df.dropna(subset=['FTHG', 'FTAG', 'Date']).sort_values('Date', kind='mergesort')
+    # Cada partido se apuesta una vez aunque venga en dos archivos (SP1.csv y SP1_2425.csv)
+    df = df.drop_duplicates(MATCH_KEY)
+    if metric_thresholds is None:
+        metric_thresholds = DEFAULT_METRIC_THRESHOLDS
+
+    seasons = match_seasons(df)
+    all_seasons = np.unique(seasons)
+
+    folds = []
+    for i in range(min_train_seasons, len(all_seasons)):
+        start = 0 if train_window is None else max(0, i - train_window)
+        folds.append((all_seasons[start:i].tolist(), int(all_seasons[i])))
+
+    if not folds:
+        print("⚠ No hay suficientes temporadas para el backtest")
+        return pd.DataFrame(), pd.DataFrame()
+
+    event_names, outcomes, valid, odds = build_event_matrices(df)
+    state = {
+        'seasons': seasons,
+        'event_names': event_names,
+        'outcomes': outcomes,
+        'valid': valid,
+        'odds': odds,
+        'grid_size': grid_size,
+        'min_sample_size': min_sample_size,
+        'min_accuracy': min_accuracy,
+        'min_ev': min_ev,
+    }
+    if grid_size is not None:
+        state['metric_values'] = {m: df[m].to_numpy(dtype='float64')
+                                  for m in metric_thresholds if m in df.columns}
+        state['quantiles'] = np.linspace(0, 1, grid_size)
+    else:
+        state['patterns'], state['conditions'] = build_condition_matrix(df, metric_thresholds)
+
+    print(f"\n📈 Backtest walk-forward: {len(folds)} temporadas de test")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers <= 1 or len(folds) <= 1:
+        _init_worker(state)
+        results = [_run_fold(fold) for fold in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(state,)) as pool:
+            results = list(pool.map(_run_fold, folds))
+
+    summary_df = pd.DataFrame([summary for summary, _ in results])
+    detail_df = pd.concat([detail for _, detail in results], ignore_index=True)
+
+    total_bets = summary_df['Apuestas'].sum()
+    if total_bets:
+        print(f"✓ {total_bets} apuestas, ROI total: {summary_df['Beneficio'].sum() / total_bets * 100:.2f}%")
+    else:
+        print("⚠ Ningún patrón seleccionado generó apuestas")
+
+    return summary_df, detail_df
+
+
+if __name__ == "__main__":
+    from data_processor import FootballDataProcessor
+
+    processor = FootballDataProcessor(data_dir="DATOS")
+    processor.process_all()
+    summary, _ = walk_forward(processor.df)
+    print(summary.to_string(index=False))
@@ -3,14 +3,588 @@ Data Processor para Análisis de Fútbol
 Procesa archivos CSV de football-data.co.uk y calcula métricas de forma reciente
 """
 
+import os
 import pandas as pd
 import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
 import warnings
 
+from ingestion import (MATCH_KEY, PROCESSOR_COLUMNS, load_matches, match_files,
+                       parse_date_column, unify_categories)
+from artifacts import ARTIFACTS_DIRNAME, write_artifacts
+from elo import ELO_COLUMNS, elo_ratings
+from match_cache import MatchCache
+from profiler import StageProfiler, peak_rss_mb
+
 warnings.filterwarnings('ignore')
 
+# Métricas de forma reciente: nombre -> (columna local, columna visitante)
+ROLLING_METRICS = {
+    'Goals': ('FTHG', 'FTAG'),
+    'Shots': ('HS', 'AS'),
+    'ShotsOnTarget': ('HST', 'AST'),
+    'Fouls': ('HF', 'AF'),
+    'Corners': ('HC', 'AC'),
+    'Cards': ('HY', 'AY'),
+    # Estadísticas encajadas: las del rival en el mismo partido
+    'GoalsConceded': ('FTAG', 'FTHG'),
+    'ShotsConceded': ('AS', 'HS'),
+    'ShotsOnTargetConceded': ('AST', 'HST'),
+}
+
+# Condiciones para las métricas: (prefijo, columna de equipo, posición en ROLLING_METRICS)
+ROLLING_SIDES = (('Home', 'HomeTeam', 0), ('Away', 'AwayTeam', 1))
+
+
+# Nombre de cada métrica en los diccionarios de get_team_current_stats
+ROLLING_STAT_KEYS = {
+    'Goals': 'Goles',
+    'Shots': 'Tiros',
+    'ShotsOnTarget': 'Tiros a Puerta',
+    'Fouls': 'Faltas',
+    'Corners': 'Corners',
+}
+
+# Umbrales a probar por métrica en find_value_opportunities
+DEFAULT_METRIC_THRESHOLDS = {
+    'Home_Rolling_Goals': [0.5, 1.0, 1.5, 2.0, 2.5],
+    'Home_Rolling_Shots': [8, 10, 12, 14, 16, 18],
+    'Home_Rolling_ShotsOnTarget': [3, 4, 5, 6, 7],
+    'Away_Rolling_Goals': [0.5, 1.0, 1.5, 2.0, 2.5],
+    'Away_Rolling_Shots': [8, 10, 12, 14, 16, 18],
+    'Away_Rolling_ShotsOnTarget': [3, 4, 5, 6, 7],
+}
+
+# Eventos a analizar: (nombre, condición, columna de cuota)
+VALUE_EVENTS = [
+    ('Victoria Local', lambda d: d['FTR'] == 'H', 'B365H'),
+    ('Empate', lambda d: d['FTR'] == 'D', 'B365D'),
+    ('Victoria Visitante', lambda d: d['FTR'] == 'A', 'B365A'),
+    ('Más de 2.5 goles', lambda d: (d['FTHG'] + d['FTAG']) > 2.5, 'B365>2.5'),
+    ('Menos de 2.5 goles', lambda d: (d['FTHG'] + d['FTAG']) < 2.5, 'B365<2.5'),
+    # Aproximación, usar cuota de más de 2.5 como proxy
+    ('Ambos equipos marcan', lambda d: (d['FTHG'] > 0) & (d['FTAG'] > 0), 'B365>2.5'),
+]
+
+# Rango de cuotas razonables
+MIN_VALID_ODDS = 1.01
+MAX_VALID_ODDS = 100
+
+# Partidos a partir de los cuales process_all() reparte el rolling entre procesos
+# (por debajo, arrancar el pool cuesta más que el cálculo)
+PARALLEL_MIN_ROWS = 100_000
+
+OPPORTUNITY_COLUMNS = ['Patrón', 'Evento', 'Muestra (n)', 'Aciertos',
+                       'Probabilidad Real', 'Cuota Media', 'EV', 'EV %']
+
+
+def form_column(prefix: str, name: str, window: Optional[int] = None,
+                halflife: Optional[float] = None, primary_window: Optional[int] = None) -> str:
+    """
+    Nombre de la columna de una métrica de forma reciente.
+    
+    Args:
+        prefix: 'Home' o 'Away'
+        name: Métrica de ROLLING_METRICS
+        window: Ventana de la media móvil (la principal no lleva sufijo: Home_Rolling_Goals)
+        halflife: Semivida de la media exponencial (Home_EWMA3_Goals)
+        primary_window: Ventana principal
+        
+    Returns:
+        Nombre de la columna
+    """
+    if halflife is not None:
+        return f'{prefix}_EWMA{halflife:g}_{name}'
+    if window == primary_window:
+        return f'{prefix}_Rolling_{name}'
+    return f'{prefix}_Rolling{window}_{name}'
+
+
+def grouped_form_features(groups: np.ndarray, values: np.ndarray, n_groups: int,
+                          windows: Iterable[int] = (), halflives: Iterable[float] = ()) -> tuple:
+    """
+    Medias móviles de varias ventanas y medias exponenciales (EWMA) de varias semividas
+    de los partidos anteriores de cada grupo, en una sola pasada agrupada.
+    
+    Equivale, para cada grupo, a shift(1).rolling(w, min_periods=1).mean() y a
+    shift(1).ewm(halflife=h).mean(): los nulos no cuentan en la media pero sí en el
+    decaimiento. Las filas se colocan en una matriz (grupo, partido, métrica); las ventanas
+    salen de sumas acumuladas y las EWMA de una recurrencia numerador/denominador.
+    
+    Args:
+        groups: Código de grupo de cada fila (0..n_groups-1), filas en orden cronológico
+        values: Matriz (N, K) con las estadísticas de cada fila
+        n_groups: Número de grupos
+        windows: Ventanas de las medias móviles
+        halflives: Semividas de las EWMA
+        
+    Returns:
+        Tupla (features, state):
+        - features: diccionario ('window', w) o ('ewma', h) -> matriz (N, K)
+        - state: 'lengths' (G,), 'tails' (lista de matrices con los últimos max(windows)
+          valores de cada grupo), 'num' y 'den' (G, H, K) de las EWMA tras la última fila
+    """
+    windows = list(windows)
+    halflives = list(halflives)
+    n_rows, n_metrics = values.shape
+    
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    lengths = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    pos = np.arange(n_rows) - starts[sorted_groups]
+    max_len = int(lengths.max()) if n_rows else 0
+    
+    grid = np.full((n_groups, max_len, n_metrics), np.nan)
+    grid[sorted_groups, pos] = values[order]
+    present = ~np.isnan(grid)
+    
+    features = {}
+    
+    # Medias móviles: suma y número de valores no nulos de los partidos [pos - w, pos)
+    if windows:
+        sums = np.zeros((n_groups, max_len + 1, n_metrics))
+        counts = np.zeros((n_groups, max_len + 1, n_metrics))
+        np.cumsum(np.where(present, grid, 0.0), axis=1, out=sums[:, 1:])
+        np.cumsum(present, axis=1, out=counts[:, 1:])
+        for window in windows:
+            lo = np.maximum(pos - window, 0)
+            total = sums[sorted_groups, pos] - sums[sorted_groups, lo]
+            count = counts[sorted_groups, pos] - counts[sorted_groups, lo]
+            result = np.empty((n_rows, n_metrics))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[order] = np.where(count > 0, total / count, np.nan)
+            features[('window', window)] = result
+    
+    # EWMA: num = decay * num + x, den = decay * den + 1 (solo con x no nulo)
+    decays = 0.5 ** (1.0 / np.asarray(halflives, dtype='float64'))[None, :, None]
+    num = np.zeros((n_groups, len(halflives), n_metrics))
+    den = np.zeros((n_groups, len(halflives), n_metrics))
+    if halflives:
+        ewma = np.empty((n_groups, max_len, len(halflives), n_metrics))
+        for t in range(max_len):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ewma[:, t] = num / den
+            active = (t < lengths)[:, None, None]
+            x = np.where(present[:, t], grid[:, t], 0.0)[:, None, :]
+            num = np.where(active, decays * num + x, num)
+            den = np.where(active, decays * den + present[:, t][:, None, :], den)
+        for i, halflife in enumerate(halflives):
+            result = np.empty((n_rows, n_metrics))
+            result[order] = ewma[sorted_groups, pos, i]
+            features[('ewma', halflife)] = result
+    
+    tail_size = max(windows, default=0)
+    tails = [grid[g, max(0, lengths[g] - tail_size):lengths[g]] for g in range(n_groups)]
+    
+    return features, {'lengths': lengths, 'tails': tails, 'num': num, 'den': den}
+
+
+def _form_partition(task: tuple) -> tuple:
+    return grouped_form_features(*task)
+
+
+def partitioned_form_features(groups: np.ndarray, values: np.ndarray, n_groups: int,
+                              windows: Iterable[int] = (), halflives: Iterable[float] = (),
+                              partitions: Optional[np.ndarray] = None,
+                              max_workers: int = 1) -> tuple:
+    """
+    grouped_form_features repartido en un pool de procesos. Cada grupo se calcula solo
+    con sus propias filas, así que cualquier reparto de grupos completos da el mismo
+    resultado: cada partición se calcula en un proceso y se recompone.
+    
+    Args:
+        groups: Código de grupo de cada fila (0..n_groups-1), filas en orden cronológico
+        values: Matriz (N, K) con las estadísticas de cada fila
+        n_groups: Número de grupos
+        windows: Ventanas de las medias móviles
+        halflives: Semividas de las EWMA
+        partitions: Partición de cada grupo (n_groups,); None = sin repartir
+        max_workers: Número de procesos (1 = sin pool)
+        
+    Returns:
+        Lo mismo que grouped_form_features
+    """
+    windows = list(windows)
+    halflives = list(halflives)
+    part_ids = np.unique(partitions) if partitions is not None else []
+    if max_workers <= 1 or len(part_ids) <= 1:
+        return grouped_form_features(groups, values, n_groups, windows, halflives)
+    
+    row_partitions = partitions[groups]
+    members, tasks = [], []
+    for part in part_ids:
+        group_ids = np.flatnonzero(partitions == part)
+        # Filas en el orden original: el orden cronológico dentro de cada grupo se mantiene
+        rows = np.flatnonzero(row_partitions == part)
+        local = np.empty(n_groups, dtype=np.int64)
+        local[group_ids] = np.arange(len(group_ids))
+        members.append((group_ids, rows))
+        tasks.append((local[groups[rows]], values[rows], len(group_ids), windows, halflives))
+    
+    # Las particiones grandes primero, para repartir mejor la carga
+    by_size = sorted(range(len(tasks)), key=lambda i: -len(members[i][1]))
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        results = dict(zip(by_size, pool.map(_form_partition, [tasks[i] for i in by_size])))
+    
+    n_rows, n_metrics = values.shape
+    features = {key: np.empty((n_rows, n_metrics)) for key in results[0][0]}
+    lengths = np.zeros(n_groups, dtype=np.int64)
+    tails = [None] * n_groups
+    num = np.zeros((n_groups, len(halflives), n_metrics))
+    den = np.zeros((n_groups, len(halflives), n_metrics))
+    for i, (group_ids, rows) in enumerate(members):
+        part_features, part_state = results[i]
+        for key, result in part_features.items():
+            features[key][rows] = result
+        lengths[group_ids] = part_state['lengths']
+        num[group_ids] = part_state['num']
+        den[group_ids] = part_state['den']
+        for g, tail in zip(group_ids, part_state['tails']):
+            tails[g] = tail
+    
+    return features, {'lengths': lengths, 'tails': tails, 'num': num, 'den': den}
+
+
+def quantile_thresholds(df: pd.DataFrame, metrics: Iterable[str], grid_size: int) -> dict:
+    """
+    Genera una rejilla densa de umbrales por métrica a partir de sus cuantiles.
+    
+    Args:
+        df: DataFrame procesado
+        metrics: Métricas para las que generar umbrales
+        grid_size: Número de cuantiles por métrica
+        
+    Returns:
+        Diccionario métrica -> lista de umbrales distintos (redondeados a 2 decimales)
+    """
+    quantiles = np.linspace(0, 1, grid_size)
+    thresholds = {}
+    for metric in metrics:
+        if metric in df.columns:
+            values = df[metric].dropna().to_numpy(dtype='float64')
+            if len(values):
+                thresholds[metric] = np.unique(np.round(np.quantile(values, quantiles), 2)).tolist()
+    return thresholds
+
+
+def build_condition_matrix(df: pd.DataFrame, metric_thresholds: dict) -> tuple:
+    """
+    Construye la matriz booleana de condiciones `métrica >= umbral` (patrones × partidos).
+    
+    Args:
+        df: DataFrame de partidos
+        metric_thresholds: Diccionario métrica -> umbrales
+        
+    Returns:
+        Tupla (lista de patrones (métrica, umbral), matriz bool de forma (P, M))
+    """
+    patterns = []
+    blocks = []
+    for metric_col, thresholds in metric_thresholds.items():
+        if metric_col not in df.columns or len(thresholds) == 0:
+            continue
+        values = df[metric_col].to_numpy(dtype='float64')
+        thresholds_arr = np.asarray(thresholds, dtype='float64')
+        # NaN >= umbral es False, igual que el filtrado por máscara
+        blocks.append(values[None, :] >= thresholds_arr[:, None])
+        patterns.extend((metric_col, threshold) for threshold in thresholds)
+    
+    if not blocks:
+        return patterns, np.zeros((0, len(df)), dtype=bool)
+    return patterns, np.vstack(blocks)
+
+
+def build_event_matrices(df: pd.DataFrame, events: list = VALUE_EVENTS) -> tuple:
+    """
+    Evalúa una sola vez cada evento y limpia sus cuotas sobre todos los partidos.
+    
+    Args:
+        df: DataFrame de partidos
+        events: Lista de eventos (nombre, condición, columna de cuota)
+        
+    Returns:
+        Tupla (nombres, aciertos (E, M), cuota válida (E, M), cuotas con 0 si no válida (E, M))
+    """
+    n_matches = len(df)
+    names = [name for name, _, _ in events]
+    outcomes = np.zeros((len(events), n_matches))
+    valid = np.zeros((len(events), n_matches), dtype=bool)
+    odds = np.zeros((len(events), n_matches))
+    
+    for k, (_, condition, odds_col) in enumerate(events):
+        outcomes[k] = condition(df).to_numpy(dtype=bool)
+        if odds_col not in df.columns:
+            continue
+        values = df[odds_col].to_numpy(dtype='float64')
+        ok = np.isfinite(values) & (values >= MIN_VALID_ODDS) & (values <= MAX_VALID_ODDS)
+        valid[k] = ok
+        odds[k] = np.where(ok, values, 0.0)
+    
+    return names, outcomes, valid, odds
+
+
+def score_conditions(conditions: np.ndarray, outcomes: np.ndarray, valid: np.ndarray,
+                     odds: np.ndarray) -> dict:
+    """
+    Calcula muestras, aciertos y cuotas medias de todas las combinaciones patrón × evento.
+    
+    Args:
+        conditions: Matriz bool (P, M)
+        outcomes: Matriz (E, M) con 1 si el evento ocurrió
+        valid: Matriz bool (E, M) con las cuotas válidas
+        odds: Matriz (E, M) con las cuotas (0 donde no son válidas)
+        
+    Returns:
+        Diccionario con 'n' (P,), 'hits' (P, E), 'n_odds' (P, E) y 'avg_odds' (P, E)
+    """
+    # float32: la mitad de memoria que float64 con la matriz (P, M) entera y los conteos
+    # siguen siendo exactos (enteros hasta 2**24 partidos)
+    c = conditions.astype(np.float32)
+    n = conditions.sum(axis=1)
+    hits = (c @ outcomes.T.astype(np.float32)).astype('float64')
+    n_odds = (c @ valid.T.astype(np.float32)).astype('float64')
+    odds_sum = (c @ odds.T.astype(np.float32)).astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_odds = odds_sum / n_odds
+    return {'n': n, 'hits': hits, 'n_odds': n_odds, 'avg_odds': avg_odds}
+
+
+def _suffix_sums(values: np.ndarray) -> np.ndarray:
+    # suma de values[i:] para cada i
+    return np.cumsum(values[::-1])[::-1]
+
+
+def opportunity_pairs(stats: dict, min_sample_size: int, min_accuracy: float) -> tuple:
+    """
+    Combinaciones patrón × evento que cumplen muestra mínima, acierto mínimo y tienen cuotas.
+    
+    Args:
+        stats: Resultado de score_conditions
+        min_sample_size: Tamaño mínimo de muestra
+        min_accuracy: Porcentaje mínimo de acierto
+        
+    Returns:
+        Tupla (índices de patrón, índices de evento), en el orden de opportunities_table
+    """
+    n = np.broadcast_to(stats['n'][:, None], stats['hits'].shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probability = stats['hits'] / n
+    keep = (n >= min_sample_size) & (probability >= min_accuracy) & (stats['n_odds'] > 0)
+    return np.nonzero(keep)
+
+
+def opportunities_table(patterns: list, event_names: list, stats: dict,
+                        min_sample_size: int, min_accuracy: float) -> pd.DataFrame:
+    """
+    Filtra las combinaciones patrón × evento y las formatea como tabla de oportunidades.
+    
+    Args:
+        patterns: Lista de patrones (métrica, umbral) o textos ya formateados
+        event_names: Nombres de los eventos
+        stats: Resultado de score_conditions
+        min_sample_size: Tamaño mínimo de muestra
+        min_accuracy: Porcentaje mínimo de acierto
+        
+    Returns:
+        DataFrame con las columnas de OPPORTUNITY_COLUMNS (sin ordenar)
+    """
+    rows, cols = opportunity_pairs(stats, min_sample_size, min_accuracy)
+    if len(rows) == 0:
+        return pd.DataFrame(columns=OPPORTUNITY_COLUMNS)
+    
+    n = stats['n'][rows]
+    probability = stats['hits'][rows, cols] / n
+    avg_odds = stats['avg_odds'][rows, cols]
+    ev = probability * avg_odds - 1
+    labels = [p if isinstance(p, str) else f"{p[0]} >= {p[1]}" for p in patterns]
+    
+    return pd.DataFrame({
+        'Patrón': [labels[r] for r in rows],
+        'Evento': [event_names[c] for c in cols],
+        'Muestra (n)': n.astype(int),
+        'Aciertos': stats['hits'][rows, cols].astype(int),
+        'Probabilidad Real': [f"{x*100:.2f}%" for x in probability],
+        'Cuota Media': [f"{x:.2f}" for x in avg_odds],
+        'EV': ev,
+        'EV %': [f"{x*100:.2f}%" for x in ev],
+    })
+
+
+def bootstrap_ev(conditions: np.ndarray, outcomes: np.ndarray, valid: np.ndarray,
+                 odds: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+                 n_resamples: int = 1000, confidence: float = 0.95,
+                 seed: Optional[int] = None, block_size: int = 256) -> dict:
+    """
+    Intervalo de confianza bootstrap del EV y p-valor frente a EV = 0 para muchas
+    combinaciones patrón × evento a la vez.
+    
+    Se usa bootstrap de Poisson: cada remuestreo da a cada partido un peso Poisson(1),
+    compartido por todos los patrones. Muestra, aciertos, cuotas válidas y suma de cuotas
+    de todos los remuestreos y combinaciones salen de un producto matricial por bloque.
+    
+    Args:
+        conditions: Matriz bool (P, M) de score_conditions
+        outcomes: Matriz (E, M) con 1 si el evento ocurrió
+        valid: Matriz bool (E, M) con las cuotas válidas
+        odds: Matriz (E, M) con las cuotas (0 donde no son válidas)
+        rows: Índice de patrón de cada combinación (K,)
+        cols: Índice de evento de cada combinación (K,)
+        n_resamples: Número de remuestreos
+        confidence: Nivel de confianza del intervalo (0.95 = 95%)
+        seed: Semilla del generador aleatorio
+        block_size: Combinaciones por producto matricial (limita la memoria)
+        
+    Returns:
+        Diccionario con 'lower', 'upper' (K,) del intervalo percentil y 'p_value' (K,),
+        la proporción de remuestreos con EV <= 0
+    """
+    rng = np.random.default_rng(seed)
+    n_pairs = len(rows)
+    if n_pairs == 0:
+        empty = np.empty(0)
+        return {'lower': empty, 'upper': empty, 'p_value': empty}
+    
+    # Solo los partidos que cumple algún patrón influyen en el resultado
+    covered = conditions[np.unique(rows)].any(axis=0)
+    conditions = conditions[:, covered]
+    # float32 como los pesos: el producto matricial no se promociona a float64
+    outcomes, valid, odds = (m[:, covered].astype('float32') for m in (outcomes, valid, odds))
+    n_matches = int(covered.sum())
+    
+    ev = np.empty((n_resamples, n_pairs))
+    resample_block = 250
+    for b0 in range(0, n_resamples, resample_block):
+        b1 = min(b0 + resample_block, n_resamples)
+        weights = rng.poisson(1.0, size=(b1 - b0, n_matches)).astype('float32')
+        
+        for k0 in range(0, n_pairs, block_size):
+            r, c = rows[k0:k0 + block_size], cols[k0:k0 + block_size]
+            mask = conditions[r].astype('float32')
+            columns = np.concatenate([mask, mask * outcomes[c], mask * valid[c], mask * odds[c]])
+            sums = (weights @ columns.T).astype('float64')
+            n, hits, n_odds, odds_sum = np.split(sums, 4, axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                ev[b0:b1, k0:k0 + len(r)] = hits / n * (odds_sum / n_odds) - 1
+    
+    alpha = 1 - confidence
+    defined = ~np.isnan(ev)
+    return {
+        'lower': np.nanquantile(ev, alpha / 2, axis=0),
+        'upper': np.nanquantile(ev, 1 - alpha / 2, axis=0),
+        'p_value': ((ev <= 0) & defined).sum(axis=0) / np.maximum(defined.sum(axis=0), 1),
+    }
+
+
+class PatternIndex:
+    """
+    Índice compilado de patrones de valor `Home|Away_Rolling_<métrica> >= umbral`.
+    Agrupa los patrones por (lado, métrica) con los umbrales ordenados: los patrones
+    que cumple un valor son un prefijo del grupo (searchsorted), así que una jornada
+    entera se puntúa con unas pocas operaciones vectorizadas.
+    Los patrones multi-condición (pattern_miner) y los de EV <= 0 no se indexan.
+    """
+    
+    PATTERN_REGEX = r'^(Home|Away)_Rolling_(\w+) >= ([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)$'
+    
+    def __init__(self, value_patterns_df: pd.DataFrame):
+        """
+        Compila los patrones.
+        
+        Args:
+            value_patterns_df: DataFrame con patrones de valor (resultado de find_value_opportunities)
+        """
+        self.stat_keys = list(ROLLING_STAT_KEYS.values())
+        n_metrics = len(self.stat_keys)
+        
+        if value_patterns_df is None or len(value_patterns_df) == 0:
+            value_patterns_df = pd.DataFrame(columns=OPPORTUNITY_COLUMNS)
+        
+        parsed = value_patterns_df['Patrón'].astype(str).str.extract(self.PATTERN_REGEX)
+        metric_ids = parsed[1].map({name: i for i, name in enumerate(ROLLING_STAT_KEYS)})
+        ev = pd.to_numeric(value_patterns_df['EV'], errors='coerce')
+        keep = (metric_ids.notna() & (ev > 0)).to_numpy()
+        
+        side = (parsed[0] == 'Away').to_numpy(dtype=int)[keep]
+        group = side * n_metrics + metric_ids.to_numpy()[keep].astype(int)
+        thresholds = parsed[2].to_numpy()[keep].astype('float64')
+        
+        # Orden: grupo (lado, métrica), umbral ascendente
+        order = np.lexsort((thresholds, group))
+        self.group = group[order]
+        self.thresholds = thresholds[order]
+        # Inicio de cada grupo y posición de cada patrón dentro de su grupo
+        self.group_start = np.searchsorted(self.group, np.arange(2 * n_metrics + 1))
+        self.rank = np.arange(len(self.group)) - self.group_start[self.group]
+        
+        rows = value_patterns_df[keep].iloc[order]
+        self.events = rows['Evento'].to_numpy()
+        self.ev = ev.to_numpy()[keep][order]
+        self.ev_pct = rows['EV %'].to_numpy()
+        self.probability = rows['Probabilidad Real'].to_numpy()
+        self.sample = rows['Muestra (n)'].to_numpy()
+        # Orden de salida: EV descendente y, a igualdad, orden de fila del DataFrame original
+        self.priority = np.lexsort((order, -self.ev))
+    
+    def __len__(self) -> int:
+        return len(self.group)
+    
+    def _values(self, stats_list: list) -> np.ndarray:
+        # (F, métricas) con NaN donde falta la estadística
+        return np.array([[stats.get(key, np.nan) if stats else np.nan for key in self.stat_keys]
+                         for stats in stats_list], dtype='float64').reshape(len(stats_list), -1)
+    
+    def score(self, home_stats: list, away_stats: list) -> list:
+        """
+        Puntúa varios partidos a la vez.
+        
+        Args:
+            home_stats: Estadísticas actuales del local de cada partido (get_team_current_stats)
+            away_stats: Estadísticas actuales del visitante de cada partido
+            
+        Returns:
+            Lista (una por partido) de coincidencias ordenadas por EV descendente
+        """
+        n_fixtures = len(home_stats)
+        if len(self) == 0 or n_fixtures == 0:
+            return [[] for _ in range(n_fixtures)]
+        
+        # (F, 2 * métricas): columnas de local y luego de visitante, igual que los grupos
+        values = np.hstack([self._values(home_stats), self._values(away_stats)])
+        
+        # Patrones cumplidos por grupo = umbrales <= valor (prefijo del grupo)
+        counts = np.zeros(values.shape, dtype=int)
+        for g in range(values.shape[1]):
+            lo, hi = self.group_start[g], self.group_start[g + 1]
+            if hi > lo:
+                column = values[:, g]
+                found = np.searchsorted(self.thresholds[lo:hi], column, side='right')
+                counts[:, g] = np.where(np.isnan(column), 0, found)
+        
+        matched = self.rank[None, :] < counts[:, self.group]
+        fixture_idx, pattern_idx = np.nonzero(matched[:, self.priority])
+        pattern_idx = self.priority[pattern_idx]
+        
+        n_metrics = len(self.stat_keys)
+        results = [[] for _ in range(n_fixtures)]
+        for f, p in zip(fixture_idx, pattern_idx):
+            g = self.group[p]
+            results[f].append({
+                'Tipo': 'Local' if g < n_metrics else 'Visitante',
+                'Estadística': self.stat_keys[g % n_metrics],
+                'Valor Actual': (home_stats if g < n_metrics else away_stats)[f][self.stat_keys[g % n_metrics]],
+                'Umbral Patrón': self.thresholds[p],
+                'Evento': self.events[p],
+                'EV': self.ev[p],
+                'EV %': self.ev_pct[p],
+                'Probabilidad Real': self.probability[p],
+                'Muestra Histórica': self.sample[p],
+            })
+        return results
+
 
 class FootballDataProcessor:
     """
@@ -18,15 +592,43 @@ class FootballDataProcessor:
     Evita data leakage usando shift(1) para basar las estadísticas solo en partidos anteriores.
     """
     
-    def __init__(self, data_dir: str = "DATOS"):
+    def __init__(self, data_dir: str = "DATOS", use_cache: bool = True,
+                 rolling_windows: Iterable[int] = (), ewma_halflives: Iterable[float] = (),
+                 profiler: Optional[StageProfiler] = None, max_workers: Optional[int] = None):
         """
         Inicializa el procesador de datos.
         
         Args:
             data_dir: Directorio que contiene los archivos CSV
+            use_cache: Si True, los CSV parseados se guardan en Arrow IPC (data_dir/.cache)
+                y solo se vuelven a leer los archivos que cambian
+            rolling_windows: Ventanas adicionales a la principal (p. ej. (3, 10, 20))
+            ewma_halflives: Semividas de las medias exponenciales (p. ej. (3,))
+            profiler: StageProfiler para medir las etapas (default: desactivado)
+            max_workers: Procesos para el rolling por ligas (default: núcleos disponibles
+                a partir de PARALLEL_MIN_ROWS partidos; 1 = sin pool)
         """
         self.data_dir = Path(data_dir)
+        self.cache: Optional[MatchCache] = MatchCache(self.data_dir / ".cache") if use_cache else None
         self.df: Optional[pd.DataFrame] = None
+        self.profiler = profiler if profiler is not None else StageProfiler(enabled=False)
+        # Ventana principal, ventanas adicionales y semividas EWMA de process_all()
+        self.rolling_window: int = 5
+        self.rolling_windows: tuple = tuple(rolling_windows)
+        self.ewma_halflives: tuple = tuple(ewma_halflives)
+        self.max_workers = max_workers
+        # Estado para actualizaciones incrementales: (prefijo, equipo) -> últimos valores
+        # y (prefijo, equipo) -> (numerador, denominador) de cada EWMA
+        self._rolling_state: Optional[dict] = None
+        self._ewma_state: Optional[dict] = None
+        # Rating Elo de cada equipo tras el último partido procesado
+        self._elo_state: Optional[dict] = None
+        # Clasificaciones acumuladas por división y temporada (standings.StandingsIndex)
+        self._standings = None
+        # Equipo -> posiciones de sus partidos en self.df ordenadas por fecha (process_all)
+        self._team_index: Optional[dict] = None
+        # Última compilación de patrones: (DataFrame de patrones, PatternIndex)
+        self._pattern_index: tuple = (None, None)
         
     def load_and_concat_data(self) -> pd.DataFrame:
         """
@@ -36,33 +638,44 @@ class FootballDataProcessor:
         Returns:
             DataFrame con todos los datos concatenados
         """
-        csv_files = list(self.data_dir.glob("*.csv"))
+        csv_files = match_files(self.data_dir)
         
         if not csv_files:
             raise FileNotFoundError(f"No se encontraron archivos CSV en {self.data_dir}")
         
-        dataframes = []
-        
-        for csv_file in csv_files:
-            try:
-                df = pd.read_csv(csv_file, encoding='utf-8')
-                # Agregar columna de temporada si no existe
-                if 'Season' not in df.columns:
-                    df['Season'] = csv_file.stem
-                dataframes.append(df)
-                print(f"✓ Cargado: {csv_file.name} ({len(df)} partidos)")
-            except Exception as e:
-                print(f"⚠ Error al cargar {csv_file.name}: {e}")
-                continue
+        return self._read_csv_files(csv_files)
+    
+    def _read_csv_files(self, csv_files: Iterable[Path]) -> pd.DataFrame:
+        """
+        Lee y concatena una lista de archivos CSV de football-data.co.uk.
         
-        if not dataframes:
+        Args:
+            csv_files: Rutas de los archivos a leer
+            
+        Returns:
+            DataFrame concatenado con las columnas de cuotas aseguradas
+        """
+        def add_season(csv_file: Path, df: pd.DataFrame) -> pd.DataFrame:
+            # Agregar columna de temporada si no existe
+            if 'Season' not in df.columns:
+                df['Season'] = csv_file.stem
+            return df
+        
+        # Lectura en paralelo, solo con las columnas que usa el procesador
+        with self.profiler.stage('lectura_csv') as stage:
+            combined_df = load_matches(csv_files, columns=PROCESSOR_COLUMNS, cache=self.cache,
+                                       transform=add_season)
+            stage.rows_out = len(combined_df)
+        
+        if combined_df.empty:
             raise ValueError("No se pudieron cargar archivos CSV")
         
-        combined_df = pd.concat(dataframes, ignore_index=True)
         print(f"\n✓ Total de partidos cargados: {len(combined_df)}")
         
         # Verificar y crear columnas de cuotas si no existen
-        combined_df = self._ensure_odds_columns(combined_df)
+        with self.profiler.stage('cuotas', rows_in=len(combined_df)) as stage:
+            combined_df = self._ensure_odds_columns(combined_df)
+            stage.rows_out = len(combined_df)
         
         return combined_df
     
@@ -77,7 +690,8 @@ class FootballDataProcessor:
         Returns:
             DataFrame con columnas de cuotas aseguradas
         """
-        df = df.copy()
+        # Copia superficial: solo se añaden columnas, el DataFrame de entrada no cambia
+        df = df.copy(deep=False)
         
         # Columnas de cuotas requeridas
         odds_columns = {
@@ -133,32 +747,22 @@ class FootballDataProcessor:
         Convierte la columna 'Date' a datetime.
         Maneja formatos dd/mm/yy y dd/mm/yyyy.
         
+        Los DataFrames cargados con ingestion ya traen la fecha parseada (formato
+        detectado por archivo); aquí solo se parsea si la columna sigue en texto.
+        
         Args:
             df: DataFrame con columna Date
             
         Returns:
             DataFrame con Date convertida a datetime
         """
-        df = df.copy()
-        
         if 'Date' not in df.columns:
             raise ValueError("La columna 'Date' no existe en el DataFrame")
         
-        # Intentar diferentes formatos de fecha
-        date_formats = ['%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d-%m-%Y']
-        
-        for fmt in date_formats:
-            try:
-                df['Date'] = pd.to_datetime(df['Date'], format=fmt, errors='coerce')
-                # Si la mayoría de fechas se convirtieron correctamente, usar este formato
-                if df['Date'].notna().sum() / len(df) > 0.8:
-                    break
-            except:
-                continue
-        
-        # Si aún hay valores nulos, intentar conversión automática
-        if df['Date'].isna().any():
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', dayfirst=True)
+        # Cada fecha distinta se parsea una vez con el formato detectado
+        # (copia superficial: solo se sustituye la columna Date)
+        df = df.copy(deep=False)
+        df['Date'] = parse_date_column(df['Date'])
         
         # Eliminar filas con fechas inválidas
         invalid_dates = df['Date'].isna().sum()
@@ -166,31 +770,55 @@ class FootballDataProcessor:
             print(f"⚠ Se eliminaron {invalid_dates} filas con fechas inválidas")
             df = df.dropna(subset=['Date'])
         
-        # Ordenar por fecha
-        df = df.sort_values('Date').reset_index(drop=True)
+        # Ordenar por fecha (orden estable: los partidos del mismo día conservan el orden de carga).
+        # Si ya está ordenado no se reordena: sort_values copiaría todas las columnas
+        if not df['Date'].is_monotonic_increasing:
+            df = df.sort_values('Date', kind='mergesort')
+        df = df.reset_index(drop=True)
         
         return df
     
-    def calculate_rolling_metrics(self, df: pd.DataFrame, window: int = 5) -> pd.DataFrame:
+    def calculate_rolling_metrics(self, df: pd.DataFrame, window: int = 5,
+                                  engine: str = 'vectorized', windows: Iterable[int] = (),
+                                  halflives: Iterable[float] = (),
+                                  max_workers: int = 1) -> pd.DataFrame:
         """
         Calcula métricas de forma reciente (rolling mean) para equipos locales y visitantes.
         IMPORTANTE: Usa shift(1) para evitar data leakage.
         
-        Métricas calculadas:
+        Métricas calculadas (ROLLING_METRICS):
         - Goles a favor (FTHG/FTAG)
         - Tiros (HS/AS)
         - Tiros a puerta (HST/AST)
         - Faltas (HF/AF)
         - Corners (HC/AC)
+        - Tarjetas amarillas (HY/AY)
+        - Goles, tiros y tiros a puerta encajados
         
         Args:
             df: DataFrame con los datos de partidos
-            window: Ventana de partidos para el rolling mean (default: 5)
+            window: Ventana principal (default: 5), columnas Home_Rolling_<métrica>
+            engine: 'vectorized' (una pasada agrupada para todas las ventanas) o
+                'legacy' (bucle por equipo, solo ventana principal y las cinco métricas
+                originales; se mantiene como referencia)
+            windows: Ventanas adicionales, columnas Home_Rolling<w>_<métrica>
+            halflives: Semividas de medias exponenciales, columnas Home_EWMA<h>_<métrica>
+            max_workers: Procesos del motor vectorizado; con más de uno, cada liga se
+                calcula en un proceso (ver _form_partitions)
             
         Returns:
             DataFrame con las nuevas columnas de métricas agregadas
         """
-        df = df.copy()
+        if engine not in ('vectorized', 'legacy'):
+            raise ValueError(f"Motor de rolling desconocido: {engine}")
+        
+        windows = [window] + [w for w in dict.fromkeys(windows) if w != window]
+        halflives = list(dict.fromkeys(halflives))
+        if engine == 'legacy' and (len(windows) > 1 or halflives):
+            raise ValueError("El motor legacy solo calcula la ventana principal")
+        
+        # Copia superficial: solo se añaden columnas, el DataFrame de entrada no cambia
+        df = df.copy(deep=False)
         
         # Columnas requeridas
         required_cols = ['HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'Date']
@@ -199,14 +827,141 @@ class FootballDataProcessor:
             raise ValueError(f"Faltan columnas requeridas: {missing_cols}")
         
         # Columnas opcionales (si no existen, se crearán con valores NaN)
-        optional_cols = ['HS', 'AS', 'HST', 'AST', 'HF', 'AF', 'HC', 'AC']
+        optional_cols = [col for cols in ROLLING_METRICS.values() for col in cols
+                         if col not in required_cols]
         
         # Verificar y crear columnas faltantes
-        for col in optional_cols:
+        for col in dict.fromkeys(optional_cols):
             if col not in df.columns:
                 df[col] = np.nan
                 print(f"⚠ Columna {col} no encontrada. Se creará con valores NaN.")
         
+        # Obtener todos los equipos únicos
+        all_teams = set(df['HomeTeam'].unique()) | set(df['AwayTeam'].unique())
+        
+        print(f"\nCalculando métricas de forma reciente para {len(all_teams)} equipos...")
+        
+        if engine == 'legacy':
+            df = self._calculate_rolling_metrics_legacy(df, all_teams, window)
+        else:
+            order, groups, values, group_keys = self._form_inputs(df)
+            partitions = self._form_partitions(df, group_keys) if max_workers > 1 else None
+            features, _ = partitioned_form_features(groups, values, len(group_keys), windows,
+                                                    halflives, partitions, max_workers)
+            if group_keys[-1] == (None, None):
+                for result in features.values():
+                    result[groups == len(group_keys) - 1] = np.nan
+            
+            n_rows = len(df)
+            new_columns = {}
+            for side, (prefix, _, _) in enumerate(ROLLING_SIDES):
+                for (kind, param), result in features.items():
+                    block = np.empty((n_rows, len(ROLLING_METRICS)))
+                    block[order] = result[side * n_rows:(side + 1) * n_rows]
+                    for k, name in enumerate(ROLLING_METRICS):
+                        if kind == 'window':
+                            column = form_column(prefix, name, window=param, primary_window=window)
+                        else:
+                            column = form_column(prefix, name, halflife=param)
+                        new_columns[column] = block[:, k]
+            
+            df = df.drop(columns=[col for col in new_columns if col in df.columns])
+            df = pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1)
+        
+        print("✓ Métricas de forma reciente calculadas correctamente")
+        
+        return df
+    
+    def _form_inputs(self, df: pd.DataFrame) -> tuple:
+        """
+        Prepara la entrada de grouped_form_features para los dos lados a la vez:
+        las filas de local y después las de visitante, cada bloque en orden cronológico
+        estable, agrupadas por (lado, equipo).
+        
+        Args:
+            df: DataFrame con las columnas de ROLLING_METRICS
+            
+        Returns:
+            Tupla (orden cronológico de las filas de df, grupos (2N,), valores (2N, K),
+            claves (prefijo, equipo) de cada grupo)
+        """
+        order = np.argsort(df['Date'].to_numpy(), kind='stable')
+        teams = np.concatenate([df[team_col].astype('object').to_numpy()[order]
+                                for _, team_col, _ in ROLLING_SIDES])
+        codes, uniques = pd.factorize(teams)
+        n_teams = len(uniques)
+        
+        side_ids = np.repeat(np.arange(len(ROLLING_SIDES)), len(df))
+        groups = side_ids * n_teams + codes
+        group_keys = [(prefix, team) for prefix, _, _ in ROLLING_SIDES for team in uniques]
+        
+        # Filas sin equipo: grupo propio, como groupby descarta las claves nulas
+        missing = codes < 0
+        if missing.any():
+            groups = np.where(missing, len(group_keys), groups)
+            group_keys.append((None, None))
+        
+        values = np.vstack([
+            df[[cols[side] for cols in ROLLING_METRICS.values()]].to_numpy(dtype='float64')[order]
+            for _, _, side in ROLLING_SIDES
+        ])
+        return order, groups, values, group_keys
+    
+    def _form_partitions(self, df: pd.DataFrame, group_keys: list) -> np.ndarray:
+        """
+        Reparte los grupos de _form_inputs por ligas: cada equipo va a la liga (Div)
+        en la que ha jugado más partidos, con todos sus partidos, también los de otras
+        ligas. Así la forma de los equipos que suben o bajan no se corta al cambiar
+        de división y el resultado es idéntico al cálculo sin repartir.
+        
+        Args:
+            df: DataFrame de partidos
+            group_keys: Claves (prefijo, equipo) de _form_inputs
+            
+        Returns:
+            Array con la partición de cada grupo
+        """
+        if 'Div' not in df.columns:
+            return np.zeros(len(group_keys), dtype=np.int64)
+        
+        divs = df['Div'].astype('object').to_numpy()
+        pairs = pd.DataFrame({
+            'team': np.concatenate([df[team_col].astype('object').to_numpy()
+                                    for _, team_col, _ in ROLLING_SIDES]),
+            'div': np.concatenate([divs] * len(ROLLING_SIDES)),
+        }).dropna()
+        # value_counts ordena por frecuencia: la primera aparición de cada equipo es su liga
+        counts = pairs.value_counts().reset_index().drop_duplicates('team')
+        main_div = dict(zip(counts['team'], counts['div']))
+        
+        # Equipos sin Div (y el grupo de filas sin equipo) van a una partición propia
+        labels = [main_div.get(team) for _, team in group_keys]
+        codes, _ = pd.factorize(pd.Series(labels, dtype='object'), use_na_sentinel=False)
+        return codes
+    
+    def _rolling_workers(self, n_rows: int) -> int:
+        """Procesos para el rolling de process_all() según max_workers y el tamaño."""
+        if self.max_workers is not None:
+            return self.max_workers
+        if n_rows < PARALLEL_MIN_ROWS:
+            return 1
+        return os.cpu_count() or 1
+    
+    def _calculate_rolling_metrics_legacy(self, df: pd.DataFrame, all_teams: set,
+                                          window: int) -> pd.DataFrame:
+        """
+        Implementación original de calculate_rolling_metrics: un bucle por equipo
+        que escribe cada resultado celda a celda. Se conserva para poder comparar
+        la salida del motor vectorizado.
+        
+        Args:
+            df: DataFrame con las columnas de estadísticas ya aseguradas
+            all_teams: Conjunto de equipos a procesar
+            window: Ventana de partidos para el rolling mean
+            
+        Returns:
+            DataFrame con las columnas Home_/Away_Rolling_* agregadas
+        """
         # Inicializar columnas de métricas
         metric_cols = [
             'Home_Rolling_Goals', 'Home_Rolling_Shots', 'Home_Rolling_ShotsOnTarget',
@@ -217,11 +972,6 @@ class FootballDataProcessor:
         for col in metric_cols:
             df[col] = np.nan
         
-        # Obtener todos los equipos únicos
-        all_teams = set(df['HomeTeam'].unique()) | set(df['AwayTeam'].unique())
-        
-        print(f"\nCalculando métricas de forma reciente para {len(all_teams)} equipos...")
-        
         # Crear índice temporal para mapear correctamente
         df['_original_index'] = df.index
         
@@ -275,26 +1025,387 @@ class FootballDataProcessor:
         # Limpiar columnas temporales
         df = df.drop(columns=['_original_index'], errors='ignore')
         
-        print("✓ Métricas de forma reciente calculadas correctamente")
+        return df
+    
+    def calculate_elo_ratings(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Añade el rating Elo de local y visitante antes de cada partido (ELO_COLUMNS).
+        Como el shift(1) de las métricas rolling, cada partido solo ve los anteriores.
+        Guarda los ratings finales para update_rolling_metrics.
+        
+        Args:
+            df: DataFrame con HomeTeam, AwayTeam, FTHG, FTAG y Date
+            
+        Returns:
+            DataFrame con las columnas Home_Elo, Away_Elo y Elo_Diff (local - visitante)
+        """
+        # Copia superficial: solo se añaden columnas, el DataFrame de entrada no cambia
+        df = df.copy(deep=False)
+        home_elo, away_elo, self._elo_state = self._elo_pass(df)
+        df['Home_Elo'] = home_elo
+        df['Away_Elo'] = away_elo
+        df['Elo_Diff'] = home_elo - away_elo
+        
+        print(f"✓ Ratings Elo calculados para {len(self._elo_state)} equipos")
+        
+        return df
+    
+    @staticmethod
+    def _elo_pass(df: pd.DataFrame, state: Optional[dict] = None) -> tuple:
+        """
+        Pasada Elo por los partidos de df en orden cronológico (estable). Los partidos
+        repetidos (mismo MATCH_KEY, p. ej. en SP1.csv y SP1_2425.csv) actualizan los
+        ratings una sola vez y todas sus copias reciben el rating previo de la primera.
+        
+        Args:
+            df: DataFrame con Date, HomeTeam, AwayTeam, FTHG y FTAG
+            state: Ratings de partida (ver elo_ratings)
+            
+        Returns:
+            Tupla (rating local (N,), rating visitante (N,), estado tras el último partido)
+        """
+        # Identificador de partido en orden de primera aparición: las primeras copias son 0..U-1
+        match_ids = df.groupby(MATCH_KEY, sort=False, observed=True, dropna=False).ngroup().to_numpy()
+        first_rows = np.flatnonzero(~df.duplicated(MATCH_KEY).to_numpy())
+        rows = first_rows[np.argsort(df['Date'].to_numpy()[first_rows], kind='stable')]
+        
+        home_pre, away_pre, state = elo_ratings(
+            df['HomeTeam'].astype('object').to_numpy()[rows],
+            df['AwayTeam'].astype('object').to_numpy()[rows],
+            df['FTHG'].to_numpy(dtype='float64')[rows],
+            df['FTAG'].to_numpy(dtype='float64')[rows],
+            state=state)
+        
+        home_match = np.empty(len(first_rows))
+        away_match = np.empty(len(first_rows))
+        home_match[match_ids[rows]] = home_pre
+        away_match[match_ids[rows]] = away_pre
+        return home_match[match_ids], away_match[match_ids], state
+    
+    def add_standings(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Añade la posición y los puntos en la clasificación de local y visitante antes
+        de cada partido (STANDINGS_COLUMNS). Los partidos del mismo día no cuentan.
+        Guarda el índice para standings_at().
+        
+        Args:
+            df: DataFrame con Date, HomeTeam, AwayTeam, FTHG, FTAG y Div/Season
+            
+        Returns:
+            DataFrame con las columnas de clasificación
+        """
+        from standings import StandingsIndex
+        
+        self._standings = StandingsIndex(df)
+        columns = self._standings.match_columns(df)
+        
+        df = df.drop(columns=[col for col in columns.columns if col in df.columns])
+        df = pd.concat([df, columns], axis=1)
+        
+        print(f"✓ Clasificaciones calculadas para {len(self._standings.tables)} temporadas")
         
         return df
     
-    def find_value_opportunities(self, min_sample_size: int = 30, min_accuracy: float = 0.60) -> pd.DataFrame:
+    def standings_at(self, team: str, date) -> Optional[dict]:
+        """
+        Clasificación de un equipo antes de los partidos de una fecha.
+        
+        Args:
+            team: Nombre del equipo
+            date: Fecha de la consulta
+            
+        Returns:
+            Diccionario con División, Posición, Puntos, DG, GF y Jugados (None si el
+            equipo no jugó esa temporada)
+        """
+        if self._standings is None:
+            raise ValueError("Debes ejecutar process_all() primero")
+        return self._standings.lookup(team, date)
+    
+    def _build_rolling_state(self, df: pd.DataFrame, window: int) -> None:
+        """
+        Guarda, para cada equipo y condición (local/visitante), los últimos valores de
+        cada estadística (tantos como la mayor ventana) y el numerador/denominador de
+        cada EWMA. Es todo lo que necesita update_rolling_metrics para calcular la
+        forma de los partidos nuevos.
+        
+        Args:
+            df: DataFrame procesado (con las columnas de estadísticas)
+            window: Ventana principal usada en calculate_rolling_metrics
+        """
+        max_window = max([window, *self.rolling_windows])
+        _, groups, values, group_keys = self._form_inputs(df)
+        max_workers = self._rolling_workers(len(df))
+        partitions = self._form_partitions(df, group_keys) if max_workers > 1 else None
+        _, final = partitioned_form_features(groups, values, len(group_keys), [max_window],
+                                             self.ewma_halflives, partitions, max_workers)
+        
+        state = {}
+        ewma_state = {}
+        for g, key in enumerate(group_keys):
+            if key == (None, None) or final['lengths'][g] == 0:
+                continue
+            state[key] = deque(final['tails'][g], maxlen=max_window)
+            ewma_state[key] = (final['num'][g], final['den'][g])
+        
+        self.rolling_window = window
+        self._rolling_state = state
+        self._ewma_state = ewma_state
+    
+    def _build_team_index(self, df: pd.DataFrame) -> None:
+        """
+        Construye el índice de posiciones por equipo: para cada equipo, las filas de
+        self.df (posiciones) de sus partidos como local, como visitante y todos,
+        ordenadas por fecha. "Últimos N partidos" pasa a ser un slice.
+        
+        Args:
+            df: DataFrame procesado (el mismo que self.df)
+        """
+        order = np.argsort(df['Date'].to_numpy(), kind='stable')
+        index = {'home': {}, 'away': {}, 'all': {}}
+        
+        for venue, team_col in (('home', 'HomeTeam'), ('away', 'AwayTeam')):
+            teams = df[team_col].astype('object').to_numpy()[order]
+            codes, uniques = pd.factorize(teams)
+            by_team = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[by_team], np.arange(len(uniques) + 1))
+            for code, team in enumerate(uniques):
+                index[venue][team] = order[by_team[bounds[code]:bounds[code + 1]]]
+        
+        # Posición de cada fila en el orden por fecha, para mezclar local y visitante
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        for team in index['home'].keys() | index['away'].keys():
+            positions = np.concatenate([index['home'].get(team, np.empty(0, dtype=np.int64)),
+                                        index['away'].get(team, np.empty(0, dtype=np.int64))])
+            index['all'][team] = positions[np.argsort(rank[positions], kind='stable')]
+        
+        self._team_index = index
+    
+    def _extend_team_index(self, new_df: pd.DataFrame, start: int) -> None:
+        # Los partidos nuevos se añaden al final de self.df y son los más recientes
+        added = {}
+        rows = zip(range(start, start + len(new_df)),
+                   new_df['HomeTeam'].astype('object'), new_df['AwayTeam'].astype('object'))
+        for pos, home, away in rows:
+            for key in (('home', home), ('all', home), ('away', away), ('all', away)):
+                added.setdefault(key, []).append(pos)
+        
+        for (venue, team), positions in added.items():
+            previous = self._team_index[venue].get(team, np.empty(0, dtype=np.int64))
+            self._team_index[venue][team] = np.concatenate([previous, positions])
+    
+    def team_positions(self, team_name: str, venue: str = 'all', last_n: Optional[int] = None) -> np.ndarray:
+        """
+        Posiciones (filas de self.df) de los partidos de un equipo, de más antiguo a más reciente.
+        
+        Args:
+            team_name: Nombre del equipo
+            venue: 'home', 'away' o 'all'
+            last_n: Si se indica, solo los últimos N partidos
+            
+        Returns:
+            Array de posiciones (vacío si el equipo no existe)
+        """
+        if self._team_index is None:
+            raise ValueError("Debes ejecutar process_all() primero")
+        
+        positions = self._team_index[venue].get(team_name)
+        if positions is None:
+            return np.empty(0, dtype=np.int64)
+        if last_n is None:
+            return positions
+        return positions[max(len(positions) - last_n, 0):]
+    
+    def update_rolling_metrics(self, new_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Añade partidos nuevos a self.df calculando solo sus métricas de forma reciente,
+        a partir del estado por equipo guardado en process_all(). El resultado es el
+        mismo que el de un recálculo completo.
+        
+        Los partidos que ya existen (misma fecha, local y visitante) se descartan.
+        Si algún partido nuevo es anterior al último partido procesado, el orden
+        histórico cambia y se recalculan todas las métricas.
+        
+        Args:
+            new_df: DataFrame con los partidos nuevos (formato football-data)
+            
+        Returns:
+            DataFrame con los partidos añadidos y sus métricas
+        """
+        if self.df is None or self._rolling_state is None:
+            raise ValueError("Debes ejecutar process_all() primero")
+        
+        new_df = self.convert_date_column(new_df)
+        
+        for col in set(self.df.columns) - set(new_df.columns):
+            new_df[col] = np.nan
+        new_df = self._match_dtypes(new_df)
+        
+        # Descartar partidos ya procesados
+        known = pd.MultiIndex.from_frame(self.df[MATCH_KEY])
+        new_df = new_df[~pd.MultiIndex.from_frame(new_df[MATCH_KEY]).isin(known)]
+        
+        if new_df.empty:
+            print("✓ Sin partidos nuevos")
+            return new_df
+        
+        if new_df['Date'].min() < self.df['Date'].max():
+            print("⚠ Hay partidos anteriores al último procesado. Recalculando todo...")
+            columns = self.df.columns
+            combined = unify_categories(pd.concat([self.df, new_df], ignore_index=True))
+            combined = combined.sort_values('Date', kind='mergesort').reset_index(drop=True)
+            self.df = self.calculate_rolling_metrics(combined, window=self.rolling_window,
+                                                     windows=self.rolling_windows,
+                                                     halflives=self.ewma_halflives,
+                                                     max_workers=self._rolling_workers(len(combined)))
+            self.df = self.calculate_elo_ratings(self.df)
+            # Mismo orden de columnas que process_all() (el rolling vuelve a añadir las suyas al final)
+            self.df = self.add_standings(self.df)[columns]
+            self._build_rolling_state(self.df, self.rolling_window)
+            self._build_team_index(self.df)
+            return self.df[self.df.set_index(MATCH_KEY).index.isin(
+                pd.MultiIndex.from_frame(new_df[MATCH_KEY]))]
+        
+        new_df = new_df.reset_index(drop=True)
+        
+        windows = [self.rolling_window] + [w for w in dict.fromkeys(self.rolling_windows)
+                                           if w != self.rolling_window]
+        halflives = list(dict.fromkeys(self.ewma_halflives))
+        decays = 0.5 ** (1.0 / np.asarray(halflives, dtype='float64'))[:, None]
+        n_metrics = len(ROLLING_METRICS)
+        
+        for prefix, team_col, side in ROLLING_SIDES:
+            source_cols = [cols[side] for cols in ROLLING_METRICS.values()]
+            values = new_df[source_cols].to_numpy(dtype='float64')
+            rolled = np.full((len(windows), *values.shape), np.nan)
+            smoothed = np.full((len(halflives), *values.shape), np.nan)
+            
+            for i, team in enumerate(new_df[team_col]):
+                history = self._rolling_state.setdefault(
+                    (prefix, team), deque(maxlen=max(windows)))
+                num, den = self._ewma_state.get(
+                    (prefix, team), (np.zeros((len(halflives), n_metrics)),) * 2)
+                if history:
+                    # Igual que shift(1).rolling(min_periods=1): media de los no nulos
+                    past = np.array(history)
+                    for j, window in enumerate(windows):
+                        rolled[j, i] = np.nanmean(past[-window:], axis=0)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    smoothed[:, i] = num / den
+                
+                present = ~np.isnan(values[i])
+                history.append(values[i])
+                self._ewma_state[(prefix, team)] = (decays * num + np.where(present, values[i], 0.0),
+                                                    decays * den + present)
+            
+            for j, window in enumerate(windows):
+                target_cols = [form_column(prefix, name, window=window,
+                                           primary_window=self.rolling_window)
+                               for name in ROLLING_METRICS]
+                new_df[target_cols] = rolled[j]
+            for j, halflife in enumerate(halflives):
+                new_df[[form_column(prefix, name, halflife=halflife)
+                        for name in ROLLING_METRICS]] = smoothed[j]
+        
+        # Elo: se continúa la pasada desde los ratings del último partido procesado
+        home_elo, away_elo, self._elo_state = self._elo_pass(new_df, state=self._elo_state)
+        new_df['Home_Elo'] = home_elo
+        new_df['Away_Elo'] = away_elo
+        new_df['Elo_Diff'] = home_elo - away_elo
+        
+        # Clasificación: el índice se reconstruye con los partidos nuevos (solo cuentan
+        # los de fechas anteriores, así que las filas ya procesadas no cambian)
+        from standings import StandingsIndex
+        
+        self._standings = StandingsIndex(pd.concat([self.df, new_df[self.df.columns]], ignore_index=True))
+        standings = self._standings.match_columns(new_df)
+        new_df[standings.columns] = standings
+        
+        new_df = self._match_dtypes(new_df)
+        start = len(self.df)
+        self.df = unify_categories(pd.concat([self.df, new_df[self.df.columns]], ignore_index=True))
+        self._extend_team_index(new_df, start)
+        print(f"✓ Añadidos {len(new_df)} partidos nuevos de forma incremental")
+        
+        return new_df
+    
+    def _match_dtypes(self, new_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convierte las columnas numéricas de new_df al tipo que tienen en self.df, para que
+        el concat no las promocione (p. ej. WHH float32 + una columna nueva a NaN float64)
+        y el resultado incremental tenga los mismos tipos que un recálculo completo.
+        
+        Args:
+            new_df: Partidos nuevos con las columnas de self.df
+            
+        Returns:
+            new_df con los tipos de self.df (las categorías las unifica unify_categories)
+        """
+        dtypes = {col: dtype for col, dtype in self.df.dtypes.items()
+                  if col in new_df.columns and pd.api.types.is_numeric_dtype(dtype)
+                  and new_df[col].dtype != dtype}
+        return new_df.astype(dtypes) if dtypes else new_df
+    
+    def update_from_files(self, csv_files: Iterable[Path]) -> pd.DataFrame:
+        """
+        Carga los CSV indicados (p. ej. los devueltos por data_updater.update_data)
+        y añade sus partidos nuevos con update_rolling_metrics.
+        
+        Args:
+            csv_files: Rutas de los archivos actualizados
+            
+        Returns:
+            DataFrame con los partidos añadidos y sus métricas
+        """
+        csv_files = list(csv_files)
+        if not csv_files:
+            return self.df.iloc[0:0]
+        
+        with self.profiler.stage('actualizacion') as stage:
+            added = self.update_rolling_metrics(self._read_csv_files(csv_files))
+            stage.rows_out = len(added)
+        
+        return added
+    
+    def find_value_opportunities(self, min_sample_size: int = 30, min_accuracy: float = 0.60,
+                                 metric_thresholds: Optional[dict] = None,
+                                 grid_size: Optional[int] = None, bootstrap: int = 0,
+                                 confidence: float = 0.95, min_ev_lower: Optional[float] = None,
+                                 sort_by: str = 'EV', seed: Optional[int] = None) -> pd.DataFrame:
         """
         Busca automáticamente patrones con valor esperado positivo.
-        Itera sobre diferentes umbrales de estadísticas y calcula el EV.
+        Evalúa todos los umbrales de estadísticas a la vez y calcula el EV.
+        
+        Se construye una matriz de condiciones (patrones × partidos) y una de
+        resultados (eventos × partidos); aciertos, muestras y cuotas medias de
+        todas las combinaciones salen de unos pocos productos matriciales.
         
         Args:
             min_sample_size: Tamaño mínimo de muestra (n) para considerar un patrón
             min_accuracy: Porcentaje mínimo de acierto (0.60 = 60%)
+            metric_thresholds: Umbrales a probar por métrica (default: DEFAULT_METRIC_THRESHOLDS)
+            grid_size: Si se indica, se prueban `grid_size` umbrales por métrica tomados
+                de los cuantiles de su distribución (ignora metric_thresholds)
+            bootstrap: Número de remuestreos bootstrap (0 = sin intervalos). Añade las
+                columnas 'EV IC Inf', 'EV IC Sup' y 'p-valor' (probabilidad de EV <= 0)
+            confidence: Nivel de confianza del intervalo (0.95 = 95%)
+            min_ev_lower: Si se indica, descarta los patrones con 'EV IC Inf' menor
+            sort_by: Columna de orden descendente: 'EV' o 'EV IC Inf'
+            seed: Semilla del bootstrap (resultados reproducibles)
             
         Returns:
-            DataFrame con oportunidades encontradas ordenadas por EV descendente
+            DataFrame con oportunidades encontradas ordenadas por `sort_by` descendente
         """
         if self.df is None:
             raise ValueError("Debes ejecutar process_all() primero")
         
-        df = self.df.copy()
+        if sort_by not in ('EV', 'EV IC Inf'):
+            raise ValueError(f"Orden desconocido: {sort_by}")
+        if (sort_by == 'EV IC Inf' or min_ev_lower is not None) and bootstrap <= 0:
+            raise ValueError("Ordenar o filtrar por 'EV IC Inf' requiere bootstrap > 0")
+        
+        df = self.df
         
         # Filtrar solo partidos con métricas válidas y cuotas
         required_cols = ['FTHG', 'FTAG', 'FTR', 'B365H', 'B365D', 'B365A', 'B365>2.5']
@@ -305,133 +1416,161 @@ class FootballDataProcessor:
         # Eliminar filas con valores nulos en columnas críticas
         df = df.dropna(subset=['FTHG', 'FTAG', 'Date'])
         
-        opportunities = []
-        
-        # Definir umbrales a probar para diferentes métricas
-        metric_thresholds = {
-            'Home_Rolling_Goals': [0.5, 1.0, 1.5, 2.0, 2.5],
-            'Home_Rolling_Shots': [8, 10, 12, 14, 16, 18],
-            'Home_Rolling_ShotsOnTarget': [3, 4, 5, 6, 7],
-            'Away_Rolling_Goals': [0.5, 1.0, 1.5, 2.0, 2.5],
-            'Away_Rolling_Shots': [8, 10, 12, 14, 16, 18],
-            'Away_Rolling_ShotsOnTarget': [3, 4, 5, 6, 7],
-        }
-        
-        # Eventos a analizar
-        events = [
-            {
-                'name': 'Victoria Local',
-                'condition': lambda d: d['FTR'] == 'H',
-                'odds_col': 'B365H'
-            },
-            {
-                'name': 'Empate',
-                'condition': lambda d: d['FTR'] == 'D',
-                'odds_col': 'B365D'
-            },
-            {
-                'name': 'Victoria Visitante',
-                'condition': lambda d: d['FTR'] == 'A',
-                'odds_col': 'B365A'
-            },
-            {
-                'name': 'Más de 2.5 goles',
-                'condition': lambda d: (d['FTHG'] + d['FTAG']) > 2.5,
-                'odds_col': 'B365>2.5'
-            },
-            {
-                'name': 'Menos de 2.5 goles',
-                'condition': lambda d: (d['FTHG'] + d['FTAG']) < 2.5,
-                'odds_col': 'B365<2.5'
-            },
-            {
-                'name': 'Ambos equipos marcan',
-                'condition': lambda d: (d['FTHG'] > 0) & (d['FTAG'] > 0),
-                'odds_col': 'B365>2.5'  # Aproximación, usar cuota de más de 2.5 como proxy
-            }
-        ]
+        if grid_size is not None:
+            metric_thresholds = quantile_thresholds(df, DEFAULT_METRIC_THRESHOLDS, grid_size)
+        elif metric_thresholds is None:
+            metric_thresholds = DEFAULT_METRIC_THRESHOLDS
         
         print(f"\n🔍 Buscando oportunidades de valor...")
         print(f"   Muestra mínima: {min_sample_size} partidos")
         print(f"   Acierto mínimo: {min_accuracy*100:.0f}%")
         
-        # Iterar sobre cada métrica y umbral
-        for metric_col, thresholds in metric_thresholds.items():
-            if metric_col not in df.columns:
-                continue
+        with self.profiler.stage('oportunidades', rows_in=len(df)) as stage:
+            patterns, conditions = build_condition_matrix(df, metric_thresholds)
+            event_names, outcomes, valid_odds, odds = build_event_matrices(df)
+            stats = score_conditions(conditions, outcomes, valid_odds, odds)
             
-            for threshold in thresholds:
-                # Filtrar partidos que cumplen la condición
-                filtered = df[df[metric_col] >= threshold].copy()
-                
-                if len(filtered) < min_sample_size:
-                    continue
-                
-                # Probar cada evento
-                for event in events:
-                    odds_col = event['odds_col']
-                    
-                    if odds_col not in filtered.columns:
-                        continue
-                    
-                    # Calcular resultados
-                    try:
-                        event_occurred = event['condition'](filtered)
-                        n_matches = len(filtered)
-                        n_success = event_occurred.sum()
-                        
-                        if n_matches < min_sample_size:
-                            continue
-                        
-                        # Probabilidad real
-                        real_probability = n_success / n_matches
-                        
-                        if real_probability < min_accuracy:
-                            continue
-                        
-                        # Obtener cuotas válidas (eliminar NaN e infinitos)
-                        valid_odds = filtered[odds_col].dropna()
-                        valid_odds = valid_odds[np.isfinite(valid_odds)]
-                        
-                        if len(valid_odds) == 0:
-                            continue
-                        
-                        # Filtrar cuotas razonables (entre 1.01 y 100)
-                        valid_odds = valid_odds[(valid_odds >= 1.01) & (valid_odds <= 100)]
-                        
-                        if len(valid_odds) == 0:
-                            continue
-                        
-                        avg_odds = valid_odds.mean()
-                        
-                        # Calcular EV: EV = (Probabilidad_Real * Cuota_Media) - 1
-                        ev = (real_probability * avg_odds) - 1
-                    except Exception as e:
-                        # Continuar con el siguiente patrón si hay error
-                        continue
-                    
-                    # Guardar oportunidad
-                    opportunities.append({
-                        'Patrón': f"{metric_col} >= {threshold}",
-                        'Evento': event['name'],
-                        'Muestra (n)': n_matches,
-                        'Aciertos': n_success,
-                        'Probabilidad Real': f"{real_probability*100:.2f}%",
-                        'Cuota Media': f"{avg_odds:.2f}",
-                        'EV': ev,
-                        'EV %': f"{ev*100:.2f}%"
-                    })
-        
-        # Crear DataFrame y ordenar por EV descendente
-        if opportunities:
-            opportunities_df = pd.DataFrame(opportunities)
-            opportunities_df = opportunities_df.sort_values('EV', ascending=False)
+            opportunities_df = opportunities_table(patterns, event_names, stats,
+                                                   min_sample_size, min_accuracy)
+            
+            if bootstrap > 0:
+                rows, cols = opportunity_pairs(stats, min_sample_size, min_accuracy)
+                print(f"   Bootstrap: {bootstrap} remuestreos, IC {confidence*100:.0f}%")
+                intervals = bootstrap_ev(conditions, outcomes, valid_odds, odds, rows, cols,
+                                         n_resamples=bootstrap, confidence=confidence, seed=seed)
+                opportunities_df['EV IC Inf'] = intervals['lower']
+                opportunities_df['EV IC Sup'] = intervals['upper']
+                opportunities_df['p-valor'] = intervals['p_value']
+            
+                if min_ev_lower is not None:
+                    opportunities_df = opportunities_df[opportunities_df['EV IC Inf'] >= min_ev_lower]
+            
+            stage.rows_out = len(opportunities_df)
+        
+        if len(opportunities_df) > 0:
+            opportunities_df = opportunities_df.sort_values(sort_by, ascending=False)
             print(f"\n✓ Encontradas {len(opportunities_df)} oportunidades")
-            return opportunities_df
         else:
             print("\n⚠ No se encontraron oportunidades que cumplan los criterios")
-            return pd.DataFrame(columns=['Patrón', 'Evento', 'Muestra (n)', 'Aciertos', 
-                                         'Probabilidad Real', 'Cuota Media', 'EV', 'EV %'])
+        
+        return opportunities_df
+    
+    def sweep_value_thresholds(self, min_sample_size: int = 30, min_accuracy: float = 0.60,
+                               metrics: Optional[Iterable[str]] = None) -> tuple:
+        """
+        Barrido exhaustivo de umbrales: prueba como corte cada valor distinto de cada métrica.
+        
+        Para cada métrica se ordenan los partidos una sola vez; con sumas acumuladas
+        (desde el valor más alto) de aciertos y cuotas válidas se obtiene el EV de
+        todos los umbrales de todos los eventos en O(n log n).
+        
+        Args:
+            min_sample_size: Tamaño mínimo de muestra (n) para los mejores cortes
+            min_accuracy: Porcentaje mínimo de acierto para los mejores cortes
+            metrics: Métricas a barrer (default: las de DEFAULT_METRIC_THRESHOLDS)
+            
+        Returns:
+            Tupla (curvas, mejores):
+            - curvas: una fila por (métrica, evento, umbral) con n, aciertos, cuota media y EV
+            - mejores: el mejor corte por (métrica, evento) que cumple las restricciones,
+              con el formato de find_value_opportunities, ordenado por EV descendente
+        """
+        if self.df is None:
+            raise ValueError("Debes ejecutar process_all() primero")
+        
+        df = self.df.dropna(subset=['FTHG', 'FTAG', 'Date'])
+        if metrics is None:
+            metrics = DEFAULT_METRIC_THRESHOLDS.keys()
+        
+        event_names, outcomes, valid_odds, odds = build_event_matrices(df)
+        curves = []
+        
+        for metric_col in metrics:
+            if metric_col not in df.columns:
+                continue
+            values = df[metric_col].to_numpy(dtype='float64')
+            present = ~np.isnan(values)
+            if not present.any():
+                continue
+            
+            order = np.flatnonzero(present)[np.argsort(values[present], kind='stable')]
+            sorted_values = values[order]
+            thresholds, first = np.unique(sorted_values, return_index=True)
+            # Partidos con métrica >= umbral = sufijo del orden ascendente
+            n = len(order) - first
+            
+            for k, event_name in enumerate(event_names):
+                hits = _suffix_sums(outcomes[k, order])[first]
+                n_odds = _suffix_sums(valid_odds[k, order].astype('float64'))[first]
+                odds_sum = _suffix_sums(odds[k, order])[first]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    probability = hits / n
+                    avg_odds = odds_sum / n_odds
+                
+                curves.append(pd.DataFrame({
+                    'Métrica': metric_col,
+                    'Evento': event_name,
+                    'Umbral': thresholds,
+                    'Muestra (n)': n,
+                    'Aciertos': hits.astype(int),
+                    'Probabilidad': probability,
+                    'Cuota Media': avg_odds,
+                    'EV': probability * avg_odds - 1,
+                }))
+        
+        if not curves:
+            return pd.DataFrame(), pd.DataFrame(columns=OPPORTUNITY_COLUMNS)
+        
+        curves_df = pd.concat(curves, ignore_index=True)
+        
+        eligible = curves_df[(curves_df['Muestra (n)'] >= min_sample_size)
+                             & (curves_df['Probabilidad'] >= min_accuracy)
+                             & curves_df['EV'].notna()]
+        best = eligible.loc[eligible.groupby(['Métrica', 'Evento'], sort=False)['EV'].idxmax()]
+        best = best.sort_values('EV', ascending=False)
+        
+        best_df = pd.DataFrame({
+            # repr: el umbral exacto del corte (con :g, 6.1999998 y 6.2 se verían iguales)
+            'Patrón': [f"{m} >= {float(t)!r}" for m, t in zip(best['Métrica'], best['Umbral'])],
+            'Evento': best['Evento'].to_numpy(),
+            'Muestra (n)': best['Muestra (n)'].to_numpy(),
+            'Aciertos': best['Aciertos'].to_numpy(),
+            'Probabilidad Real': [f"{x*100:.2f}%" for x in best['Probabilidad']],
+            'Cuota Media': [f"{x:.2f}" for x in best['Cuota Media']],
+            'EV': best['EV'].to_numpy(),
+            'EV %': [f"{x*100:.2f}%" for x in best['EV']],
+        })
+        
+        print(f"✓ Barrido de umbrales: {len(curves_df)} cortes evaluados, {len(best_df)} óptimos")
+        
+        return curves_df, best_df
+    
+    def mine_value_patterns(self, min_sample_size: int = 30, min_accuracy: float = 0.60,
+                            max_conditions: int = 3, time_budget: Optional[float] = None,
+                            **kwargs) -> pd.DataFrame:
+        """
+        Busca patrones de valor combinando 2 y 3 condiciones (>= y <=).
+        Ver pattern_miner.mine_value_patterns.
+        
+        Args:
+            min_sample_size: Tamaño mínimo de muestra (n) para considerar un patrón
+            min_accuracy: Porcentaje mínimo de acierto (0.60 = 60%)
+            max_conditions: Número máximo de condiciones por patrón
+            time_budget: Segundos máximos de búsqueda (None = sin límite)
+            **kwargs: Resto de opciones de pattern_miner.mine_value_patterns
+            
+        Returns:
+            DataFrame con oportunidades encontradas ordenadas por EV descendente
+        """
+        if self.df is None:
+            raise ValueError("Debes ejecutar process_all() primero")
+        
+        # Import local: pattern_miner reutiliza las funciones de este módulo
+        from pattern_miner import mine_value_patterns
+        
+        return mine_value_patterns(self.df, min_sample_size=min_sample_size,
+                                   min_accuracy=min_accuracy, max_conditions=max_conditions,
+                                   time_budget=time_budget, **kwargs)
     
     def get_team_current_stats(self, team_name: str, as_home: bool = True, last_n: int = 5) -> dict:
         """
@@ -448,37 +1587,52 @@ class FootballDataProcessor:
         if self.df is None:
             raise ValueError("Debes ejecutar process_all() primero")
         
-        df = self.df.copy()
+        if self._team_index is None:
+            self._build_team_index(self.df)
         
-        # Filtrar partidos del equipo
-        if as_home:
-            team_matches = df[df['HomeTeam'] == team_name].copy()
-            prefix = 'Home'
-        else:
-            team_matches = df[df['AwayTeam'] == team_name].copy()
-            prefix = 'Away'
+        # Últimos N partidos del equipo: slice del índice, sin copiar ni ordenar self.df
+        positions = self.team_positions(team_name, 'home' if as_home else 'away', last_n)
         
-        if len(team_matches) == 0:
+        if len(positions) == 0:
             return {}
         
-        # Ordenar por fecha descendente y tomar últimos N
-        team_matches = team_matches.sort_values('Date', ascending=False).head(last_n)
-        
-        if len(team_matches) == 0:
-            return {}
+        def average(home_col: str, away_col: str) -> float:
+            col = home_col if as_home else away_col
+            if col not in self.df.columns:
+                return 0
+            # Promedio en float64 (las columnas son float32): mismos valores que los umbrales.
+            # Como Series.mean: ignora los nulos y devuelve NaN si no hay ninguno
+            values = self.df[col].to_numpy()[positions].astype('float64')
+            values = values[~np.isnan(values)]
+            return values.mean() if len(values) else np.nan
         
-        # Calcular promedios
         stats = {
-            'Goles': team_matches[f'FTHG' if as_home else 'FTAG'].mean() if len(team_matches) > 0 else 0,
-            'Tiros': team_matches[f'HS' if as_home else 'AS'].mean() if f'HS' in team_matches.columns else 0,
-            'Tiros a Puerta': team_matches[f'HST' if as_home else 'AST'].mean() if f'HST' in team_matches.columns else 0,
-            'Faltas': team_matches[f'HF' if as_home else 'AF'].mean() if f'HF' in team_matches.columns else 0,
-            'Corners': team_matches[f'HC' if as_home else 'AC'].mean() if f'HC' in team_matches.columns else 0,
-            'Partidos Analizados': len(team_matches)
+            'Goles': average('FTHG', 'FTAG'),
+            'Tiros': average('HS', 'AS'),
+            'Tiros a Puerta': average('HST', 'AST'),
+            'Faltas': average('HF', 'AF'),
+            'Corners': average('HC', 'AC'),
+            'Partidos Analizados': len(positions)
         }
         
         return stats
     
+    def compile_patterns(self, value_patterns_df: pd.DataFrame) -> 'PatternIndex':
+        """
+        Compila (una sola vez por DataFrame) los patrones de valor en un PatternIndex.
+        
+        Args:
+            value_patterns_df: DataFrame con patrones de valor (resultado de find_value_opportunities)
+            
+        Returns:
+            PatternIndex reutilizable; si se pasa el mismo DataFrame se devuelve el ya compilado
+        """
+        cached_df, cached_index = self._pattern_index
+        if cached_df is not value_patterns_df:
+            cached_index = PatternIndex(value_patterns_df)
+            self._pattern_index = (value_patterns_df, cached_index)
+        return cached_index
+    
     def match_patterns_with_current_stats(self, home_stats: dict, away_stats: dict, 
                                           value_patterns_df: pd.DataFrame) -> list:
         """
@@ -492,95 +1646,35 @@ class FootballDataProcessor:
         Returns:
             Lista de coincidencias encontradas
         """
-        matches = []
-        
         if value_patterns_df is None or len(value_patterns_df) == 0:
-            return matches
-        
-        # Mapeo de nombres de estadísticas a columnas del DataFrame
-        stat_mapping = {
-            'Goles': 'Rolling_Goals',
-            'Tiros': 'Rolling_Shots',
-            'Tiros a Puerta': 'Rolling_ShotsOnTarget',
-            'Faltas': 'Rolling_Fouls',
-            'Corners': 'Rolling_Corners'
-        }
+            return []
         
-        # Mapeo inverso para buscar estadísticas en los diccionarios
-        reverse_stat_mapping = {
-            'Rolling_Goals': 'Goles',
-            'Rolling_Shots': 'Tiros',
-            'Rolling_ShotsOnTarget': 'Tiros a Puerta',
-            'Rolling_Fouls': 'Faltas',
-            'Rolling_Corners': 'Corners'
-        }
+        return self.compile_patterns(value_patterns_df).score([home_stats], [away_stats])[0]
+    
+    def match_fixtures(self, fixtures, value_patterns_df: pd.DataFrame, last_n: int = 5) -> list:
+        """
+        Puntúa una jornada completa contra los patrones de valor en una sola llamada.
         
-        # Iterar sobre cada patrón de valor
-        for _, pattern_row in value_patterns_df.iterrows():
-            pattern_str = pattern_row['Patrón']
-            event = pattern_row['Evento']
-            ev = pattern_row['EV']
-            
-            # Solo considerar patrones con EV positivo
-            if ev <= 0:
-                continue
+        Args:
+            fixtures: Lista de pares (local, visitante) o DataFrame con HomeTeam y AwayTeam
+            value_patterns_df: DataFrame con patrones de valor (resultado de find_value_opportunities)
+            last_n: Número de partidos para las estadísticas actuales de cada equipo
             
-            # Extraer métrica y umbral del patrón
-            # Formato esperado: "Home_Rolling_Goals >= 1.5" o "Away_Rolling_Shots >= 12"
-            try:
-                if 'Home_' in pattern_str:
-                    metric_part = pattern_str.replace('Home_', '').split(' >= ')
-                    if len(metric_part) == 2:
-                        metric_name = metric_part[0]
-                        threshold = float(metric_part[1])
-                        
-                        # Buscar estadística correspondiente en home_stats
-                        stat_key = reverse_stat_mapping.get(metric_name)
-                        if stat_key and stat_key in home_stats:
-                            stat_value = home_stats[stat_key]
-                            if stat_value >= threshold:
-                                matches.append({
-                                    'Tipo': 'Local',
-                                    'Estadística': stat_key,
-                                    'Valor Actual': stat_value,
-                                    'Umbral Patrón': threshold,
-                                    'Evento': event,
-                                    'EV': ev,
-                                    'EV %': pattern_row['EV %'],
-                                    'Probabilidad Real': pattern_row['Probabilidad Real'],
-                                    'Muestra Histórica': pattern_row['Muestra (n)']
-                                })
-                
-                elif 'Away_' in pattern_str:
-                    metric_part = pattern_str.replace('Away_', '').split(' >= ')
-                    if len(metric_part) == 2:
-                        metric_name = metric_part[0]
-                        threshold = float(metric_part[1])
-                        
-                        # Buscar estadística correspondiente en away_stats
-                        stat_key = reverse_stat_mapping.get(metric_name)
-                        if stat_key and stat_key in away_stats:
-                            stat_value = away_stats[stat_key]
-                            if stat_value >= threshold:
-                                matches.append({
-                                    'Tipo': 'Visitante',
-                                    'Estadística': stat_key,
-                                    'Valor Actual': stat_value,
-                                    'Umbral Patrón': threshold,
-                                    'Evento': event,
-                                    'EV': ev,
-                                    'EV %': pattern_row['EV %'],
-                                    'Probabilidad Real': pattern_row['Probabilidad Real'],
-                                    'Muestra Histórica': pattern_row['Muestra (n)']
-                                })
-            except Exception as e:
-                # Continuar con el siguiente patrón si hay error
-                continue
+        Returns:
+            Lista (una entrada por partido, en el mismo orden) de listas de coincidencias
+        """
+        if isinstance(fixtures, pd.DataFrame):
+            fixtures = list(zip(fixtures['HomeTeam'], fixtures['AwayTeam']))
+        
+        if value_patterns_df is None or len(value_patterns_df) == 0:
+            return [[] for _ in fixtures]
         
-        # Ordenar por EV descendente
-        matches.sort(key=lambda x: x['EV'], reverse=True)
+        home_stats = [self.get_team_current_stats(home, as_home=True, last_n=last_n)
+                      for home, _ in fixtures]
+        away_stats = [self.get_team_current_stats(away, as_home=False, last_n=last_n)
+                      for _, away in fixtures]
         
-        return matches
+        return self.compile_patterns(value_patterns_df).score(home_stats, away_stats)
     
     def process_all(self) -> pd.DataFrame:
         """
@@ -593,14 +1687,43 @@ class FootballDataProcessor:
         print("PROCESAMIENTO DE DATOS DE FÚTBOL")
         print("=" * 60)
         
-        # 1. Cargar y concatenar datos
-        self.df = self.load_and_concat_data()
-        
-        # 2. Convertir fechas
-        self.df = self.convert_date_column(self.df)
-        
-        # 3. Calcular métricas de forma reciente
-        self.df = self.calculate_rolling_metrics(self.df)
+        with self.profiler.stage('process_all') as total:
+            # 1. Cargar y concatenar datos
+            with self.profiler.stage('carga') as stage:
+                self.df = self.load_and_concat_data()
+                stage.rows_out = len(self.df)
+            
+            # 2. Convertir fechas
+            with self.profiler.stage('fechas', rows_in=len(self.df)) as stage:
+                self.df = self.convert_date_column(self.df)
+                stage.rows_out = len(self.df)
+            
+            # 3. Calcular métricas de forma reciente
+            with self.profiler.stage('rolling', rows_in=len(self.df)) as stage:
+                self.df = self.calculate_rolling_metrics(self.df, window=self.rolling_window,
+                                                         windows=self.rolling_windows,
+                                                         halflives=self.ewma_halflives,
+                                                         max_workers=self._rolling_workers(len(self.df)))
+                stage.rows_out = len(self.df)
+            
+            # 4. Ratings Elo previos a cada partido
+            with self.profiler.stage('elo', rows_in=len(self.df)) as stage:
+                self.df = self.calculate_elo_ratings(self.df)
+                stage.rows_out = len(self.df)
+            
+            with self.profiler.stage('estado_incremental', rows_in=len(self.df)):
+                self._build_rolling_state(self.df, self.rolling_window)
+            
+            # 5. Clasificación antes de cada partido
+            with self.profiler.stage('clasificacion', rows_in=len(self.df)) as stage:
+                self.df = self.add_standings(self.df)
+                stage.rows_out = len(self.df)
+            
+            # 6. Índice de partidos por equipo
+            with self.profiler.stage('indice_equipos', rows_in=len(self.df)):
+                self._build_team_index(self.df)
+            
+            total.rows_out = len(self.df)
         
         print("\n" + "=" * 60)
         print("✓ PROCESAMIENTO COMPLETADO")
@@ -608,28 +1731,216 @@ class FootballDataProcessor:
         print(f"\nDataFrame final: {len(self.df)} partidos")
         print(f"Columnas: {len(self.df.columns)}")
         print(f"\nColumnas de métricas creadas:")
-        metric_cols = [col for col in self.df.columns if 'Rolling' in col]
+        metric_cols = [col for col in self.df.columns
+                       if 'Rolling' in col or 'EWMA' in col or col in ELO_COLUMNS
+                       or col.endswith(('_Position', '_Table_Points'))]
         for col in metric_cols:
             print(f"  - {col}")
         
         return self.df
 
 
-def main():
-    """Función principal para ejecutar el procesador."""
-    processor = FootballDataProcessor(data_dir="DATOS")
+def benchmark_memory(data_dir: str = "DATOS") -> pd.DataFrame:
+    """
+    Compara memoria pico, tiempo y tamaño del DataFrame entre la carga anterior
+    (todas las columnas, texto como object y números como float64) y process_all().
+    
+    Args:
+        data_dir: Directorio con los CSV
+        
+    Returns:
+        DataFrame con una fila por caso
+    """
+    import contextlib
+    import io
+    
+    from ingestion import _legacy_load, _measure
+    
+    files = match_files(Path(data_dir))
+    
+    def run_pipeline() -> pd.DataFrame:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return FootballDataProcessor(data_dir, use_cache=False).process_all()
+    
+    rows = [
+        {'caso': 'carga anterior (utf-8, todas las columnas)', **_measure(lambda: _legacy_load(files, 'utf-8'))},
+        {'caso': 'process_all (tipos compactos)', **_measure(run_pipeline)},
+    ]
+    
+    # El mismo resultado con la representación anterior (object / float64)
+    processed = run_pipeline()
+    expanded = processed.astype({col: 'object' for col in processed.columns
+                                 if isinstance(processed[col].dtype, pd.CategoricalDtype)
+                                 or processed[col].dtype == 'str'})
+    expanded = expanded.astype({col: 'float64' for col in expanded.columns
+                                if expanded[col].dtype == 'float32'})
+    for name, frame in (('resultado con tipos anteriores', expanded),
+                        ('resultado con tipos compactos', processed)):
+        rows.append({'caso': name, 'df_mb': round(frame.memory_usage(deep=True).sum() / 2**20, 1),
+                     'filas': len(frame), 'columnas': len(frame.columns)})
+    
+    return pd.DataFrame(rows)
+
+
+def run_batch(data_dir: str = "DATOS", output_dir: Optional[str] = None, use_cache: bool = True,
+              rolling_windows: Iterable[int] = (), ewma_halflives: Iterable[float] = (),
+              min_sample_size: int = 30, min_accuracy: float = 0.60,
+              grid_size: Optional[int] = None, bootstrap: int = 0, seed: Optional[int] = None,
+              profiler: Optional[StageProfiler] = None, max_workers: Optional[int] = None) -> dict:
+    """
+    Pipeline completo sin interfaz: carga, fechas, métricas de forma y búsqueda de
+    oportunidades. Guarda la tabla procesada y la de oportunidades como artefactos
+    Arrow IPC para que la app los sirva sin recalcular.
+    
+    Args:
+        data_dir: Directorio con los CSV
+        output_dir: Directorio de los artefactos (default: data_dir/procesado)
+        use_cache: Usar la caché Arrow de CSV parseados
+        rolling_windows: Ventanas adicionales a la principal
+        ewma_halflives: Semividas de las medias exponenciales
+        min_sample_size: Tamaño mínimo de muestra de find_value_opportunities
+        min_accuracy: Porcentaje mínimo de acierto de find_value_opportunities
+        grid_size: Umbrales por cuantiles (None = DEFAULT_METRIC_THRESHOLDS)
+        bootstrap: Remuestreos bootstrap de los intervalos de EV (0 = sin intervalos)
+        seed: Semilla del bootstrap
+        profiler: StageProfiler para medir las etapas (default: uno activado sin memoria)
+        max_workers: Procesos para el rolling por ligas (default: automático)
+        
+    Returns:
+        Resumen serializable en JSON: filas, oportunidades, rutas y tiempos por etapa
+    """
+    if profiler is None:
+        profiler = StageProfiler()
+    if output_dir is None:
+        output_dir = Path(data_dir) / ARTIFACTS_DIRNAME
+    
+    processor = FootballDataProcessor(data_dir=data_dir, use_cache=use_cache,
+                                      rolling_windows=rolling_windows, ewma_halflives=ewma_halflives,
+                                      profiler=profiler, max_workers=max_workers)
+    # Fuentes antes de procesar: si un CSV cambia durante el lote, el artefacto queda obsoleto
+    sources = match_files(processor.data_dir)
     df = processor.process_all()
+    opportunities_df = processor.find_value_opportunities(min_sample_size=min_sample_size,
+                                                          min_accuracy=min_accuracy,
+                                                          grid_size=grid_size, bootstrap=bootstrap,
+                                                          seed=seed)
     
-    # Mostrar muestra de datos
-    print("\n" + "=" * 60)
-    print("MUESTRA DE DATOS PROCESADOS")
-    print("=" * 60)
-    print(df[['Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 
-              'Home_Rolling_Goals', 'Away_Rolling_Goals']].head(10))
+    summary = {
+        'partidos': len(df),
+        'columnas': len(df.columns),
+        'equipos': int(pd.concat([df['HomeTeam'], df['AwayTeam']]).nunique()),
+        'desde': df['Date'].min().date().isoformat() if len(df) else None,
+        'hasta': df['Date'].max().date().isoformat() if len(df) else None,
+        'oportunidades': len(opportunities_df),
+        'parametros': {
+            'min_sample_size': min_sample_size,
+            'min_accuracy': min_accuracy,
+            'grid_size': grid_size,
+            'bootstrap': bootstrap,
+            'rolling_windows': list(processor.rolling_windows),
+            'ewma_halflives': list(processor.ewma_halflives),
+            'max_workers': processor._rolling_workers(len(df)),
+        },
+    }
     
-    return df
+    with profiler.stage('artefactos', rows_in=len(df)):
+        paths = write_artifacts({'partidos': df, 'oportunidades': opportunities_df},
+                                output_dir, sources, summary)
+    
+    summary['artefactos'] = {name: str(path) for name, path in paths.items()}
+    summary['etapas'] = {record['stage']: record['wall_s'] for record in profiler.records}
+    summary['peak_rss_mb'] = peak_rss_mb()
+    return summary
 
 
-if __name__ == "__main__":
-    df = main()
+def main(argv: Optional[list] = None) -> int:
+    """
+    Función principal para ejecutar el procesador.
+    
+    Sin --batch muestra una muestra de los datos procesados. Con --batch ejecuta el
+    pipeline completo, guarda los artefactos y escribe en stdout un resumen JSON
+    (los mensajes de progreso van a stderr).
+    
+    Args:
+        argv: Argumentos de línea de comandos (default: sys.argv)
+        
+    Returns:
+        Código de salida (0 = correcto)
+    """
+    import argparse
+    import contextlib
+    import json
+    import sys
+    
+    parser = argparse.ArgumentParser(description="Procesador de datos de football-data.co.uk")
+    parser.add_argument("--data-dir", default="DATOS", help="Directorio con los CSV")
+    parser.add_argument("--batch", action="store_true",
+                        help="Ejecutar el pipeline completo y guardar los artefactos")
+    parser.add_argument("--output", default=None,
+                        help="Directorio de los artefactos (default: <data-dir>/procesado)")
+    parser.add_argument("--no-cache", action="store_true", help="No usar la caché Arrow de CSV")
+    parser.add_argument("--windows", type=int, nargs="*", default=[],
+                        help="Ventanas rolling adicionales (p. ej. 3 10)")
+    parser.add_argument("--halflives", type=float, nargs="*", default=[],
+                        help="Semividas EWMA (p. ej. 3)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos para el rolling por ligas (default: automático)")
+    parser.add_argument("--min-sample-size", type=int, default=30)
+    parser.add_argument("--min-accuracy", type=float, default=0.60)
+    parser.add_argument("--grid-size", type=int, default=None,
+                        help="Umbrales por cuantiles en lugar de los predefinidos")
+    parser.add_argument("--bootstrap", type=int, default=0,
+                        help="Remuestreos bootstrap de los intervalos de EV")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--profile-report", default=None,
+                        help="Guardar el informe de etapas en este JSON")
+    parser.add_argument("--profile-stage", default=None,
+                        help="Volcar un perfil cProfile de esta etapa")
+    parser.add_argument("--memory", action="store_true",
+                        help="Medir el pico de memoria de cada etapa (tracemalloc)")
+    parser.add_argument("--benchmark-memory", action="store_true",
+                        help="Comparar la memoria de la carga anterior con process_all y salir")
+    args = parser.parse_args(argv)
+    
+    if args.benchmark_memory:
+        print(benchmark_memory(args.data_dir).to_string(index=False))
+        return 0
+    
+    if not args.batch:
+        processor = FootballDataProcessor(data_dir=args.data_dir, use_cache=not args.no_cache,
+                                          rolling_windows=args.windows, ewma_halflives=args.halflives,
+                                          max_workers=args.workers)
+        df = processor.process_all()
+        
+        # Mostrar muestra de datos
+        print("\n" + "=" * 60)
+        print("MUESTRA DE DATOS PROCESADOS")
+        print("=" * 60)
+        print(df[['Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 
+                  'Home_Rolling_Goals', 'Away_Rolling_Goals']].head(10))
+        return 0
+    
+    profiler = StageProfiler(trace_memory=args.memory, profile_stage=args.profile_stage,
+                             profile_dir=args.output or ".")
+    try:
+        # stdout queda reservado para el resumen JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = run_batch(args.data_dir, args.output, use_cache=not args.no_cache,
+                                rolling_windows=args.windows, ewma_halflives=args.halflives,
+                                min_sample_size=args.min_sample_size, min_accuracy=args.min_accuracy,
+                                grid_size=args.grid_size, bootstrap=args.bootstrap, seed=args.seed,
+                                profiler=profiler, max_workers=args.workers)
+        summary = {'ok': True, **summary}
+    except Exception as e:
+        summary = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    finally:
+        if args.profile_report:
+            profiler.save_report(args.profile_report)
+        profiler.close()
+    
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0 if summary['ok'] else 1
 
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -17,6 +17,7 @@ def update_data():
     data_dir.mkdir(exist_ok=True)
     
     headers = {'User-Agent': 'Mozilla/5.0'}
+    updated_files = []
     
     print(f"📚 Verificando Base de Datos Histórica (2004 - 2026)...")
     
@@ -41,6 +42,7 @@ def update_data():
                 if r.status_code == 200:
                     with open(filepath, 'wb') as f:
                         f.write(r.content)
+                    updated_files.append(filepath)
                 else:
                     print(f"   ❌ No encontrado (Posiblemente aún no existe): {season}")
                 time.sleep(0.5) # Pausa para no saturar su servidor
@@ -48,6 +50,9 @@ def update_data():
                 print(f"⚠️ Error en {filename}: {e}")
 
     print("\n✅ Base de datos actualizada.")
+    # Archivos descargados: permiten a FootballDataProcessor.update_from_files
+    # añadir solo los partidos nuevos sin reprocesar todo el histórico
+    return updated_files
 
 if __name__ == "__main__":
     update_data()
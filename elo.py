@@ -0,0 +1,102 @@
+"""
+Ratings Elo de equipos
+Una pasada cronológica por los partidos: cada partido recibe el rating de ambos equipos
+antes de jugarse (sin fuga de información) y después actualiza los dos en O(1)
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+ELO_INITIAL = 1500.0
+# Factor K y ventaja de jugar en casa, en puntos Elo (valores habituales en fútbol de clubes)
+ELO_K = 20.0
+ELO_HOME_ADVANTAGE = 60.0
+
+# Columnas que añade FootballDataProcessor.calculate_elo_ratings
+ELO_COLUMNS = ['Home_Elo', 'Away_Elo', 'Elo_Diff']
+
+# Umbrales para usar los ratings en find_value_opportunities (metric_thresholds)
+ELO_METRIC_THRESHOLDS = {
+    'Elo_Diff': [-150, -100, -50, 0, 50, 100, 150],
+    'Home_Elo': [1400, 1500, 1600, 1700, 1800],
+    'Away_Elo': [1400, 1500, 1600, 1700, 1800],
+}
+
+
+def goal_margin_multiplier(goal_diff: int) -> float:
+    """
+    Multiplicador de K según la diferencia de goles (World Football Elo Ratings).
+
+    Args:
+        goal_diff: Diferencia de goles en valor absoluto
+
+    Returns:
+        1 con 0 o 1 goles, 1.5 con 2 y (11 + diferencia) / 8 a partir de 3
+    """
+    if goal_diff <= 1:
+        return 1.0
+    if goal_diff == 2:
+        return 1.5
+    return (11.0 + goal_diff) / 8.0
+
+
+def elo_ratings(home_teams, away_teams, home_goals, away_goals, state: Optional[dict] = None,
+                k: float = ELO_K, home_advantage: float = ELO_HOME_ADVANTAGE,
+                initial: float = ELO_INITIAL) -> tuple:
+    """
+    Recorre los partidos en orden y devuelve los ratings previos a cada uno.
+
+    Los partidos sin resultado (goles nulos) reciben rating pero no lo actualizan;
+    las filas sin equipo quedan en NaN.
+
+    Args:
+        home_teams: Equipo local de cada partido, en orden cronológico
+        away_teams: Equipo visitante de cada partido
+        home_goals: Goles del local
+        away_goals: Goles del visitante
+        state: Ratings de partida (equipo -> rating), p. ej. los de una pasada anterior.
+            No se modifica
+        k: Factor K
+        home_advantage: Puntos que se suman al local al calcular el resultado esperado
+        initial: Rating de los equipos que aparecen por primera vez
+
+    Returns:
+        Tupla (rating local (N,), rating visitante (N,), estado equipo -> rating tras el último partido)
+    """
+    teams = np.concatenate([np.asarray(home_teams, dtype=object), np.asarray(away_teams, dtype=object)])
+    codes, uniques = pd.factorize(teams)
+    n_rows = len(codes) // 2
+    state = state or {}
+
+    # Ratings en una lista indexada por código: el bucle solo hace operaciones escalares
+    ratings = [state.get(team, initial) for team in uniques]
+    home_codes = codes[:n_rows].tolist()
+    away_codes = codes[n_rows:].tolist()
+    home_goals = np.asarray(home_goals, dtype='float64').tolist()
+    away_goals = np.asarray(away_goals, dtype='float64').tolist()
+
+    home_pre = np.full(n_rows, np.nan)
+    away_pre = np.full(n_rows, np.nan)
+    for i in range(n_rows):
+        h, a = home_codes[i], away_codes[i]
+        if h < 0 or a < 0:
+            continue
+        rating_h, rating_a = ratings[h], ratings[a]
+        home_pre[i] = rating_h
+        away_pre[i] = rating_a
+
+        hg, ag = home_goals[i], away_goals[i]
+        if hg != hg or ag != ag:
+            # Partido sin jugar o sin resultado: no actualiza
+            continue
+        expected = 1.0 / (1.0 + 10.0 ** ((rating_a - rating_h - home_advantage) / 400.0))
+        score = 1.0 if hg > ag else (0.5 if hg == ag else 0.0)
+        delta = k * goal_margin_multiplier(int(abs(hg - ag))) * (score - expected)
+        ratings[h] = rating_h + delta
+        ratings[a] = rating_a - delta
+
+    new_state = dict(state)
+    new_state.update(zip(uniques, ratings))
+    return home_pre, away_pre, new_state
@@ -0,0 +1,436 @@
+"""
+Modelo de goles de Poisson / Dixon-Coles
+Ajusta fuerzas de ataque y defensa por división y temporada con una log-verosimilitud
+vectorizada y guarda cada ajuste en disco (solo se reajusta si cambian los partidos)
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtester import match_seasons
+from ingestion import MATCH_KEY
+
+# Versión del formato de los ajustes guardados: subir si cambia el modelo
+FORMAT_VERSION = 1
+
+# Tolerancia del gradiente (log-verosimilitud media por partido) y límite de iteraciones
+FIT_TOLERANCE = 1e-6
+MAX_ITERATIONS = 500
+
+
+def division_of(df: pd.DataFrame) -> pd.Series:
+    """
+    División de cada partido: la columna Div o, si falta (CSV sin Div), el prefijo
+    del nombre del archivo de origen (Season = 'SP1_2324' -> 'SP1').
+
+    Args:
+        df: DataFrame procesado
+
+    Returns:
+        Serie de texto con la división
+    """
+    # Sobre los valores distintos de Season (un puñado de archivos), no fila a fila
+    seasons = df['Season'].astype('object')
+    from_file = seasons.map({season: str(season).split('_')[0] for season in seasons.unique()})
+    if 'Div' not in df.columns:
+        return from_file
+    return df['Div'].astype('object').fillna(from_file)
+
+
+def dixon_coles_loglik(params: np.ndarray, home_idx: np.ndarray, away_idx: np.ndarray,
+                       home_goals: np.ndarray, away_goals: np.ndarray, weights: np.ndarray,
+                       n_teams: int) -> tuple:
+    """
+    Log-verosimilitud ponderada de Dixon-Coles y su gradiente, para todos los partidos a la vez.
+
+    Goles del local ~ Poisson(exp(home + attack[h] + defence[a])) y del visitante
+    ~ Poisson(exp(attack[a] + defence[h])), con la corrección tau de Dixon-Coles en los
+    marcadores 0-0, 1-0, 0-1 y 1-1.
+
+    Args:
+        params: Vector [attack (T), defence (T), home, rho]
+        home_idx: Índice del equipo local de cada partido
+        away_idx: Índice del equipo visitante
+        home_goals: Goles del local
+        away_goals: Goles del visitante
+        weights: Peso de cada partido
+        n_teams: Número de equipos (T)
+
+    Returns:
+        Tupla (log-verosimilitud, gradiente); -inf si rho deja algún tau <= 0
+    """
+    attack = params[:n_teams]
+    defence = params[n_teams:2 * n_teams]
+    home, rho = params[2 * n_teams], params[2 * n_teams + 1]
+
+    log_lam = home + attack[home_idx] + defence[away_idx]
+    log_mu = attack[away_idx] + defence[home_idx]
+    lam = np.exp(log_lam)
+    mu = np.exp(log_mu)
+
+    x0, y0 = home_goals == 0, away_goals == 0
+    x1, y1 = home_goals == 1, away_goals == 1
+    s00, s01, s10, s11 = x0 & y0, x0 & y1, x1 & y0, x1 & y1
+
+    tau = np.ones_like(lam)
+    tau[s00] = 1 - lam[s00] * mu[s00] * rho
+    tau[s01] = 1 + lam[s01] * rho
+    tau[s10] = 1 + mu[s10] * rho
+    tau[s11] = 1 - rho
+    if np.any(tau <= 0):
+        return -np.inf, np.zeros_like(params)
+
+    # Sin los log(x!) e log(y!): no dependen de los parámetros
+    loglik = np.sum(weights * (np.log(tau) + home_goals * log_lam - lam + away_goals * log_mu - mu))
+
+    # Derivadas respecto a log(lambda), log(mu) y rho
+    d_lam = home_goals - lam
+    d_mu = away_goals - mu
+    d_rho = np.zeros_like(lam)
+    d_lam[s00] -= lam[s00] * mu[s00] * rho / tau[s00]
+    d_mu[s00] -= lam[s00] * mu[s00] * rho / tau[s00]
+    d_rho[s00] = -lam[s00] * mu[s00] / tau[s00]
+    d_lam[s01] += lam[s01] * rho / tau[s01]
+    d_rho[s01] = lam[s01] / tau[s01]
+    d_mu[s10] += mu[s10] * rho / tau[s10]
+    d_rho[s10] = mu[s10] / tau[s10]
+    d_rho[s11] = -1 / tau[s11]
+
+    d_lam *= weights
+    d_mu *= weights
+    grad = np.concatenate([
+        np.bincount(home_idx, d_lam, n_teams) + np.bincount(away_idx, d_mu, n_teams),
+        np.bincount(away_idx, d_lam, n_teams) + np.bincount(home_idx, d_mu, n_teams),
+        [d_lam.sum(), np.sum(weights * d_rho)],
+    ])
+    return loglik, grad
+
+
+def minimize_lbfgs(fun: Callable[[np.ndarray], tuple], x0: np.ndarray,
+                   max_iter: int = MAX_ITERATIONS, tol: float = FIT_TOLERANCE,
+                   memory: int = 10) -> tuple:
+    """
+    Minimiza una función suave con L-BFGS y búsqueda lineal con retroceso (Armijo).
+
+    Args:
+        fun: Función x -> (valor, gradiente); puede devolver inf fuera del dominio
+        x0: Punto de partida
+        max_iter: Iteraciones máximas
+        tol: Parada cuando max|gradiente| < tol
+        memory: Pares (s, y) guardados para aproximar la inversa del hessiano
+
+    Returns:
+        Tupla (x, valor, iteraciones, convergido)
+    """
+    x = np.asarray(x0, dtype='float64').copy()
+    f, g = fun(x)
+    s_hist, y_hist = [], []
+
+    for iteration in range(max_iter):
+        if np.max(np.abs(g)) < tol:
+            return x, f, iteration, True
+
+        # Dirección: recursión de dos bucles
+        q = g.copy()
+        alphas = []
+        for s, y in zip(reversed(s_hist), reversed(y_hist)):
+            a = (s @ q) / (y @ s)
+            q -= a * y
+            alphas.append(a)
+        if s_hist:
+            q *= (s_hist[-1] @ y_hist[-1]) / (y_hist[-1] @ y_hist[-1])
+        for (s, y), a in zip(zip(s_hist, y_hist), reversed(alphas)):
+            q += s * (a - (y @ q) / (y @ s))
+        direction = -q
+        slope = g @ direction
+        if slope >= 0:
+            direction, slope = -g, -(g @ g)
+            s_hist.clear()
+            y_hist.clear()
+
+        step = 1.0
+        while True:
+            x_new = x + step * direction
+            f_new, g_new = fun(x_new)
+            if np.isfinite(f_new) and f_new <= f + 1e-4 * step * slope:
+                break
+            step *= 0.5
+            if step < 1e-12:
+                return x, f, iteration, False
+
+        s, y = x_new - x, g_new - g
+        if s @ y > 1e-12:
+            s_hist.append(s)
+            y_hist.append(y)
+            if len(s_hist) > memory:
+                s_hist.pop(0)
+                y_hist.pop(0)
+        x, f, g = x_new, f_new, g_new
+
+    return x, f, max_iter, np.max(np.abs(g)) < tol
+
+
+def fit_goal_model(matches: pd.DataFrame, xi: float = 0.0, reference_date: Optional[pd.Timestamp] = None) -> dict:
+    """
+    Ajusta el modelo de Dixon-Coles por máxima verosimilitud.
+
+    Args:
+        matches: Partidos con Date, HomeTeam, AwayTeam, FTHG y FTAG (sin nulos)
+        xi: Decaimiento temporal por día de los pesos, exp(-xi * días) (0 = todos igual)
+        reference_date: Fecha desde la que se cuentan los días (default: último partido)
+
+    Returns:
+        Diccionario con equipos, attack, defence, home, rho, loglik, partidos,
+        iteraciones, convergido y segundos
+    """
+    start = time.perf_counter()
+    codes, teams = pd.factorize(np.concatenate([matches['HomeTeam'].astype('object').to_numpy(),
+                                                matches['AwayTeam'].astype('object').to_numpy()]))
+    n_matches = len(matches)
+    n_teams = len(teams)
+    home_idx, away_idx = codes[:n_matches], codes[n_matches:]
+    home_goals = matches['FTHG'].to_numpy(dtype='float64')
+    away_goals = matches['FTAG'].to_numpy(dtype='float64')
+
+    if xi > 0:
+        dates = pd.to_datetime(matches['Date'])
+        reference = dates.max() if reference_date is None else pd.Timestamp(reference_date)
+        weights = np.exp(-xi * (reference - dates).dt.days.to_numpy(dtype='float64'))
+    else:
+        weights = np.ones(n_matches)
+    total_weight = weights.sum()
+
+    x0 = np.zeros(2 * n_teams + 2)
+    x0[2 * n_teams] = 0.25
+
+    def objective(params: np.ndarray) -> tuple:
+        loglik, grad = dixon_coles_loglik(params, home_idx, away_idx, home_goals, away_goals,
+                                          weights, n_teams)
+        # Media por partido (tolerancia independiente del tamaño) y penalización
+        # sum(attack) = 0: ataque y defensa solo están definidos salvo una constante
+        penalty = params[:n_teams].sum()
+        value = -loglik / total_weight + penalty ** 2
+        grad = -grad / total_weight
+        grad[:n_teams] += 2 * penalty
+        return value, grad
+
+    params, value, iterations, converged = minimize_lbfgs(objective, x0)
+
+    return {
+        'equipos': [str(team) for team in teams],
+        'attack': params[:n_teams].tolist(),
+        'defence': params[n_teams:2 * n_teams].tolist(),
+        'home': float(params[2 * n_teams]),
+        'rho': float(params[2 * n_teams + 1]),
+        'loglik': float(-value * total_weight),
+        'partidos': n_matches,
+        'iteraciones': iterations,
+        'convergido': bool(converged),
+        'segundos': round(time.perf_counter() - start, 4),
+    }
+
+
+def score_matrix(fit: dict, home_team: str, away_team: str, max_goals: int = 10) -> np.ndarray:
+    """
+    Probabilidad de cada marcador según un ajuste.
+
+    Args:
+        fit: Resultado de fit_goal_model
+        home_team: Equipo local
+        away_team: Equipo visitante
+        max_goals: Goles máximos por equipo en la matriz
+
+    Returns:
+        Matriz (max_goals + 1, max_goals + 1): filas goles del local, columnas del visitante
+    """
+    index = {team: i for i, team in enumerate(fit['equipos'])}
+    if home_team not in index or away_team not in index:
+        raise ValueError(f"Equipo sin ajuste: {home_team if home_team not in index else away_team}")
+    h, a = index[home_team], index[away_team]
+    lam = np.exp(fit['home'] + fit['attack'][h] + fit['defence'][a])
+    mu = np.exp(fit['attack'][a] + fit['defence'][h])
+    rho = fit['rho']
+
+    goals = np.arange(max_goals + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(goals[1:]))])
+    home_p = np.exp(goals * np.log(lam) - lam - log_factorial)
+    away_p = np.exp(goals * np.log(mu) - mu - log_factorial)
+    matrix = np.outer(home_p, away_p)
+    matrix[0, 0] *= 1 - lam * mu * rho
+    matrix[0, 1] *= 1 + lam * rho
+    matrix[1, 0] *= 1 + mu * rho
+    matrix[1, 1] *= 1 - rho
+    return matrix
+
+
+def outcome_probabilities(fit: dict, home_team: str, away_team: str) -> dict:
+    """
+    Probabilidades de 1X2 y más/menos de 2.5 goles según un ajuste.
+
+    Args:
+        fit: Resultado de fit_goal_model
+        home_team: Equipo local
+        away_team: Equipo visitante
+
+    Returns:
+        Diccionario con 'Victoria Local', 'Empate', 'Victoria Visitante', 'Over 2.5', 'Under 2.5'
+    """
+    matrix = score_matrix(fit, home_team, away_team)
+    goals = np.add.outer(np.arange(len(matrix)), np.arange(len(matrix)))
+    under = matrix[goals <= 2].sum()
+    return {
+        'Victoria Local': float(np.tril(matrix, -1).sum()),
+        'Empate': float(np.trace(matrix)),
+        'Victoria Visitante': float(np.triu(matrix, 1).sum()),
+        'Over 2.5': float(matrix.sum() - under),
+        'Under 2.5': float(under),
+    }
+
+
+class GoalModelCache:
+    """
+    Ajustes guardados en disco, un JSON por (división, temporada, fecha de corte).
+    Cada ajuste guarda la huella de los partidos usados: si cambian (p. ej. llega una
+    jornada nueva a la temporada en curso) se reajusta desde cero. Arrancar desde el
+    ajuste anterior no compensa: ~68 iteraciones de media frente a ~69 en frío, y en
+    los reajustes por jornada de la temporada en curso no baja el tiempo (~65 ms).
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        Inicializa la caché.
+
+        Args:
+            cache_dir: Directorio de los ajustes
+        """
+        self.cache_dir = Path(cache_dir)
+
+    @staticmethod
+    def key(division: str, season: int, cutoff: Optional[pd.Timestamp]) -> str:
+        cutoff_label = 'completa' if cutoff is None else pd.Timestamp(cutoff).strftime('%Y%m%d')
+        return f"{division}_{season}_{cutoff_label}"
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            fit = json.loads((self.cache_dir / f"{key}.json").read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        return fit if fit.get('version') == FORMAT_VERSION else None
+
+    def put(self, key: str, fit: dict) -> None:
+        # Escritura atómica, como el manifiesto de MatchCache
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({**fit, 'version': FORMAT_VERSION}), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+
+def match_fingerprint(matches: pd.DataFrame) -> str:
+    """SHA-1 de los partidos (fecha, equipos y goles) usados en un ajuste."""
+    hashed = pd.util.hash_pandas_object(matches[MATCH_KEY + ['FTHG', 'FTAG']].astype(str), index=False)
+    return hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()
+
+
+def fit_season(df: pd.DataFrame, division: str, season: int, cutoff: Optional[pd.Timestamp] = None,
+               cache: Optional[GoalModelCache] = None, xi: float = 0.0,
+               selected: Optional[np.ndarray] = None) -> Optional[dict]:
+    """
+    Ajuste de una división y temporada con los partidos anteriores a la fecha de corte.
+
+    Si la caché tiene el ajuste con los mismos partidos se devuelve sin recalcular.
+
+    Args:
+        df: DataFrame procesado
+        division: División ('SP1', 'SP2', ...)
+        season: Año de inicio de la temporada (2023 = 2023/24)
+        cutoff: Solo partidos con fecha anterior (None = toda la temporada disponible)
+        cache: Caché de ajustes (None = sin caché)
+        xi: Decaimiento temporal por día (ver fit_goal_model)
+        selected: Máscara de filas de la división y temporada, si ya se ha calculado
+
+    Returns:
+        Ajuste (ver fit_goal_model) con 'division', 'temporada', 'corte' y 'huella',
+        o None si no hay partidos
+    """
+    if selected is None:
+        selected = (division_of(df).to_numpy() == division) & (match_seasons(df) == season)
+    if cutoff is not None:
+        # Sin &=: la máscara puede ser del llamador
+        selected = selected & (df['Date'] < pd.Timestamp(cutoff)).to_numpy()
+    matches = df.loc[selected, MATCH_KEY + ['FTHG', 'FTAG']].dropna()
+    # Los CSV de la temporada en curso pueden estar repetidos (SP1.csv y SP1_2526.csv)
+    matches = matches.drop_duplicates(MATCH_KEY).sort_values('Date', kind='mergesort')
+    if matches.empty:
+        return None
+
+    fingerprint = match_fingerprint(matches)
+    key = GoalModelCache.key(division, season, cutoff)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None and cached.get('huella') == fingerprint and cached.get('xi') == xi:
+            return cached
+
+    reference = pd.Timestamp(cutoff) if cutoff is not None else None
+    fit = fit_goal_model(matches, xi=xi, reference_date=reference)
+    fit.update({'division': division, 'temporada': int(season),
+                'corte': None if cutoff is None else pd.Timestamp(cutoff).date().isoformat(),
+                'huella': fingerprint, 'xi': xi})
+    if cache is not None:
+        cache.put(key, fit)
+    return fit
+
+
+def fit_all_seasons(df: pd.DataFrame, cache_dir: Optional[str] = None,
+                    cutoff: Optional[pd.Timestamp] = None, xi: float = 0.0) -> pd.DataFrame:
+    """
+    Ajusta todas las divisiones y temporadas y devuelve las fuerzas por equipo.
+
+    Args:
+        df: DataFrame procesado
+        cache_dir: Directorio de la caché de ajustes (None = sin caché)
+        cutoff: Fecha de corte para la última temporada de cada división
+        xi: Decaimiento temporal por día
+
+    Returns:
+        DataFrame con una fila por división, temporada y equipo
+    """
+    cache = GoalModelCache(cache_dir) if cache_dir is not None else None
+    divisions = division_of(df).to_numpy()
+    seasons = match_seasons(df)
+
+    rows = []
+    for division in sorted(pd.unique(divisions)):
+        division_seasons = sorted(np.unique(seasons[divisions == division]))
+        for season in division_seasons:
+            season_cutoff = cutoff if season == division_seasons[-1] else None
+            fit = fit_season(df, division, int(season), season_cutoff, cache, xi,
+                             selected=(divisions == division) & (seasons == season))
+            if fit is None:
+                continue
+            for team, attack, defence in zip(fit['equipos'], fit['attack'], fit['defence']):
+                rows.append({'Div': division, 'Temporada': int(season), 'Equipo': team,
+                             'Ataque': attack, 'Defensa': defence, 'Local': fit['home'],
+                             'Rho': fit['rho'], 'Iteraciones': fit['iteraciones']})
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from data_processor import FootballDataProcessor
+
+    processor = FootballDataProcessor(data_dir="DATOS")
+    processor.process_all()
+
+    start = time.perf_counter()
+    strengths = fit_all_seasons(processor.df, cache_dir="DATOS/.cache/modelo_goles")
+    print(f"\n✓ {strengths[['Div', 'Temporada']].drop_duplicates().shape[0]} ajustes "
+          f"en {time.perf_counter() - start:.2f}s")
+    print(strengths.sort_values('Ataque', ascending=False).head(10).to_string(index=False))
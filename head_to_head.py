@@ -0,0 +1,91 @@
+"""
+Enfrentamientos directos (H2H) para las apps
+Índice por pareja de equipos construido una vez al cargar los datos: cada consulta es
+un acceso a diccionario y un corte, en lugar de filtrar todo el histórico
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class H2HIndex:
+    """
+    Pareja de equipos (sin orden) -> posiciones de sus partidos en df, ordenadas por fecha.
+    La tabla formateada de cada pareja se guarda la primera vez que se pide.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Construye el índice.
+
+        Args:
+            df: Partidos (Date, HomeTeam, AwayTeam; FTHG, FTAG y B365H/D/A para history)
+        """
+        self.df = df
+        n_rows = len(df)
+        codes, names = pd.factorize(np.concatenate([df['HomeTeam'].astype('object').to_numpy(),
+                                                    df['AwayTeam'].astype('object').to_numpy()]))
+        home_codes, away_codes = codes[:n_rows].astype(np.int64), codes[n_rows:].astype(np.int64)
+        n_teams = len(names)
+
+        # Clave entera de la pareja sin orden; las filas sin equipo quedan fuera
+        pair_keys = np.minimum(home_codes, away_codes) * n_teams + np.maximum(home_codes, away_codes)
+        valid = np.flatnonzero((home_codes >= 0) & (away_codes >= 0))
+        order = valid[np.lexsort((df['Date'].to_numpy()[valid], pair_keys[valid]))]
+        unique_keys, starts = np.unique(pair_keys[order], return_index=True)
+        bounds = np.append(starts, len(order))
+
+        self.pairs: dict = {}
+        for i, key in enumerate(unique_keys.tolist()):
+            pair = frozenset((names[key // n_teams], names[key % n_teams]))
+            self.pairs[pair] = order[bounds[i]:bounds[i + 1]]
+        self._tables: dict = {}
+
+    def rows(self, team1, team2) -> np.ndarray:
+        """Posiciones (iloc) de los partidos entre dos equipos, de más antiguo a más reciente."""
+        return self.pairs.get(frozenset((team1, team2)), np.empty(0, dtype=np.int64))
+
+    def matches(self, team1, team2) -> pd.DataFrame:
+        """
+        Partidos entre dos equipos, en cualquier campo.
+
+        Args:
+            team1: Equipo
+            team2: Rival
+
+        Returns:
+            Filas de df ordenadas por fecha ascendente (vacío si no se han enfrentado)
+        """
+        return self.df.iloc[self.rows(team1, team2)]
+
+    def history(self, team1, team2) -> Optional[pd.DataFrame]:
+        """
+        Tabla H2H para mostrar (Fecha, Local, Res, Visitante y cuotas 1/X/2 de Bet365),
+        del partido más reciente al más antiguo.
+
+        Args:
+            team1: Equipo
+            team2: Rival
+
+        Returns:
+            DataFrame formateado (en caché por pareja) o None si no hay enfrentamientos
+        """
+        if team1 is None or team2 is None: return None
+        pair = frozenset((team1, team2))
+        if pair not in self._tables:
+            h2h = self.matches(team1, team2).iloc[::-1]
+            if h2h.empty:
+                self._tables[pair] = None
+            else:
+                self._tables[pair] = pd.DataFrame({
+                    "Fecha": h2h['Date'].dt.strftime("%d/%m/%Y").to_numpy(),
+                    "Local": h2h['HomeTeam'].astype('object').to_numpy(),
+                    "Res": [f"{int(hg)}-{int(ag)}" for hg, ag in zip(h2h['FTHG'], h2h['FTAG'])],
+                    "Visitante": h2h['AwayTeam'].astype('object').to_numpy(),
+                    "1": h2h['B365H'].to_numpy() if 'B365H' in h2h.columns else '-',
+                    "X": h2h['B365D'].to_numpy() if 'B365D' in h2h.columns else '-',
+                    "2": h2h['B365A'].to_numpy() if 'B365A' in h2h.columns else '-',
+                })
+        return self._tables[pair]
@@ -0,0 +1,299 @@
+"""
+Ingesta de CSV de football-data.co.uk
+Lectura en paralelo, proyección de columnas por consumidor y tipos compactos declarados
+"""
+
+import os
+import time
+from datetime import datetime
+from itertools import islice
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Categóricas: se declaran una sola vez tras concatenar (unify_categories); hacerlo
+# archivo a archivo en read_csv cuesta más que el propio parseo.
+# Los equipos comparten diccionario de categorías entre local y visitante.
+TEAM_COLUMNS = ['HomeTeam', 'AwayTeam']
+
+# Identifica un partido: el mismo partido puede venir en varios archivos (SP1.csv y SP1_2425.csv)
+MATCH_KEY = ['Date', 'HomeTeam', 'AwayTeam']
+CATEGORY_COLUMNS = ['Div', 'Season', 'Time', 'HomeTeam', 'AwayTeam', 'FTR', 'HTR']
+
+# Resultados con códigos fijos (int8): 0 = local, 1 = empate, 2 = visitante
+RESULT_COLUMNS = ['FTR', 'HTR']
+RESULT_CODES = pd.CategoricalDtype(['H', 'D', 'A'])
+
+# Goles y estadísticas de partido (float32: algunas temporadas traen filas vacías)
+STAT_COLUMNS = [
+    'FTHG', 'FTAG', 'HTHG', 'HTAG', 'HS', 'AS', 'HST', 'AST',
+    'HF', 'AF', 'HC', 'AC', 'HY', 'AY', 'HR', 'AR',
+]
+
+# Cuotas usadas por el procesador (incluye las alternativas de _ensure_odds_columns)
+ODDS_COLUMNS = [
+    'B365H', 'B365D', 'B365A', 'BWH', 'BWD', 'BWA', 'WHH', 'WHD', 'WHA',
+    'B365>2.5', 'B365<2.5', 'P>2.5', 'P<2.5', 'Avg>2.5', 'Avg<2.5',
+]
+
+MATCH_DTYPES = {col: 'float32' for col in STAT_COLUMNS + ODDS_COLUMNS}
+
+# Proyecciones por consumidor
+PROCESSOR_COLUMNS = ['Div', 'Date', 'Time', 'HomeTeam', 'AwayTeam', 'FTR', 'HTR'] + STAT_COLUMNS + ODDS_COLUMNS
+APP_COLUMNS = [
+    'Div', 'Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR',
+    'HS', 'AS', 'HST', 'AST', 'HC', 'AC', 'HF', 'AF', 'HY', 'AY',
+    'B365H', 'B365D', 'B365A',
+]
+IA_COLUMNS = ['Div', 'Date', 'HomeTeam', 'AwayTeam', 'FTHG', 'FTAG', 'FTR']
+
+# Formatos de fecha de football-data.co.uk: dd/mm/yy en las temporadas antiguas,
+# dd/mm/yyyy en las recientes. Cada archivo usa uno solo.
+DATE_FORMATS = ['%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d', '%d-%m-%Y']
+
+
+def match_files(data_dir: Path) -> List[Path]:
+    """
+    Lista los CSV de partidos de un directorio (excluye jugadores_raw.csv).
+
+    Args:
+        data_dir: Directorio con los CSV
+
+    Returns:
+        Lista de rutas ordenada por nombre
+    """
+    return sorted(f for f in Path(data_dir).glob("*.csv") if "jugadores" not in f.name)
+
+
+def detect_date_format(values: Iterable, sample_size: int = 10) -> Optional[str]:
+    """
+    Detecta el formato de fecha a partir de una muestra de valores.
+
+    Args:
+        values: Fechas en texto (se prueban los primeros `sample_size` no nulos)
+        sample_size: Número de valores a probar
+
+    Returns:
+        El primer formato de DATE_FORMATS que parsea toda la muestra, o None
+    """
+    sample = list(islice((str(v).strip() for v in values if isinstance(v, str)), sample_size))
+    if not sample:
+        return None
+
+    # strptime sobre unos pocos valores es más barato que llamar a pd.to_datetime
+    for fmt in DATE_FORMATS:
+        try:
+            for value in sample:
+                datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return fmt
+    return None
+
+
+def parse_date_column(dates: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de fechas en texto a datetime.
+    Cada fecha distinta se parsea una sola vez, con el formato exacto detectado;
+    solo los valores que no encajan pasan por la inferencia lenta (dayfirst).
+
+    Args:
+        dates: Columna Date tal como viene del CSV
+
+    Returns:
+        Serie datetime64[ns] (NaT para fechas inválidas)
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+
+    codes, uniques = pd.factorize(dates)
+    uniques = pd.Index(uniques, dtype='object').astype(str).str.strip()
+
+    fmt = detect_date_format(uniques)
+    parsed = pd.to_datetime(uniques, format=fmt or DATE_FORMATS[0], errors='coerce').as_unit('ns')
+
+    values = parsed.to_numpy().copy()
+
+    pending = np.isnat(values)
+    if pending.any():
+        # Valores en otro formato dentro del mismo archivo: solo se infieren esos
+        retry = pd.to_datetime(uniques[pending], dayfirst=True, errors='coerce', format='mixed')
+        values[pending] = pd.DatetimeIndex(retry).as_unit('ns').to_numpy()
+
+    result = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[ns]')
+    valid = codes >= 0
+    result[valid] = values[codes[valid]]
+    return pd.Series(result, index=dates.index, name=dates.name)
+
+
+def read_match_csv(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lectura canónica de un CSV de football-data.co.uk con los tipos de MATCH_DTYPES.
+    La columna Date se devuelve ya como datetime (formato detectado para este archivo).
+    Los archivos recientes vienen en UTF-8 con BOM; si alguno no es UTF-8 se lee como latin1.
+
+    Args:
+        path: Ruta del archivo CSV
+        columns: Columnas a leer (None = todas). Las que no existan en el archivo se ignoran
+
+    Returns:
+        DataFrame con los nombres de columna sin espacios
+    """
+    wanted = set(columns) if columns is not None else None
+    # usecols siempre como función: así el parser tolera las filas con comas de más
+    # al final (SP1_0405, SP2_0708), que con la lectura por defecto abortan el archivo
+    usecols = (lambda c: c.strip() in wanted) if wanted is not None else (lambda c: True)
+
+    try:
+        df = pd.read_csv(path, encoding='utf-8-sig', usecols=usecols, dtype=MATCH_DTYPES)
+    except UnicodeDecodeError:
+        df = pd.read_csv(path, encoding='latin1', usecols=usecols, dtype=MATCH_DTYPES)
+    df.columns = [str(c).strip() for c in df.columns]
+
+    if 'Date' in df.columns:
+        df['Date'] = parse_date_column(df['Date'])
+    return df
+
+
+def unify_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tras concatenar archivos, vuelve a declarar las columnas categóricas.
+    HomeTeam y AwayTeam comparten las mismas categorías (mismo código = mismo equipo)
+    y FTR/HTR usan siempre los códigos de RESULT_CODES.
+
+    Args:
+        df: DataFrame concatenado (se modifica en el sitio)
+
+    Returns:
+        El mismo DataFrame
+    """
+    team_cols = [col for col in TEAM_COLUMNS if col in df.columns]
+    if team_cols:
+        teams = pd.concat([df[col].astype('object') for col in team_cols]).dropna().unique()
+        categories = pd.Index(sorted(teams))
+        for col in team_cols:
+            df[col] = pd.Categorical(df[col].astype('object'), categories=categories)
+
+    for col in RESULT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('object').astype(RESULT_CODES)
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and col not in team_cols and col not in RESULT_COLUMNS:
+            df[col] = df[col].astype('category')
+
+    return df
+
+
+def load_matches(files: Iterable[Path], columns: Optional[List[str]] = None, cache=None,
+                 transform: Optional[Callable[[Path, pd.DataFrame], pd.DataFrame]] = None,
+                 max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Carga y concatena varios CSV de partidos usando un pool de hilos.
+
+    Args:
+        files: Rutas de los CSV
+        columns: Columnas que necesita el consumidor (None = todas)
+        cache: MatchCache opcional; si se indica, las particiones se leen de disco
+        transform: Función (ruta, df) -> df aplicada a cada archivo dentro del worker
+        max_workers: Número de hilos (default: min(8, núcleos))
+
+    Returns:
+        DataFrame concatenado (vacío si no se pudo cargar ningún archivo)
+    """
+    files = list(files)
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+
+    def _load(path: Path) -> Optional[pd.DataFrame]:
+        try:
+            if cache is not None:
+                df = cache.read(path, columns=columns)
+            else:
+                df = read_match_csv(path, columns=columns)
+            if transform is not None:
+                df = transform(path, df)
+            print(f"✓ Cargado: {path.name} ({len(df)} partidos)")
+            return df
+        except Exception as e:
+            print(f"⚠ Error al cargar {path.name}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        dataframes = [df for df in pool.map(_load, files) if df is not None]
+
+    if not dataframes:
+        return pd.DataFrame()
+
+    return unify_categories(pd.concat(dataframes, ignore_index=True))
+
+
+# --- BENCHMARK ---
+def _legacy_load(files: List[Path], encoding: Optional[str]) -> pd.DataFrame:
+    # Réplica de los cargadores anteriores: todas las columnas, tipos inferidos, en serie
+    dfs = []
+    for f in files:
+        try:
+            dfs.append(pd.read_csv(f, encoding=encoding) if encoding else pd.read_csv(f))
+        except Exception:
+            continue
+    return pd.concat(dfs, ignore_index=True)
+
+
+def _measure(func: Callable[[], pd.DataFrame]) -> dict:
+    # Tiempo y memoria en ejecuciones separadas: tracemalloc ralentiza el parseo
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    df = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'tiempo_s': round(elapsed, 3),
+        'pico_mb': round(peak / 2**20, 1),
+        'df_mb': round(df.memory_usage(deep=True).sum() / 2**20, 1),
+        'filas': len(df),
+        'columnas': len(df.columns),
+    }
+
+
+def benchmark(data_dir: str = "DATOS") -> pd.DataFrame:
+    """
+    Compara tiempo y memoria pico de los cargadores anteriores con load_matches.
+
+    Args:
+        data_dir: Directorio con los CSV
+
+    Returns:
+        DataFrame con una fila por cargador
+    """
+    files = match_files(Path(data_dir))
+    cases = {
+        'data_processor (utf-8, todas)': lambda: _legacy_load(files, 'utf-8'),
+        'app.py (latin1, todas)': lambda: _legacy_load(files, 'latin1'),
+        'app_new.py (todas)': lambda: _legacy_load(files, None),
+        'ingestion PROCESSOR_COLUMNS': lambda: load_matches(files, PROCESSOR_COLUMNS),
+        'ingestion APP_COLUMNS': lambda: load_matches(files, APP_COLUMNS),
+        'ingestion IA_COLUMNS': lambda: load_matches(files, IA_COLUMNS),
+    }
+
+    rows = []
+    for name, func in cases.items():
+        rows.append({'cargador': name, **_measure(func)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    # Silenciar los mensajes de carga para que solo se vea la tabla
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = benchmark()
+    print(results.to_string(index=False))
@@ -0,0 +1,167 @@
+"""
+Caché columnar de partidos
+Guarda cada CSV de football-data.co.uk ya parseado como una partición Arrow IPC (Feather),
+identificada por la huella del archivo de origen (tamaño, mtime y hash)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pandas as pd
+
+from ingestion import read_match_csv
+
+
+def file_fingerprint(path: Path) -> dict:
+    """
+    Calcula la huella de un archivo: tamaño, mtime (ns) y SHA-1 del contenido.
+
+    Args:
+        path: Ruta del archivo
+
+    Returns:
+        Diccionario con las claves 'size', 'mtime_ns' y 'sha1'
+    """
+    stat = path.stat()
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha1': hashlib.sha1(path.read_bytes()).hexdigest(),
+    }
+
+
+def _arrow_available() -> bool:
+    # Import seguro: sin pyarrow la caché se desactiva y se lee el CSV directamente
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class MatchCache:
+    """
+    Caché en disco de los CSV de partidos, una partición Arrow IPC por archivo.
+    Si un CSV no cambia (mismo tamaño y mtime, o mismo hash) se lee su partición;
+    solo se vuelve a parsear el CSV de los archivos modificados.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+    # Subir cuando cambie el esquema/tipos del lector: invalida todas las particiones
+    FORMAT_VERSION = 3
+
+    def __init__(self, cache_dir: str, reader: Callable[[Path], pd.DataFrame] = read_match_csv):
+        """
+        Inicializa la caché.
+
+        Args:
+            cache_dir: Directorio donde se guardan las particiones y el manifiesto
+            reader: Función que parsea un CSV cuando no hay partición válida
+        """
+        self.cache_dir = Path(cache_dir)
+        self.reader = reader
+        self.enabled = _arrow_available()
+        self._manifest: Optional[dict] = None
+        # load_matches lee en varios hilos que comparten el manifiesto
+        self._lock = threading.Lock()
+
+        if not self.enabled:
+            print("⚠ pyarrow no disponible: caché de partidos desactivada")
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.cache_dir / self.MANIFEST_NAME
+
+    def _load_manifest(self) -> dict:
+        if self._manifest is None:
+            try:
+                manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                manifest = {}
+            if manifest.get('version') != self.FORMAT_VERSION:
+                manifest = {'version': self.FORMAT_VERSION, 'files': {}}
+            self._manifest = manifest
+        return self._manifest['files']
+
+    def _save_manifest(self) -> None:
+        # Escritura atómica: varios workers de Streamlit pueden compartir la caché
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            tmp_path.write_text(json.dumps(self._manifest, indent=1), encoding='utf-8')
+            os.replace(tmp_path, self.manifest_path)
+
+    def read(self, path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Devuelve el DataFrame de un CSV, desde la caché si el archivo no ha cambiado.
+        La partición guarda todas las columnas; `columns` solo proyecta la lectura.
+
+        Args:
+            path: Ruta del archivo CSV
+            columns: Columnas a devolver (None = todas). Las que no existan se ignoran
+
+        Returns:
+            DataFrame parseado
+        """
+        path = Path(path)
+        if not self.enabled:
+            return self._project(self.reader(path), columns)
+
+        with self._lock:
+            manifest = self._load_manifest()
+        key = str(path.resolve())
+        entry = manifest.get(key)
+        stat = path.stat()
+
+        if entry is not None:
+            partition = self.cache_dir / entry['partition']
+            same_stat = entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+            if same_stat and partition.exists():
+                return self._read_partition(partition, entry, columns)
+
+        fingerprint = file_fingerprint(path)
+
+        # Mismo contenido con otro mtime (p. ej. el CSV se ha vuelto a descargar igual)
+        if entry is not None and entry['sha1'] == fingerprint['sha1']:
+            partition = self.cache_dir / entry['partition']
+            if partition.exists():
+                entry.update(fingerprint)
+                self._save_manifest()
+                return self._read_partition(partition, entry, columns)
+
+        df = self.reader(path)
+
+        partition_name = f"{path.stem}-{fingerprint['sha1'][:12]}.arrow"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            df.to_feather(self.cache_dir / partition_name)
+        except Exception as e:
+            # Columnas con tipos mixtos que Arrow no sabe serializar: se sirve sin caché
+            print(f"⚠ No se pudo cachear {path.name}: {e}")
+            return self._project(df, columns)
+
+        if entry is not None and entry['partition'] != partition_name:
+            (self.cache_dir / entry['partition']).unlink(missing_ok=True)
+
+        with self._lock:
+            manifest[key] = {**fingerprint, 'partition': partition_name, 'columns': list(df.columns)}
+        self._save_manifest()
+
+        return self._project(df, columns)
+
+    @staticmethod
+    def _project(df: pd.DataFrame, columns: Optional[List[str]]) -> pd.DataFrame:
+        if columns is None:
+            return df
+        return df[[col for col in df.columns if col in set(columns)]]
+
+    @staticmethod
+    def _read_partition(partition: Path, entry: dict, columns: Optional[List[str]]) -> pd.DataFrame:
+        # Arrow IPC permite leer solo las columnas pedidas sin tocar el resto
+        if columns is None:
+            return pd.read_feather(partition)
+        wanted = set(columns)
+        return pd.read_feather(partition, columns=[col for col in entry['columns'] if col in wanted])
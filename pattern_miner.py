@@ -0,0 +1,303 @@
+"""
+Minería de patrones multi-condición
+Busca conjunciones de 2 y 3 condiciones (`métrica >= umbral` / `métrica <= umbral`)
+con valor esperado positivo, usando intersecciones de bitsets y poda por soporte (Apriori)
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_processor import (DEFAULT_METRIC_THRESHOLDS, OPPORTUNITY_COLUMNS, build_event_matrices,
+                            opportunities_table)
+
+CONDITION_OPERATORS = ('>=', '<=')
+
+# Estado compartido por los workers (se envía una vez en el initializer del pool)
+_STATE: dict = {}
+
+# Popcount por byte para numpy < 2.0 (sin np.bitwise_count)
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def pack_bits(matrix: np.ndarray) -> np.ndarray:
+    """
+    Empaqueta una matriz booleana (K, M) en bitsets de palabras de 64 bits.
+
+    Args:
+        matrix: Matriz bool con una fila por condición y una columna por partido
+
+    Returns:
+        Matriz uint64 de forma (K, ceil(M / 64))
+    """
+    packed = np.packbits(matrix, axis=1, bitorder='little')
+    padding = (-packed.shape[1]) % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def unpack_bits(bits: np.ndarray, n_matches: int) -> np.ndarray:
+    """
+    Inversa de pack_bits.
+
+    Args:
+        bits: Matriz uint64 (K, W)
+        n_matches: Número de partidos (M)
+
+    Returns:
+        Matriz bool (K, M)
+    """
+    as_bytes = np.ascontiguousarray(bits).view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1, count=n_matches, bitorder='little').astype(bool)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """
+    Cuenta los bits activos de cada bitset (suma sobre la última dimensión).
+
+    Args:
+        bits: Array uint64 (..., W)
+
+    Returns:
+        Array int64 (...) con el número de partidos de cada bitset
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+    as_bytes = np.ascontiguousarray(bits).view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def build_conditions(df: pd.DataFrame, metric_thresholds: dict,
+                     operators=CONDITION_OPERATORS) -> tuple:
+    """
+    Construye todas las condiciones simples `métrica op umbral`.
+
+    Args:
+        df: DataFrame de partidos
+        metric_thresholds: Diccionario métrica -> umbrales
+        operators: Operadores a usar ('>=', '<=')
+
+    Returns:
+        Tupla (lista de condiciones (métrica, op, umbral), ids de métrica (K,), matriz bool (K, M))
+    """
+    conditions = []
+    metric_ids = []
+    blocks = []
+    for metric_id, (metric_col, thresholds) in enumerate(metric_thresholds.items()):
+        if metric_col not in df.columns or len(thresholds) == 0:
+            continue
+        values = df[metric_col].to_numpy(dtype='float64')
+        thresholds_arr = np.asarray(thresholds, dtype='float64')
+        for op in operators:
+            # NaN no cumple ninguna de las dos condiciones
+            if op == '>=':
+                blocks.append(values[None, :] >= thresholds_arr[:, None])
+            else:
+                blocks.append(values[None, :] <= thresholds_arr[:, None])
+            conditions.extend((metric_col, op, threshold) for threshold in thresholds)
+            metric_ids.extend([metric_id] * len(thresholds))
+
+    if not blocks:
+        return conditions, np.zeros(0, dtype=int), np.zeros((0, len(df)), dtype=bool)
+    return conditions, np.asarray(metric_ids), np.vstack(blocks)
+
+
+def _init_worker(state: dict) -> None:
+    _STATE.clear()
+    _STATE.update(state)
+
+
+def _score_itemsets(itemsets: List[tuple], bits: np.ndarray) -> Optional[tuple]:
+    """
+    Puntúa un lote de conjunciones. Aciertos y cuotas válidas salen de popcounts;
+    la suma de cuotas solo se calcula para las que alcanzan el acierto mínimo en algún evento.
+    """
+    if not itemsets:
+        return None
+    s = _STATE
+    n = popcount(bits)
+    hits = popcount(bits[:, None, :] & s['event_bits'][None, :, :])
+    n_odds = popcount(bits[:, None, :] & s['valid_bits'][None, :, :])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        accurate = (hits / n[:, None] >= s['min_accuracy']) & (n_odds > 0)
+    survivors = np.flatnonzero(accurate.any(axis=1))
+    if len(survivors) == 0:
+        return None
+
+    matches = unpack_bits(bits[survivors], s['n_matches']).astype('float64')
+    odds_sum = matches @ s['odds'].T
+    return ([itemsets[i] for i in survivors], n[survivors], hits[survivors],
+            n_odds[survivors], odds_sum)
+
+
+def _mine_root(root: int) -> List[tuple]:
+    """
+    Explora todas las conjunciones cuyo primer índice de condición es `root`.
+    Un nivel solo se extiende con condiciones que ya eran frecuentes junto a `root`:
+    si un subconjunto no llega a min_sample_size, ningún superconjunto lo hará.
+    """
+    s = _STATE
+    cond_bits = s['cond_bits']
+    metric_ids = s['metric_ids']
+    min_support = s['min_sample_size']
+    frequent = s['frequent']
+    deadline = s['deadline']
+
+    results = []
+    root_bits = cond_bits[root]
+
+    if s['min_conditions'] <= 1:
+        results.append(_score_itemsets([(root,)], root_bits[None, :]))
+    if s['max_conditions'] < 2:
+        return [r for r in results if r is not None]
+
+    # Nivel 2: (root, j) con j > root y métrica distinta
+    candidates = frequent[(frequent > root) & (metric_ids[frequent] != metric_ids[root])]
+    pair_bits = root_bits[None, :] & cond_bits[candidates]
+    support = popcount(pair_bits)
+    keep = support >= min_support
+    partners = candidates[keep]
+    pair_bits = pair_bits[keep]
+
+    if s['min_conditions'] <= 2:
+        results.append(_score_itemsets([(root, int(j)) for j in partners], pair_bits))
+
+    # Nivel 3: (root, j, k) con k > j entre las parejas frecuentes de root
+    if s['max_conditions'] >= 3:
+        for idx, j in enumerate(partners):
+            if deadline is not None and time.monotonic() > deadline:
+                break
+            extensions = partners[(partners > j) & (metric_ids[partners] != metric_ids[j])]
+            if len(extensions) == 0:
+                continue
+            triple_bits = pair_bits[idx][None, :] & cond_bits[extensions]
+            keep = popcount(triple_bits) >= min_support
+            itemsets = [(root, int(j), int(k)) for k in extensions[keep]]
+            results.append(_score_itemsets(itemsets, triple_bits[keep]))
+
+    return [r for r in results if r is not None]
+
+
+def mine_value_patterns(df: pd.DataFrame, min_sample_size: int = 30, min_accuracy: float = 0.60,
+                        metric_thresholds: Optional[dict] = None, min_conditions: int = 2,
+                        max_conditions: int = 3, time_budget: Optional[float] = None,
+                        max_workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Busca conjunciones de condiciones con valor esperado positivo.
+
+    Cada condición simple es un bitset sobre los partidos; la muestra de una conjunción
+    es el popcount del AND de sus bitsets. Las ramas cuya muestra cae por debajo de
+    min_sample_size se podan antes de extenderlas (Apriori).
+
+    Args:
+        df: DataFrame procesado (con métricas rolling, resultados y cuotas)
+        min_sample_size: Tamaño mínimo de muestra (n)
+        min_accuracy: Porcentaje mínimo de acierto (0.60 = 60%)
+        metric_thresholds: Umbrales por métrica (default: DEFAULT_METRIC_THRESHOLDS);
+            cada umbral se prueba con >= y con <=
+        min_conditions: Número mínimo de condiciones por patrón
+        max_conditions: Número máximo de condiciones por patrón (hasta 3)
+        time_budget: Segundos máximos de búsqueda; al agotarse se devuelve lo encontrado
+        max_workers: Número de procesos (default: núcleos disponibles; 1 = sin pool)
+
+    Returns:
+        DataFrame con las columnas de OPPORTUNITY_COLUMNS ordenado por EV descendente.
+        df.attrs['truncated'] indica si la búsqueda se cortó por el presupuesto de tiempo
+    """
+    start = time.monotonic()
+    deadline = start + time_budget if time_budget is not None else None
+
+    df = df.dropna(subset=['FTHG', 'FTAG', 'Date'])
+    if metric_thresholds is None:
+        metric_thresholds = DEFAULT_METRIC_THRESHOLDS
+
+    conditions, metric_ids, condition_matrix = build_conditions(df, metric_thresholds)
+    event_names, outcomes, valid_odds, odds = build_event_matrices(df)
+
+    cond_bits = pack_bits(condition_matrix)
+    frequent = np.flatnonzero(popcount(cond_bits) >= min_sample_size)
+
+    state = {
+        'cond_bits': cond_bits,
+        'metric_ids': metric_ids,
+        'frequent': frequent,
+        'event_bits': pack_bits(outcomes.astype(bool)),
+        'valid_bits': pack_bits(valid_odds),
+        'odds': odds,
+        'n_matches': len(df),
+        'min_sample_size': min_sample_size,
+        'min_accuracy': min_accuracy,
+        'min_conditions': min_conditions,
+        'max_conditions': min(max_conditions, 3),
+        'deadline': deadline,
+    }
+
+    print(f"\n⛏ Minando patrones de {min_conditions} a {state['max_conditions']} condiciones...")
+    print(f"   Condiciones simples: {len(conditions)} ({len(frequent)} con muestra suficiente)")
+
+    roots = [int(i) for i in frequent]
+    results = []
+    truncated = False
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers <= 1 or len(roots) <= 1:
+        _init_worker(state)
+        for root in roots:
+            if deadline is not None and time.monotonic() > deadline:
+                truncated = True
+                break
+            results.extend(_mine_root(root))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(state,)) as pool:
+            pending = {pool.submit(_mine_root, root) for root in roots}
+            while pending:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.extend(future.result())
+                if pending and deadline is not None and time.monotonic() > deadline:
+                    # Las raíces sin empezar se cancelan; las que están en curso
+                    # dejan de extender en cuanto ven el deadline
+                    for future in pending:
+                        future.cancel()
+                    truncated = True
+                    break
+
+    if deadline is not None and time.monotonic() > deadline:
+        truncated = True
+
+    if not results:
+        opportunities_df = pd.DataFrame(columns=OPPORTUNITY_COLUMNS)
+    else:
+        itemsets = [itemset for batch in results for itemset in batch[0]]
+        n = np.concatenate([batch[1] for batch in results])
+        hits = np.vstack([batch[2] for batch in results])
+        n_odds = np.vstack([batch[3] for batch in results])
+        odds_sum = np.vstack([batch[4] for batch in results])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_odds = odds_sum / n_odds
+
+        labels = [" AND ".join(f"{conditions[i][0]} {conditions[i][1]} {conditions[i][2]}"
+                               for i in itemset) for itemset in itemsets]
+        stats = {'n': n, 'hits': hits, 'n_odds': n_odds, 'avg_odds': avg_odds}
+        opportunities_df = opportunities_table(labels, event_names, stats,
+                                               min_sample_size, min_accuracy)
+        opportunities_df = opportunities_df.sort_values('EV', ascending=False)
+
+    opportunities_df.attrs['truncated'] = truncated
+
+    elapsed = time.monotonic() - start
+    if truncated:
+        print(f"⚠ Presupuesto de tiempo agotado ({time_budget}s): resultados parciales")
+    print(f"✓ {len(opportunities_df)} patrones multi-condición en {elapsed:.1f}s")
+
+    return opportunities_df
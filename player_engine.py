@@ -1,11 +1,8 @@
-import soccerdata as sd
 import pandas as pd
 from pathlib import Path
 import warnings
 import unicodedata
 
-warnings.filterwarnings('ignore')
-
 # Mapeo de equipos
 TEAM_MAP = {
     "betis": "Real Betis", "real betis": "Real Betis",
@@ -76,6 +73,11 @@ def flatten_and_clean(df, source_name):
     return df
 
 def download_player_stats():
+    # Import diferido: la app usa TEAM_MAP y normalize_name sin necesitar soccerdata
+    # (ni silenciar sus avisos al importar este módulo)
+    import soccerdata as sd
+    warnings.filterwarnings('ignore')
+
     print("📥 Iniciando descarga de JUGADORES 25/26...")
     
     try:
@@ -0,0 +1,228 @@
+"""
+Instrumentación por etapas del pipeline
+Tiempo, filas de entrada/salida y memoria de cada etapa, con informe JSON,
+salida opcional a logging y volcado cProfile opcional de una etapa
+"""
+
+import cProfile
+import io
+import json
+import logging
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    # Solo Unix; en Windows no se informa la memoria RSS
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger("analista.profiler")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Memoria RSS máxima del proceso hasta ahora.
+
+    Returns:
+        MB, o None si la plataforma no lo permite
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa en KB y macOS en bytes
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class _NullStage:
+    """Etapa sin instrumentar: lo que devuelve stage() con el profiler desactivado."""
+
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        # rows_out se ignora: no se guarda nada
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Etapa en curso. rows_out se puede fijar dentro del bloque with."""
+
+    def __init__(self, profiler: 'StageProfiler', name: str, rows_in: Optional[int]):
+        self.profiler = profiler
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.depth = len(profiler._stack)
+        self._child_peak = 0
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._stack.append(self)
+        if profiler.trace_memory:
+            tracemalloc.reset_peak()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+        if profiler.profile_stage == self.name:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        profiler = self.profiler
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            profiler._dump_profile(self.name, self._cprofile)
+
+        record = {
+            'stage': self.name,
+            'depth': self.depth,
+            'wall_s': round(elapsed, 4),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_rss_mb': peak_rss_mb(),
+            'ok': exc_type is None,
+        }
+        if profiler.trace_memory:
+            # reset_peak en las etapas anidadas: el pico de esta etapa es el mayor
+            # entre el de sus hijas y el medido desde la última hija
+            peak = max(tracemalloc.get_traced_memory()[1], self._child_peak)
+            record['tracemalloc_peak_mb'] = round((peak - self._traced_start) / 2**20, 2)
+            profiler._stack.pop()
+            if profiler._stack:
+                parent = profiler._stack[-1]
+                parent._child_peak = max(parent._child_peak, peak)
+        else:
+            profiler._stack.pop()
+
+        profiler.records.append(record)
+        profiler._log(record)
+        return False
+
+
+class StageProfiler:
+    """
+    Mide las etapas de FootballDataProcessor. Desactivado (por defecto), stage()
+    devuelve un contexto vacío compartido y el coste es despreciable.
+    """
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = False,
+                 profile_stage: Optional[str] = None, profile_dir: str = ".",
+                 log_handler: Optional[logging.Handler] = None):
+        """
+        Inicializa el profiler.
+
+        Args:
+            enabled: Si False, no se mide nada
+            trace_memory: Medir el pico de memoria Python de cada etapa con tracemalloc
+                (ralentiza bastante las etapas con muchas asignaciones)
+            profile_stage: Nombre de la etapa a perfilar con cProfile
+            profile_dir: Directorio donde se guarda profile_<etapa>.prof
+            log_handler: Handler de logging al que enviar una línea por etapa
+        """
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.profile_stage = profile_stage if enabled else None
+        self.profile_dir = Path(profile_dir)
+        self.records: List[dict] = []
+        self._stack: List[_Stage] = []
+        self._started_tracemalloc = False
+
+        if log_handler is not None:
+            logger.addHandler(log_handler)
+            logger.setLevel(logging.INFO)
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        """
+        Contexto que mide una etapa.
+
+        Args:
+            name: Nombre de la etapa
+            rows_in: Filas de entrada (opcional)
+
+        Returns:
+            Objeto de contexto; asignar `rows_out` dentro del bloque para registrar la salida
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows_in)
+
+    def _log(self, record: dict) -> None:
+        rows = ""
+        if record['rows_in'] is not None or record['rows_out'] is not None:
+            rows = f", filas {record['rows_in']} -> {record['rows_out']}"
+        memory = ""
+        if 'tracemalloc_peak_mb' in record:
+            memory = f", pico {record['tracemalloc_peak_mb']} MB"
+        logger.info(f"{'  ' * record['depth']}{record['stage']}: {record['wall_s']:.3f}s{rows}{memory}")
+
+    def _dump_profile(self, name: str, profile: cProfile.Profile) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        path = self.profile_dir / f"profile_{name}.prof"
+        profile.dump_stats(str(path))
+
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(15)
+        logger.info(f"cProfile de '{name}' guardado en {path}\n{summary.getvalue()}")
+
+    def report(self) -> dict:
+        """
+        Informe estructurado de las etapas medidas.
+
+        Returns:
+            Diccionario con metadatos del entorno y la lista de etapas (en orden de finalización)
+        """
+        import numpy as np
+        import pandas as pd
+
+        top_level = [r for r in self.records if r['depth'] == 0]
+        return {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'total_s': round(sum(r['wall_s'] for r in top_level), 4),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.records,
+        }
+
+    def save_report(self, path: str) -> Path:
+        """
+        Guarda el informe en JSON.
+
+        Args:
+            path: Ruta del archivo
+
+        Returns:
+            Ruta escrita
+        """
+        path = Path(path)
+        path.write_text(json.dumps(self.report(), indent=2, ensure_ascii=False), encoding='utf-8')
+        return path
+
+    def close(self) -> None:
+        """Detiene tracemalloc si lo inició este profiler."""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
@@ -0,0 +1,326 @@
+"""
+Benchmark de escalabilidad del pipeline con datos sintéticos
+Genera CSV con el formato de football-data.co.uk a 1x, 10x, 100x o 1000x el volumen actual
+y mide carga, métricas de forma, búsqueda de oportunidades y get_advanced_form
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import subprocess
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_processor import FootballDataProcessor
+from ingestion import APP_COLUMNS, load_matches, match_files
+from profiler import StageProfiler
+from team_form import get_advanced_form
+
+# Volumen actual: SP1 (20 equipos) y SP2 (22 equipos), temporadas 2004/05 - 2025/26
+BASE_LEAGUE_SIZES = (20, 22)
+FIRST_SEASON = 2004
+N_SEASONS = 22
+
+# Casas de apuestas adicionales: los CSV reales traen muchas más columnas de las que se usan
+EXTRA_BOOKMAKERS = ['IW', 'PS', 'VC', 'Max', 'Avg']
+
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def _round_robin(n_teams: int) -> tuple:
+    # Método del círculo: (local, visitante, jornada) de una liga a doble vuelta
+    teams = list(range(n_teams))
+    home, away, rounds = [], [], []
+    for r in range(n_teams - 1):
+        for i in range(n_teams // 2):
+            a, b = teams[i], teams[n_teams - 1 - i]
+            if r % 2:
+                a, b = b, a
+            home.append(a)
+            away.append(b)
+            rounds.append(r)
+        teams = [teams[0]] + [teams[-1]] + teams[1:-1]
+    home, away, rounds = np.array(home), np.array(away), np.array(rounds)
+    # Segunda vuelta: mismos cruces con el campo cambiado
+    return (np.concatenate([home, away]), np.concatenate([away, home]),
+            np.concatenate([rounds, rounds + n_teams - 1]))
+
+
+def _odds(probability: np.ndarray, margin: float, rng: np.random.Generator) -> np.ndarray:
+    noise = rng.normal(1.0, 0.02, probability.shape)
+    return np.round(np.clip(1 / (probability * margin) * noise, 1.01, 50.0), 2)
+
+
+def generate_season(div: str, season: int, team_names: List[str], strengths: np.ndarray,
+                    rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Genera una temporada completa de una liga con las columnas de football-data.co.uk.
+
+    Args:
+        div: Código de la división (columna Div)
+        season: Año de inicio de la temporada
+        team_names: Equipos de la temporada (número par)
+        strengths: Matriz (equipos, 2) con ataque y defensa de cada equipo
+        rng: Generador aleatorio
+
+    Returns:
+        DataFrame con un partido por fila, ordenado por fecha
+    """
+    n = len(team_names)
+    home, away, rounds = _round_robin(n)
+    m = len(home)
+
+    start = date(season, 8, 15)
+    day_offset = rounds * 7 + rng.integers(0, 3, m)
+    dates = [(start + timedelta(days=int(d))).strftime('%d/%m/%Y') for d in day_offset]
+
+    # Goles Poisson con ventaja de campo y fuerzas de ataque/defensa
+    lam_home = np.exp(0.30 + strengths[home, 0] - strengths[away, 1])
+    lam_away = np.exp(0.05 + strengths[away, 0] - strengths[home, 1])
+    fthg, ftag = rng.poisson(lam_home), rng.poisson(lam_away)
+    hthg, htag = rng.binomial(fthg, 0.45), rng.binomial(ftag, 0.45)
+
+    def result(h, a):
+        return np.where(h > a, 'H', np.where(h < a, 'A', 'D'))
+
+    hs = rng.poisson(9 + 3 * lam_home)
+    as_ = rng.poisson(7 + 3 * lam_away)
+    hst = np.maximum(rng.binomial(hs, 0.35), fthg)
+    ast = np.maximum(rng.binomial(as_, 0.35), ftag)
+
+    # Cuotas a partir de las probabilidades del modelo (aproximadas) con margen
+    diff = lam_home - lam_away
+    p_draw = np.full(m, 0.26)
+    p_home = (1 - p_draw) / (1 + np.exp(-1.6 * diff))
+    p_away = 1 - p_draw - p_home
+    total = lam_home + lam_away
+    p_over = 1 - np.exp(-total) * (1 + total + total ** 2 / 2)
+
+    df = pd.DataFrame({
+        'Div': div,
+        'Date': dates,
+        'Time': rng.choice(['14:00', '16:15', '18:30', '21:00'], m),
+        'HomeTeam': np.asarray(team_names)[home],
+        'AwayTeam': np.asarray(team_names)[away],
+        'FTHG': fthg, 'FTAG': ftag, 'FTR': result(fthg, ftag),
+        'HTHG': hthg, 'HTAG': htag, 'HTR': result(hthg, htag),
+        'HS': hs, 'AS': as_, 'HST': hst, 'AST': ast,
+        'HF': rng.poisson(12, m), 'AF': rng.poisson(13, m),
+        'HC': rng.poisson(5.5, m), 'AC': rng.poisson(4.5, m),
+        'HY': rng.poisson(2.0, m), 'AY': rng.poisson(2.3, m),
+        'HR': rng.poisson(0.08, m), 'AR': rng.poisson(0.1, m),
+    })
+    for prefix, margin in [('B365', 1.05), ('BW', 1.06), ('WH', 1.06)] + [(b, 1.05) for b in EXTRA_BOOKMAKERS]:
+        df[f'{prefix}H'] = _odds(p_home, margin, rng)
+        df[f'{prefix}D'] = _odds(p_draw, margin, rng)
+        df[f'{prefix}A'] = _odds(p_away, margin, rng)
+    for prefix in ['B365', 'P', 'Avg', 'Max']:
+        df[f'{prefix}>2.5'] = _odds(p_over, 1.05, rng)
+        df[f'{prefix}<2.5'] = _odds(1 - p_over, 1.05, rng)
+
+    return df.iloc[np.argsort(day_offset, kind='stable')]
+
+
+def generate_dataset(out_dir: str, scale: float = 1.0, seed: int = 0) -> dict:
+    """
+    Genera un directorio de CSV sintéticos con `scale` veces el volumen actual.
+    El volumen crece con el número de ligas (2 por unidad de escala), 22 temporadas cada una.
+
+    Args:
+        out_dir: Directorio de salida (se crea si no existe)
+        scale: Factor de escala (1 = volumen actual)
+        seed: Semilla del generador
+
+    Returns:
+        Diccionario con 'files' y 'matches' generados
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    n_leagues = max(1, int(round(len(BASE_LEAGUE_SIZES) * scale)))
+    n_files = 0
+    n_matches = 0
+    for league in range(n_leagues):
+        div = f'SP{league + 1}' if league < len(BASE_LEAGUE_SIZES) else f'L{league + 1:04d}'
+        size = BASE_LEAGUE_SIZES[league % len(BASE_LEAGUE_SIZES)]
+        # Bolsa de equipos algo mayor que la liga: cada temporada juegan `size` de ellos
+        pool = [f'{div} Club {k + 1:02d}' for k in range(size + 4)]
+        strengths = rng.normal(0.0, 0.2, (len(pool), 2))
+
+        for season in range(FIRST_SEASON, FIRST_SEASON + N_SEASONS):
+            chosen = np.sort(rng.choice(len(pool), size, replace=False))
+            df = generate_season(div, season, [pool[i] for i in chosen], strengths[chosen], rng)
+            name = f'{div}_{season % 100:02d}{(season + 1) % 100:02d}.csv'
+            df.to_csv(out_dir / name, index=False)
+            n_files += 1
+            n_matches += len(df)
+
+    return {'files': n_files, 'matches': n_matches}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def run_scale(data_dir: str, trace_memory: bool = False, form_calls: int = 20,
+              seed: int = 0) -> List[dict]:
+    """
+    Mide los puntos de entrada del pipeline sobre un directorio de CSV.
+
+    Args:
+        data_dir: Directorio con los CSV
+        trace_memory: Medir además el pico de memoria de cada etapa (tracemalloc)
+        form_calls: Número de llamadas a get_advanced_form (equipos al azar)
+        seed: Semilla para elegir los equipos
+
+    Returns:
+        Lista de registros de etapa (ver StageProfiler.records)
+    """
+    profiler = StageProfiler(trace_memory=trace_memory)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor = FootballDataProcessor(data_dir, use_cache=False, profiler=profiler)
+        with profiler.stage('load_and_concat_data') as stage:
+            df = processor.load_and_concat_data()
+            stage.rows_out = len(df)
+
+        # Con caché: la primera lectura la crea, la segunda es la que se mide
+        cached = FootballDataProcessor(data_dir, use_cache=True)
+        cached.load_and_concat_data()
+        with profiler.stage('load_and_concat_data (caché)') as stage:
+            stage.rows_out = len(cached.load_and_concat_data())
+
+        df = processor.convert_date_column(df)
+        with profiler.stage('calculate_rolling_metrics', rows_in=len(df)) as stage:
+            processor.df = processor.calculate_rolling_metrics(df, window=processor.rolling_window)
+            stage.rows_out = len(processor.df)
+
+        with profiler.stage('find_value_opportunities', rows_in=len(processor.df)) as stage:
+            stage.rows_out = len(processor.find_value_opportunities())
+
+        app_df = load_matches(match_files(Path(data_dir)), columns=APP_COLUMNS).sort_values('Date')
+        teams = np.random.default_rng(seed).choice(
+            app_df['HomeTeam'].astype('object').unique(), form_calls)
+        with profiler.stage('get_advanced_form', rows_in=len(app_df)) as stage:
+            for team in teams:
+                get_advanced_form(app_df, team, games=5)
+            stage.rows_out = len(teams)
+
+    profiler.close()
+    return profiler.records
+
+
+def run_benchmark(scales: List[float], output: str = DEFAULT_RESULTS_FILE,
+                  data_root: Optional[str] = None, trace_memory: bool = False,
+                  form_calls: int = 20, keep_data: bool = False) -> pd.DataFrame:
+    """
+    Genera los datos de cada escala, mide el pipeline y añade una línea JSON por escala a `output`.
+
+    Args:
+        scales: Factores de escala (p. ej. [1, 10, 100, 1000])
+        output: Archivo JSON Lines donde se acumulan los resultados (comparables entre commits)
+        data_root: Directorio donde generar los datos (default: temporal)
+        trace_memory: Medir el pico de memoria de cada etapa (más lento)
+        form_calls: Número de llamadas a get_advanced_form por escala
+        keep_data: Conservar los CSV generados
+
+    Returns:
+        DataFrame con una fila por (escala, etapa)
+    """
+    root = Path(data_root) if data_root else Path(tempfile.mkdtemp(prefix="analista_bench_"))
+    commit = _git_commit()
+    rows = []
+
+    for scale in scales:
+        data_dir = root / f"x{scale:g}"
+        if not match_files(data_dir):
+            print(f"⏳ Generando datos sintéticos x{scale:g}...")
+            info = generate_dataset(data_dir, scale)
+        else:
+            files = match_files(data_dir)
+            info = {'files': len(files), 'matches': None}
+        print(f"⏱ Midiendo x{scale:g} ({info['files']} archivos)...")
+
+        stages = run_scale(data_dir, trace_memory=trace_memory, form_calls=form_calls)
+        record = {
+            'commit': commit,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'scale': scale,
+            'trace_memory': trace_memory,
+            **info,
+            'stages': stages,
+        }
+        with open(output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        for stage in stages:
+            if stage['depth'] == 0:
+                rows.append({'escala': scale, **{k: v for k, v in stage.items() if k != 'depth'}})
+
+        if not keep_data and data_root is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if not keep_data and data_root is None:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"✓ Resultados añadidos a {output}")
+    return pd.DataFrame(rows)
+
+
+def compare_results(path: str = DEFAULT_RESULTS_FILE) -> pd.DataFrame:
+    """
+    Tabla de tiempos por commit a partir del archivo de resultados.
+
+    Args:
+        path: Archivo JSON Lines escrito por run_benchmark
+
+    Returns:
+        DataFrame (escala, etapa) × commit con el tiempo en segundos de la última ejecución
+    """
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            for stage in record['stages']:
+                if stage['depth'] == 0:
+                    rows.append({'commit': record['commit'], 'escala': record['scale'],
+                                 'etapa': stage['stage'], 'wall_s': stage['wall_s']})
+    if not rows:
+        return pd.DataFrame()
+    table = pd.DataFrame(rows)
+    return table.pivot_table(index=['escala', 'etapa'], columns='commit', values='wall_s',
+                             aggfunc='last', sort=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de escalabilidad con datos sintéticos")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10],
+                        help="Factores de escala (1 = volumen actual); p. ej. 1 10 100 1000")
+    parser.add_argument('--output', default=DEFAULT_RESULTS_FILE, help="Archivo JSON Lines de resultados")
+    parser.add_argument('--data-root', default=None, help="Directorio para los datos generados")
+    parser.add_argument('--memory', action='store_true', help="Medir el pico de memoria (tracemalloc)")
+    parser.add_argument('--form-calls', type=int, default=20, help="Llamadas a get_advanced_form")
+    parser.add_argument('--keep-data', action='store_true', help="No borrar los CSV generados")
+    parser.add_argument('--compare', action='store_true', help="Solo mostrar la comparación entre commits")
+    args = parser.parse_args()
+
+    pd.set_option('display.width', 200)
+    if args.compare:
+        print(compare_results(args.output).to_string())
+    else:
+        results = run_benchmark(args.scales, output=args.output, data_root=args.data_root,
+                                trace_memory=args.memory, form_calls=args.form_calls,
+                                keep_data=args.keep_data)
+        print(results.to_string(index=False))
@@ -0,0 +1,297 @@
+"""
+Simulador Monte Carlo de temporadas
+Simula los partidos que quedan de una temporada en bloques de arrays (simulaciones × partidos)
+y devuelve la probabilidad de cada equipo de acabar en cada posición
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtester import match_seasons
+from goal_model import GoalModelCache, division_of, fit_season, outcome_probabilities
+from ingestion import MATCH_KEY
+
+# Simulaciones por bloque: acota la memoria (bloque × partidos restantes en float32)
+CHUNK_SIZE = 10_000
+
+PROBABILITY_COLUMNS = ['Prob Local', 'Prob Empate', 'Prob Visitante']
+
+# Zonas de la clasificación: (primera, última) posición; las negativas cuentan desde abajo
+LEAGUE_ZONES = {
+    'SP1': {'Campeón': (1, 1), 'Champions': (1, 4), 'Descenso': (-3, -1)},
+    'SP2': {'Ascenso Directo': (1, 2), 'Playoff': (3, 6), 'Descenso': (-4, -1)},
+}
+
+# Estado compartido por los workers (se envía una vez en el initializer del pool)
+_STATE: dict = {}
+
+
+def current_table(df: pd.DataFrame, division: str, season: int, teams: Iterable = ()) -> tuple:
+    """
+    Partidos jugados y clasificación actual de una división y temporada.
+
+    Los equipos de la liga son todos los que aparecen en sus partidos de la temporada
+    (jugados o no) más los indicados en teams: los que aún no han jugado entran con 0 puntos.
+
+    Args:
+        df: DataFrame procesado
+        division: División ('SP1', 'SP2', ...)
+        season: Año de inicio de la temporada (la del archivo de origen, ver match_seasons)
+        teams: Equipos adicionales de la liga (p. ej. los del calendario pendiente)
+
+    Returns:
+        Tupla (partidos jugados sin duplicados, clasificación con Puntos, Jugados y DG por equipo)
+    """
+    selected = (division_of(df).to_numpy() == division) & (match_seasons(df) == season)
+    season_matches = df.loc[selected].drop_duplicates(MATCH_KEY)
+    members = pd.unique(np.concatenate([season_matches['HomeTeam'].dropna().astype('object').to_numpy(),
+                                        season_matches['AwayTeam'].dropna().astype('object').to_numpy(),
+                                        np.asarray(list(teams), dtype=object)]))
+    played = season_matches.dropna(subset=['FTHG', 'FTAG'])
+
+    home = played['HomeTeam'].astype('object').to_numpy()
+    away = played['AwayTeam'].astype('object').to_numpy()
+    home_goals = played['FTHG'].to_numpy(dtype='float64')
+    away_goals = played['FTAG'].to_numpy(dtype='float64')
+    home_points = np.where(home_goals > away_goals, 3, np.where(home_goals == away_goals, 1, 0))
+    away_points = np.where(away_goals > home_goals, 3, np.where(home_goals == away_goals, 1, 0))
+
+    long = pd.DataFrame({
+        'Equipo': np.concatenate([home, away]),
+        'Puntos': np.concatenate([home_points, away_points]),
+        'DG': np.concatenate([home_goals - away_goals, away_goals - home_goals]),
+    })
+    table = long.groupby('Equipo').agg(Puntos=('Puntos', 'sum'), Jugados=('Puntos', 'size'),
+                                       DG=('DG', 'sum'))
+    table = table.reindex(pd.Index(sorted(members), name='Equipo'), fill_value=0)
+    return played, table.sort_values(['Puntos', 'DG'], ascending=False, kind='mergesort')
+
+
+def remaining_fixtures(played: pd.DataFrame, teams) -> pd.DataFrame:
+    """
+    Partidos pendientes de una liga a doble vuelta: todos los cruces local-visitante
+    entre los equipos que no se han jugado todavía.
+
+    Args:
+        played: Partidos jugados de la temporada
+        teams: Equipos de la liga
+
+    Returns:
+        DataFrame con HomeTeam y AwayTeam
+    """
+    teams = sorted(teams)
+    home, away = np.meshgrid(teams, teams, indexing='ij')
+    pairs = pd.DataFrame({'HomeTeam': home.ravel(), 'AwayTeam': away.ravel()})
+    pairs = pairs[pairs['HomeTeam'] != pairs['AwayTeam']]
+    done = pd.MultiIndex.from_arrays([played['HomeTeam'].astype('object'),
+                                      played['AwayTeam'].astype('object')])
+    pending = ~pd.MultiIndex.from_frame(pairs).isin(done)
+    return pairs[pending].reset_index(drop=True)
+
+
+def fixture_probabilities(fixtures: pd.DataFrame, fit: Optional[dict] = None) -> np.ndarray:
+    """
+    Probabilidades 1X2 de cada partido, por orden de preferencia: columnas
+    PROBABILITY_COLUMNS del propio partido, cuotas B365H/D/A (probabilidades implícitas
+    sin el margen de la casa) o el modelo de goles.
+
+    Args:
+        fixtures: Partidos con HomeTeam y AwayTeam (y opcionalmente probabilidades o cuotas)
+        fit: Ajuste de goal_model para los partidos sin probabilidades ni cuotas
+
+    Returns:
+        Matriz (partidos, 3) con las probabilidades de local, empate y visitante
+    """
+    probabilities = np.full((len(fixtures), 3), np.nan)
+    if all(col in fixtures.columns for col in PROBABILITY_COLUMNS):
+        probabilities = fixtures[PROBABILITY_COLUMNS].to_numpy(dtype='float64')
+
+    odds_cols = ['B365H', 'B365D', 'B365A']
+    pending = np.isnan(probabilities).any(axis=1)
+    if pending.any() and all(col in fixtures.columns for col in odds_cols):
+        with np.errstate(divide='ignore'):
+            implied = 1.0 / fixtures[odds_cols].to_numpy(dtype='float64')
+        usable = pending & np.isfinite(implied).all(axis=1) & (implied > 0).all(axis=1)
+        probabilities[usable] = implied[usable] / implied[usable].sum(axis=1, keepdims=True)
+
+    pending = np.isnan(probabilities).any(axis=1)
+    if pending.any():
+        if fit is None:
+            raise ValueError("Hay partidos sin probabilidades ni cuotas y no se ha indicado modelo")
+        homes = fixtures['HomeTeam'].astype('object').to_numpy()
+        aways = fixtures['AwayTeam'].astype('object').to_numpy()
+        # Equipos que aún no han jugado (sin ajuste): ataque y defensa medios (0)
+        unfitted = sorted((set(homes[pending]) | set(aways[pending])) - set(fit['equipos']))
+        if unfitted:
+            fit = {**fit, 'equipos': fit['equipos'] + unfitted,
+                   'attack': fit['attack'] + [0.0] * len(unfitted),
+                   'defence': fit['defence'] + [0.0] * len(unfitted)}
+        for i in np.flatnonzero(pending):
+            outcome = outcome_probabilities(fit, homes[i], aways[i])
+            probabilities[i] = [outcome['Victoria Local'], outcome['Empate'],
+                                outcome['Victoria Visitante']]
+
+    return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def _init_worker(state: dict) -> None:
+    _STATE.clear()
+    _STATE.update(state)
+
+
+def _simulate_chunk(task: tuple) -> tuple:
+    """
+    Simula un bloque de temporadas. Todo son arrays: resultados (simulaciones × partidos),
+    puntos por equipo con dos productos matriciales y posiciones con un argsort por fila.
+    """
+    seed, n_sims = task
+    s = _STATE
+    rng = np.random.default_rng(seed)
+    n_teams = len(s['points'])
+
+    draws = rng.random((n_sims, s['n_fixtures']), dtype=np.float32)
+    home_win = draws < s['p_home']
+    draw = ~home_win & (draws < s['p_home_or_draw'])
+    away_win = ~(home_win | draw)
+
+    home_points = (3 * home_win + draw).astype(np.float32)
+    away_points = (3 * away_win + draw).astype(np.float32)
+    points = s['points'] + home_points @ s['home_incidence'] + away_points @ s['away_incidence']
+
+    # Desempate: diferencia de goles actual y, si persiste, al azar. Los puntos son enteros
+    # y los desempates suman menos de 1
+    key = points + s['tiebreak'] + rng.random(points.shape, dtype=np.float32) * s['jitter']
+    order = np.argsort(-key, axis=1)
+
+    # counts[equipo, posición]
+    cells = order * n_teams + np.arange(n_teams)
+    counts = np.bincount(cells.ravel(), minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+    return counts, points.sum(axis=0, dtype=np.float64), (points.astype(np.float64) ** 2).sum(axis=0)
+
+
+def simulate_season(df: pd.DataFrame, division: str, season: Optional[int] = None,
+                    fixtures: Optional[pd.DataFrame] = None, n_sims: int = 100_000,
+                    seed: Optional[int] = None, max_workers: Optional[int] = 1,
+                    cache_dir: Optional[str] = None) -> tuple:
+    """
+    Simula el resto de una temporada n_sims veces.
+
+    Args:
+        df: DataFrame procesado
+        division: División ('SP1', 'SP2', ...)
+        season: Año de inicio de la temporada (default: la última de la división)
+        fixtures: Partidos pendientes (HomeTeam, AwayTeam y opcionalmente probabilidades
+            o cuotas, ver fixture_probabilities). Default: los cruces de la doble vuelta
+            que faltan, con probabilidades del modelo de goles de la temporada
+        n_sims: Número de temporadas simuladas
+        seed: Semilla (mismo resultado con cualquier número de procesos)
+        max_workers: Número de procesos (default: 1, sin pool; None = núcleos disponibles).
+            Un bloque de 10.000 temporadas tarda ~60 ms, así que arrancar el pool y copiar
+            el estado a cada proceso no compensa con 100k simulaciones
+        cache_dir: Caché de ajustes del modelo de goles (None = sin caché)
+
+    Returns:
+        Tupla (tabla final simulada con puntos esperados y probabilidades de cada zona,
+        matriz equipo × posición con la probabilidad de acabar en cada puesto)
+    """
+    if season is None:
+        season = int(match_seasons(df)[division_of(df).to_numpy() == division].max())
+
+    # Los equipos del calendario pendiente también son de la liga, aunque no hayan jugado
+    fixture_teams = () if fixtures is None else np.concatenate([
+        fixtures['HomeTeam'].astype('object').to_numpy(), fixtures['AwayTeam'].astype('object').to_numpy()])
+    played, table = current_table(df, division, season, teams=fixture_teams)
+    teams = table.index.tolist()
+    n_teams = len(teams)
+    if fixtures is None:
+        fixtures = remaining_fixtures(played, teams)
+
+    fit = None
+    needs_model = not all(col in fixtures.columns for col in PROBABILITY_COLUMNS + ['B365H'])
+    if needs_model and len(fixtures):
+        cache = GoalModelCache(cache_dir) if cache_dir is not None else None
+        fit = fit_season(df, division, season, cache=cache)
+    probabilities = fixture_probabilities(fixtures, fit) if len(fixtures) else np.zeros((0, 3))
+
+    team_index = {team: i for i, team in enumerate(teams)}
+    home_idx = fixtures['HomeTeam'].astype('object').map(team_index).to_numpy()
+    away_idx = fixtures['AwayTeam'].astype('object').map(team_index).to_numpy()
+    if pd.isna(home_idx).any() or pd.isna(away_idx).any():
+        raise ValueError("Hay partidos pendientes con equipos que no están en la clasificación")
+    home_incidence = np.zeros((len(fixtures), n_teams), dtype=np.float32)
+    away_incidence = np.zeros((len(fixtures), n_teams), dtype=np.float32)
+    home_incidence[np.arange(len(fixtures)), home_idx.astype(int)] = 1
+    away_incidence[np.arange(len(fixtures)), away_idx.astype(int)] = 1
+
+    # Rango de la diferencia de goles actual (empates con el mismo rango) en [0, 0.5)
+    goal_diff_rank = table['DG'].rank(method='min').to_numpy() - 1
+    tiebreak = (goal_diff_rank * 0.5 / n_teams).astype(np.float32)
+
+    state = {
+        'n_fixtures': len(fixtures),
+        'p_home': probabilities[:, 0].astype(np.float32),
+        'p_home_or_draw': (probabilities[:, 0] + probabilities[:, 1]).astype(np.float32),
+        'home_incidence': home_incidence,
+        'away_incidence': away_incidence,
+        'points': table['Puntos'].to_numpy(dtype=np.float32),
+        'tiebreak': tiebreak,
+        'jitter': np.float32(0.4 / n_teams),
+    }
+
+    # Un generador independiente por bloque: el resultado no depende del reparto entre procesos
+    sizes = [CHUNK_SIZE] * (n_sims // CHUNK_SIZE) + ([n_sims % CHUNK_SIZE] if n_sims % CHUNK_SIZE else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(seeds, sizes))
+
+    print(f"\n🎲 Simulando {division} {season}/{(season + 1) % 100:02d}: "
+          f"{len(fixtures)} partidos pendientes × {n_sims} temporadas")
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        _init_worker(state)
+        results = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(state,)) as pool:
+            results = list(pool.map(_simulate_chunk, tasks))
+
+    counts = sum(result[0] for result in results)
+    points_sum = sum(result[1] for result in results)
+    points_sq = sum(result[2] for result in results)
+
+    positions = pd.DataFrame(counts / n_sims, index=pd.Index(teams, name='Equipo'),
+                             columns=pd.RangeIndex(1, n_teams + 1, name='Posición'))
+
+    expected_points = points_sum / n_sims
+    summary = pd.DataFrame({
+        'Puntos': table['Puntos'].to_numpy(),
+        'Jugados': table['Jugados'].to_numpy(),
+        'Puntos Esperados': expected_points,
+        'Desv. Puntos': np.sqrt(np.maximum(points_sq / n_sims - expected_points ** 2, 0)),
+        'Posición Media': counts @ np.arange(1, n_teams + 1) / n_sims,
+    }, index=positions.index)
+    for zone, (first, last) in LEAGUE_ZONES.get(division, {}).items():
+        first = first if first > 0 else n_teams + first + 1
+        last = last if last > 0 else n_teams + last + 1
+        summary[zone] = positions.loc[:, first:last].sum(axis=1)
+
+    summary = summary.sort_values('Posición Media')
+    print(f"✓ Favorito: {summary.index[0]} ({positions.loc[summary.index[0], 1]:.1%} de títulos)")
+
+    return summary.reset_index(), positions.loc[summary.index]
+
+
+if __name__ == "__main__":
+    from data_processor import FootballDataProcessor
+
+    processor = FootballDataProcessor(data_dir="DATOS")
+    processor.process_all()
+    for league in LEAGUE_ZONES:
+        table, _ = simulate_season(processor.df, league, seed=0)
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
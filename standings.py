@@ -0,0 +1,228 @@
+"""
+Clasificación a fecha
+Índice de la clasificación de cada división y temporada tal como estaba antes de cada
+jornada: puntos, diferencia de goles y partidos jugados acumulados por equipo
+"""
+
+from bisect import bisect_right
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from backtester import match_seasons
+from goal_model import division_of
+from ingestion import MATCH_KEY
+
+# Columnas que añade FootballDataProcessor.add_standings
+STANDINGS_COLUMNS = ['Home_Position', 'Away_Position', 'Home_Table_Points', 'Away_Table_Points']
+
+# Umbrales para pattern_miner, que prueba >= y <= (Home_Position <= 4: local entre los cuatro primeros)
+STANDINGS_METRIC_THRESHOLDS = {
+    'Home_Position': [4, 6, 10, 17, 18],
+    'Away_Position': [4, 6, 10, 17, 18],
+}
+
+
+class StandingsIndex:
+    """
+    Clasificaciones acumuladas por (división, temporada). Para cada una se guarda una
+    matriz (fechas + 1, equipos) por estadística: la fila i es la clasificación antes de
+    la i-ésima fecha con partidos. Consultar un equipo en una fecha es una búsqueda
+    binaria sobre las fechas de su temporada.
+
+    Orden de la clasificación: puntos, diferencia de goles, goles a favor y nombre.
+
+    Las temporadas salen del archivo de origen (match_seasons), no de la fecha: la 2019/20
+    acabó en julio de 2020. Una consulta por fecha usa la última temporada empezada en esa fecha.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Construye el índice.
+
+        Args:
+            df: DataFrame procesado (Date, HomeTeam, AwayTeam, FTHG, FTAG y Div o Season)
+        """
+        # Códigos de equipo ordenados por nombre: el orden de los códigos es el del desempate final
+        codes, names = pd.factorize(np.concatenate([df['HomeTeam'].astype('object').to_numpy(),
+                                                    df['AwayTeam'].astype('object').to_numpy()]),
+                                    sort=True)
+        self.team_names = list(names)
+        n_rows = len(df)
+        home_ids, away_ids = codes[:n_rows], codes[n_rows:]
+        home_goals = df['FTHG'].to_numpy(dtype='float64')
+        away_goals = df['FTAG'].to_numpy(dtype='float64')
+        dates = df['Date'].to_numpy()
+        # Los CSV de la temporada en curso pueden estar repetidos (SP1.csv y SP1_2526.csv)
+        unique_rows = ~df.duplicated(MATCH_KEY).to_numpy()
+
+        self.tables: dict = {}
+        # (equipo, temporada) -> división
+        self.team_division: dict = {}
+        # Equipo / división -> [(fecha del primer partido, temporada)], para consultas por fecha
+        self.team_seasons: dict = {}
+        self.division_seasons: dict = {}
+        for (division, season), rows in _season_groups(df, unique_rows):
+            table = self._build_table(home_ids[rows], away_ids[rows], home_goals[rows],
+                                      away_goals[rows], dates[rows], self.team_names)
+            self.tables[(division, season)] = table
+            first_date = dates[rows].min()
+            self.division_seasons.setdefault(division, []).append((first_date, season))
+            for team in table['teams']:
+                self.team_division[(team, season)] = division
+                self.team_seasons.setdefault(team, []).append((first_date, season))
+        for starts in (*self.team_seasons.values(), *self.division_seasons.values()):
+            starts.sort()
+
+    @staticmethod
+    def _build_table(home_ids: np.ndarray, away_ids: np.ndarray, home_goals: np.ndarray,
+                     away_goals: np.ndarray, dates: np.ndarray, team_names: list) -> dict:
+        team_ids = np.unique(np.concatenate([home_ids, away_ids]))
+        team_ids = team_ids[team_ids >= 0]
+        n_teams = len(team_ids)
+
+        played = ~np.isnan(home_goals) & ~np.isnan(away_goals) & (home_ids >= 0) & (away_ids >= 0)
+        match_dates = np.unique(dates[played])
+        date_idx = np.searchsorted(match_dates, dates[played])
+        home_idx = np.searchsorted(team_ids, home_ids[played])
+        away_idx = np.searchsorted(team_ids, away_ids[played])
+        home_goals = home_goals[played].astype(np.int64)
+        away_goals = away_goals[played].astype(np.int64)
+
+        home_points = np.where(home_goals > away_goals, 3, (home_goals == away_goals).astype(np.int64))
+        away_points = np.where(away_goals > home_goals, 3, (home_goals == away_goals).astype(np.int64))
+
+        # Cambios de cada fecha (D, T) y acumulado con una fila inicial a cero (D + 1, T)
+        stats = {}
+        for name, home_values, away_values in (('points', home_points, away_points),
+                                               ('goal_diff', home_goals - away_goals,
+                                                away_goals - home_goals),
+                                               ('goals_for', home_goals, away_goals),
+                                               ('played', np.ones_like(home_goals),
+                                                np.ones_like(away_goals))):
+            delta = np.zeros((len(match_dates) + 1, n_teams), dtype=np.int64)
+            np.add.at(delta, (date_idx + 1, home_idx), home_values)
+            np.add.at(delta, (date_idx + 1, away_idx), away_values)
+            stats[name] = np.cumsum(delta, axis=0)
+
+        # Una clave entera por fila: el argsort estable deja los empates por nombre
+        key = (stats['points'] * 2001 + stats['goal_diff'] + 1000) * 1000 + stats['goals_for']
+        order = np.argsort(-key, axis=1, kind='stable')
+        positions = np.empty_like(order)
+        np.put_along_axis(positions, order, np.arange(1, n_teams + 1)[None, :], axis=1)
+
+        teams = [team_names[i] for i in team_ids]
+        return {'teams': teams, 'team_ids': team_ids, 'codes': {team: i for i, team in enumerate(teams)},
+                'dates': match_dates, 'positions': positions, **stats}
+
+    def lookup(self, team: str, date, season: Optional[int] = None) -> Optional[dict]:
+        """
+        Clasificación de un equipo antes de los partidos de una fecha.
+
+        Args:
+            team: Nombre del equipo
+            date: Fecha de la consulta (los partidos de ese mismo día no cuentan)
+            season: Año de inicio de la temporada (default: la última que el equipo había
+                empezado en esa fecha)
+
+        Returns:
+            Diccionario con Posición, Puntos, DG, GF y Jugados, o None si el equipo
+            no jugó esa temporada
+        """
+        date = pd.Timestamp(date)
+        if season is None:
+            season = _season_at(self.team_seasons.get(team, []), date)
+        division = self.team_division.get((team, season))
+        if division is None:
+            return None
+        table = self.tables[(division, season)]
+        row = np.searchsorted(table['dates'], date.to_datetime64(), side='left')
+        code = table['codes'][team]
+        return {
+            'División': division,
+            'Posición': int(table['positions'][row, code]),
+            'Puntos': int(table['points'][row, code]),
+            'DG': int(table['goal_diff'][row, code]),
+            'GF': int(table['goals_for'][row, code]),
+            'Jugados': int(table['played'][row, code]),
+        }
+
+    def table_at(self, division: str, date) -> pd.DataFrame:
+        """
+        Clasificación completa de una división antes de los partidos de una fecha.
+
+        Args:
+            division: División ('SP1', 'SP2', ...)
+            date: Fecha de la consulta
+
+        Returns:
+            DataFrame ordenado por posición (vacío si no hay temporada para esa fecha)
+        """
+        date = pd.Timestamp(date)
+        season = _season_at(self.division_seasons.get(division, []), date)
+        table = self.tables.get((division, season))
+        if table is None:
+            return pd.DataFrame()
+        row = np.searchsorted(table['dates'], date.to_datetime64(), side='left')
+        result = pd.DataFrame({
+            'Posición': table['positions'][row],
+            'Equipo': table['teams'],
+            'Jugados': table['played'][row],
+            'Puntos': table['points'][row],
+            'DG': table['goal_diff'][row],
+            'GF': table['goals_for'][row],
+        })
+        return result.sort_values('Posición').reset_index(drop=True)
+
+    def match_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Posición y puntos de local y visitante antes de cada partido (STANDINGS_COLUMNS),
+        con una búsqueda vectorizada por división y temporada.
+
+        Args:
+            df: Partidos (los del índice u otros posteriores de las mismas temporadas)
+
+        Returns:
+            DataFrame con STANDINGS_COLUMNS y el índice de df (NaN si no hay clasificación)
+        """
+        dates = df['Date'].to_numpy()
+        team_ids = [pd.Categorical(df[team_col].astype('object'), categories=self.team_names).codes
+                    for team_col in ('HomeTeam', 'AwayTeam')]
+        result = np.full((len(df), len(STANDINGS_COLUMNS)), np.nan)
+
+        for key, rows in _season_groups(df):
+            table = self.tables.get(key)
+            if table is None:
+                continue
+            date_rows = np.searchsorted(table['dates'], dates[rows], side='left')
+            for side, ids in enumerate(team_ids):
+                ids = ids[rows]
+                local = np.minimum(np.searchsorted(table['team_ids'], ids), len(table['team_ids']) - 1)
+                known = (ids >= 0) & (table['team_ids'][local] == ids)
+                result[rows[known], side] = table['positions'][date_rows[known], local[known]]
+                result[rows[known], 2 + side] = table['points'][date_rows[known], local[known]]
+
+        return pd.DataFrame(result, index=df.index, columns=STANDINGS_COLUMNS)
+
+
+def _season_at(starts: list, date: pd.Timestamp) -> Optional[int]:
+    """Temporada de la lista [(primera fecha, temporada)] que estaba en curso en date."""
+    i = bisect_right([start for start, _ in starts], date.to_datetime64())
+    return starts[i - 1][1] if i else None
+
+
+def _season_groups(df: pd.DataFrame, mask: Optional[np.ndarray] = None):
+    """Filas (posiciones) de cada (división, temporada) de df, opcionalmente filtradas por mask."""
+    division_codes, divisions = pd.factorize(division_of(df).to_numpy())
+    seasons = match_seasons(df)
+    keys = division_codes.astype(np.int64) * 10_000 + seasons
+    if mask is not None:
+        keys = np.where(mask, keys, -1)
+    order = np.argsort(keys, kind='stable')
+    unique_keys, starts = np.unique(keys[order], return_index=True)
+    bounds = np.append(starts, len(order))
+    for i, key in enumerate(unique_keys):
+        if key < 0:
+            continue
+        yield (divisions[key // 10_000], int(key % 10_000)), order[bounds[i]:bounds[i + 1]]
@@ -0,0 +1,123 @@
+"""
+Forma reciente de un equipo para la app
+Funciones puras (sin Streamlit) para poder usarlas fuera de app.py, p. ej. en benchmarks
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Estadística -> (columna si el equipo juega en casa, columna si juega fuera)
+TEAM_STATS = {
+    'gf': ('FTHG', 'FTAG'), 'ga': ('FTAG', 'FTHG'),
+    'sh': ('HS', 'AS'), 'sot': ('HST', 'AST'),
+    'corn': ('HC', 'AC'), 'card': ('HY', 'AY'), 'foul': ('HF', 'AF'),
+}
+
+
+class TeamMatchTable:
+    """
+    Partidos desde el punto de vista de cada equipo: una fila por equipo y partido
+    (dos por partido), ordenadas por equipo y fecha. Para cada equipo se guardan las
+    posiciones de todos sus partidos y de los de casa y fuera, así que la forma de los
+    últimos N es un corte y una media vectorizada en lugar de filtrar el DataFrame entero.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Construye la tabla.
+
+        Args:
+            df: Partidos (Date, HomeTeam, AwayTeam y las columnas de TEAM_STATS)
+        """
+        n_rows = len(df)
+        home = df['HomeTeam'].astype('object').to_numpy()
+        away = df['AwayTeam'].astype('object').to_numpy()
+        teams = np.concatenate([home, away])
+        dates = pd.to_datetime(df['Date']).to_numpy()
+        is_home = np.repeat([True, False], n_rows)
+
+        values = np.column_stack([
+            np.concatenate([df[home_col].to_numpy(dtype='float64'), df[away_col].to_numpy(dtype='float64')])
+            for home_col, away_col in TEAM_STATS.values()
+        ])
+
+        # Orden por equipo y fecha (lexsort es estable: los empates conservan el orden de df)
+        codes, names = pd.factorize(teams)
+        order = np.lexsort((np.concatenate([dates, dates]), codes))
+        order = order[codes[order] >= 0]
+        codes = codes[order]
+
+        self.values = values[order]
+        self.opponents = np.concatenate([away, home])[order]
+        self.dates = pd.DatetimeIndex(np.concatenate([dates, dates])[order])
+        self.is_home = is_home[order]
+        gf, ga = self.values[:, 0], self.values[:, 1]
+        self.results = np.where(gf > ga, '✅', np.where(gf < ga, '❌', '➖'))
+
+        # Equipo -> posiciones de sus partidos por modo de filtro
+        starts = np.searchsorted(codes, np.arange(len(names)), side='left')
+        ends = np.searchsorted(codes, np.arange(len(names)), side='right')
+        self.positions: dict = {}
+        for team, start, end in zip(names, starts, ends):
+            rows = np.arange(start, end)
+            home_rows = self.is_home[start:end]
+            self.positions[team] = {'General': rows, 'Home': rows[home_rows], 'Away': rows[~home_rows]}
+
+    def form(self, team, games: int = 5, filter_mode: str = 'Auto') -> Optional[dict]:
+        """
+        Medias de los últimos partidos de un equipo.
+
+        Args:
+            team: Nombre del equipo
+            games: Número de partidos
+            filter_mode: 'Home' (solo en casa), 'Away' (solo fuera) o cualquier otro valor para todos
+
+        Returns:
+            Diccionario con las medias de TEAM_STATS, 'log' (una línea por partido) y
+            'raw_results' (✅/❌/➖), o None si el equipo no tiene partidos
+        """
+        team_positions = self.positions.get(team)
+        if team_positions is None or games <= 0: return None
+
+        rows = team_positions.get(filter_mode, team_positions['General'])[-games:]
+        if len(rows) == 0: return None
+
+        means = self.values[rows].sum(axis=0) / len(rows)
+        results = self.results[rows].tolist()
+        log = [
+            f"{d_str} {res} {int(gf)}-{int(ga)} vs {opp} {'(C)' if home else '(F)'}"
+            for d_str, res, gf, ga, opp, home in zip(
+                self.dates[rows].strftime("%d/%m"), results, self.values[rows, 0], self.values[rows, 1],
+                self.opponents[rows], self.is_home[rows])
+        ]
+
+        stats = dict(zip(TEAM_STATS, means.tolist()))
+        stats.update({'log': log, 'raw_results': results})
+        return stats
+
+
+# Última tabla construida y el DataFrame del que sale (se reutiliza mientras sea el mismo objeto)
+_TABLE_CACHE: dict = {'df': None, 'table': None}
+
+
+def team_match_table(df: pd.DataFrame) -> TeamMatchTable:
+    """
+    TeamMatchTable de df, construida una sola vez por DataFrame.
+
+    Args:
+        df: Partidos
+
+    Returns:
+        La tabla en caché si df es el mismo objeto de la última llamada, o una nueva
+    """
+    if _TABLE_CACHE['df'] is not df:
+        _TABLE_CACHE['table'] = TeamMatchTable(df)
+        _TABLE_CACHE['df'] = df
+    return _TABLE_CACHE['table']
+
+
+def get_advanced_form(df, team, games=5, filter_mode='Auto'):
+    if df.empty or team is None: return None
+    return team_match_table(df).form(team, games, filter_mode)
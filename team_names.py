@@ -0,0 +1,110 @@
+"""
+Resolución de nombres de equipo entre los partidos (football-data) y los jugadores (FBref)
+Tabla construida una vez al cargar: cada nombre de los partidos apunta a un identificador
+canónico compartido por ambos orígenes y al nombre que usa el fichero de jugadores
+"""
+
+from typing import Iterable, Optional
+
+from player_engine import TEAM_MAP, normalize_name
+
+# Mapeo de player_engine con las claves normalizadas (ya lo están, pero así no depende de ello)
+_PLAYER_MAP = {normalize_name(alias): team for alias, team in TEAM_MAP.items()}
+
+
+class TeamNameResolver:
+    """
+    Nombre de equipo -> identificador canónico (nombre normalizado tras aplicar los alias
+    de la app y TEAM_MAP) y nombre de los partidos -> equipo del fichero de jugadores.
+
+    Cada nombre de los partidos se resuelve al construir: primero por identificador
+    exacto (con y sin los alias) y, si no hay, por palabras completas: todas las palabras
+    del nombre están en las de un único equipo de jugadores ('Sociedad' -> 'Real Sociedad').
+    Nunca al revés, para que 'Real Madrid B' no acabe en 'Real Madrid', ni por trozos de
+    palabra ('Lorca' no es 'Mallorca'). Las consultas son un acceso a diccionario.
+    """
+
+    def __init__(self, match_teams: Iterable, player_teams: Iterable, aliases: Optional[dict] = None):
+        """
+        Construye la tabla.
+
+        Args:
+            match_teams: Nombres de equipo de los partidos (HomeTeam/AwayTeam)
+            player_teams: Nombres de equipo del fichero de jugadores (columna 'team')
+            aliases: Nombre de los partidos -> nombre oficial (TEAM_MAPPING de app.py)
+        """
+        self.aliases = aliases or {}
+        self.player_team_names = list(dict.fromkeys(t for t in player_teams if isinstance(t, str)))
+
+        # Identificador canónico -> primer equipo de jugadores con ese identificador
+        by_id: dict = {}
+        for team in self.player_team_names:
+            by_id.setdefault(self.canonical_id(team), team)
+
+        player_words = {t_id: set(t_id.split()) for t_id in by_id}
+
+        self.team_ids: dict = {}
+        self.player_teams: dict = {}
+        # Nombres resueltos por palabras y no por identificador exacto (ver report)
+        self.word_matches: dict = {}
+        for name in dict.fromkeys(t for t in match_teams if isinstance(t, str)):
+            team_id = self.canonical_id(name)
+            self.team_ids[name] = team_id
+            # El alias puede alargar el nombre ('Oviedo' -> 'Real Oviedo' y FBref usa 'Oviedo')
+            candidates = dict.fromkeys([team_id, self.canonical_id(name, use_aliases=False)])
+            team = next((by_id[c] for c in candidates if c in by_id), None)
+            if team is None:
+                words = [set(c.split()) for c in candidates]
+                found = {by_id[t_id] for t_id, p_words in player_words.items()
+                         if any(w <= p_words for w in words)}
+                if len(found) == 1:
+                    team = found.pop()
+                    self.word_matches[name] = team
+            if team is not None:
+                self.player_teams[name] = team
+
+        self.unresolved = sorted(set(self.team_ids) - set(self.player_teams))
+        matched = set(self.player_teams.values())
+        self.orphan_player_teams = [t for t in self.player_team_names if t not in matched]
+
+    def canonical_id(self, name: str, use_aliases: bool = True) -> str:
+        """
+        Identificador canónico de un nombre de cualquiera de los dos orígenes.
+
+        Args:
+            name: Nombre de equipo
+            use_aliases: Aplicar antes los alias de la app (TEAM_MAPPING)
+
+        Returns:
+            Nombre oficial normalizado (minúsculas y sin tildes)
+        """
+        normalized = normalize_name(self.aliases.get(name, name) if use_aliases else name)
+        return normalize_name(_PLAYER_MAP.get(normalized, normalized))
+
+    def player_team(self, name) -> Optional[str]:
+        """
+        Equipo del fichero de jugadores que corresponde a un nombre de los partidos.
+
+        Args:
+            name: Nombre de equipo de los partidos
+
+        Returns:
+            Nombre en el fichero de jugadores, o None si no tiene datos de jugadores
+        """
+        return self.player_teams.get(name)
+
+    def report(self):
+        """
+        Imprime los nombres resueltos por palabras, los que no tienen datos de jugadores
+        y los equipos de jugadores sin partidos.
+        """
+        if not self.player_team_names:
+            return
+        print(f"✓ Nombres de equipo resueltos: {len(self.player_teams)} de {len(self.team_ids)}")
+        if self.word_matches:
+            print("⚠ Resueltos por palabras (sin alias exacto): "
+                  + ", ".join(f"{name} -> {team}" for name, team in sorted(self.word_matches.items())))
+        if self.unresolved:
+            print(f"⚠ Sin datos de jugadores ({len(self.unresolved)}): {', '.join(self.unresolved)}")
+        if self.orphan_player_teams:
+            print(f"⚠ Equipos de jugadores sin equivalente en los partidos: {', '.join(self.orphan_player_teams)}")
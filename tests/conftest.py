@@ -0,0 +1,44 @@
+"""Configuración de pytest: los módulos del proyecto están en la raíz del repositorio."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def league_matches() -> pd.DataFrame:
+    """
+    Doble vuelta de una liga de seis equipos con estadísticas aleatorias, filas
+    desordenadas y algún tiro nulo (como en los CSV antiguos).
+    """
+    rng = np.random.default_rng(7)
+    teams = ['Alaves', 'Betis', 'Cadiz', 'Getafe', 'Girona', 'Osasuna']
+    rows = []
+    date = pd.Timestamp('2023-08-12')
+    for leg in range(2):
+        # Método del círculo: cinco jornadas por vuelta, cada equipo juega una vez por jornada
+        rotation = teams[1:]
+        for matchday in range(len(teams) - 1):
+            lineup = [teams[0]] + rotation
+            for i in range(len(teams) // 2):
+                home, away = lineup[i], lineup[-1 - i]
+                if (leg + matchday + i) % 2:
+                    home, away = away, home
+                rows.append({'Div': 'SP1', 'Date': date, 'HomeTeam': home, 'AwayTeam': away})
+            rotation = rotation[-1:] + rotation[:-1]
+            date += pd.Timedelta(days=7)
+
+    df = pd.DataFrame(rows)
+    for col in ['FTHG', 'FTAG', 'HY', 'AY']:
+        df[col] = rng.integers(0, 4, len(df)).astype('float64')
+    for col in ['HS', 'AS', 'HST', 'AST', 'HF', 'AF', 'HC', 'AC']:
+        df[col] = rng.integers(0, 20, len(df)).astype('float64')
+    df.loc[[3, 11], 'HS'] = np.nan
+    df['FTR'] = np.where(df['FTHG'] > df['FTAG'], 'H', np.where(df['FTHG'] < df['FTAG'], 'A', 'D'))
+    df['Season'] = 'SP1_2324'
+    return df.sample(frac=1, random_state=3).reset_index(drop=True)
@@ -0,0 +1,35 @@
+"""Backtest walk-forward con partidos repetidos (el CSV de la temporada en curso y su copia por temporada)."""
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from backtester import walk_forward
+
+
+def seasons_of(league_matches: pd.DataFrame, n_seasons: int = 4) -> pd.DataFrame:
+    """La misma liga repetida en temporadas consecutivas, con cuota local y una métrica fija."""
+    frames = []
+    for k in range(n_seasons):
+        season = league_matches.assign(Date=league_matches['Date'] + pd.DateOffset(years=k),
+                                       Season=f"SP1_{23 + k:02d}{24 + k:02d}")
+        frames.append(season)
+    df = pd.concat(frames, ignore_index=True)
+    df['B365H'] = 10.0
+    df['Home_Rolling_Goals'] = 1.0
+    return df
+
+
+def test_duplicated_fixtures_bet_once(league_matches):
+    df = seasons_of(league_matches)
+    last_season = df[df['Season'] == 'SP1_2627']
+    duplicated = pd.concat([df, last_season.assign(Season='SP1')], ignore_index=True)
+
+    params = dict(min_sample_size=1, min_accuracy=0.0, max_workers=1,
+                  metric_thresholds={'Home_Rolling_Goals': [0.0]})
+    expected, expected_detail = walk_forward(df, **params)
+    result, detail = walk_forward(duplicated, **params)
+
+    # Una apuesta a la victoria local por partido de la temporada de test, no dos
+    assert result['Apuestas'].tolist() == [len(league_matches)]
+    assert_frame_equal(result, expected)
+    assert_frame_equal(detail, expected_detail)
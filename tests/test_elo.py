@@ -0,0 +1,25 @@
+"""Ratings Elo con partidos repetidos (el CSV de la temporada en curso y su copia por temporada)."""
+
+import numpy as np
+import pandas as pd
+
+from data_processor import FootballDataProcessor
+from elo import ELO_COLUMNS
+
+
+def test_duplicated_fixtures_count_once(league_matches):
+    # Segunda vuelta repetida en otro archivo, como SP1.csv y SP1_2425.csv
+    second_leg = league_matches[league_matches['Date'] >= league_matches['Date'].sort_values().iloc[15]]
+    duplicated = pd.concat([league_matches, second_leg.assign(Season='SP1')], ignore_index=True)
+
+    processor = FootballDataProcessor(use_cache=False)
+    expected = processor.calculate_elo_ratings(league_matches)
+    expected_state = processor._elo_state
+    result = processor.calculate_elo_ratings(duplicated)
+
+    # Las filas originales no cambian y las copias tienen el mismo rating previo
+    n_rows = len(league_matches)
+    np.testing.assert_array_equal(result[ELO_COLUMNS].to_numpy()[:n_rows], expected[ELO_COLUMNS].to_numpy())
+    np.testing.assert_array_equal(result[ELO_COLUMNS].to_numpy()[n_rows:],
+                                  expected.loc[second_leg.index, ELO_COLUMNS].to_numpy())
+    assert processor._elo_state == expected_state
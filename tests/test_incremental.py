@@ -0,0 +1,68 @@
+"""update_rolling_metrics: añadir partidos a un histórico procesado equivale a procesarlo todo."""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from data_processor import FootballDataProcessor
+from ingestion import MATCH_KEY
+
+ODDS_COLUMNS = ['B365H', 'B365D', 'B365A', 'B365>2.5', 'B365<2.5']
+
+
+def as_csv_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Partidos como vienen en los CSV de football-data (fecha en texto)."""
+    return df.assign(Date=df['Date'].dt.strftime('%d/%m/%Y'))
+
+
+def processed(data_dir, df: pd.DataFrame) -> FootballDataProcessor:
+    """process_all() sobre df guardado como SP1_2324.csv (la columna Season sale del archivo)."""
+    as_csv_rows(df).drop(columns='Season').to_csv(data_dir / 'SP1_2324.csv', index=False)
+    processor = FootballDataProcessor(data_dir=data_dir, use_cache=False, rolling_windows=(3, 10),
+                                      ewma_halflives=(3,), max_workers=1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.process_all()
+    return processor
+
+
+def with_odds(league_matches: pd.DataFrame) -> pd.DataFrame:
+    # Con cuotas propias: sin ellas _ensure_odds_columns las simula al azar
+    rng = np.random.default_rng(11)
+    return league_matches.assign(**{col: np.round(rng.uniform(1.3, 6.0, len(league_matches)), 2)
+                                    for col in ODDS_COLUMNS})
+
+
+def test_update_matches_full_processing(league_matches, tmp_path):
+    df = with_odds(league_matches)
+    (tmp_path / 'full').mkdir()
+    (tmp_path / 'part').mkdir()
+    expected = processed(tmp_path / 'full', df).df
+
+    cutoff = df['Date'].sort_values().iloc[18]
+    processor = processed(tmp_path / 'part', df[df['Date'] < cutoff])
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.update_rolling_metrics(as_csv_rows(df[df['Date'] >= cutoff]))
+
+    assert_frame_equal(processor.df.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_update_with_older_matches_recalculates(league_matches, tmp_path):
+    df = with_odds(league_matches)
+    (tmp_path / 'full').mkdir()
+    (tmp_path / 'part').mkdir()
+    expected = processed(tmp_path / 'full', df).df
+
+    # Partidos de las primeras jornadas que llegan tarde: se recalcula todo
+    late = df.index[:3]
+    processor = processed(tmp_path / 'part', df.drop(index=late))
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.update_rolling_metrics(as_csv_rows(df.loc[late]))
+
+    # Los partidos del mismo día quedan en orden de carga, distinto en cada caso
+    def by_match(frame):
+        return frame.sort_values(MATCH_KEY).reset_index(drop=True)
+
+    assert_frame_equal(by_match(processor.df), by_match(expected))
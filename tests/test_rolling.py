@@ -0,0 +1,39 @@
+"""Motores de calculate_rolling_metrics: el vectorizado debe reproducir al legacy."""
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from data_processor import ROLLING_METRICS, ROLLING_SIDES, FootballDataProcessor
+
+# Métricas que calcula el motor legacy (las cinco originales)
+LEGACY_METRICS = ['Goals', 'Shots', 'ShotsOnTarget', 'Fouls', 'Corners']
+
+
+def rolling_columns(metrics) -> list:
+    return [f'{prefix}_Rolling_{name}' for prefix, _, _ in ROLLING_SIDES for name in metrics]
+
+
+def test_vectorized_matches_legacy(league_matches):
+    processor = FootballDataProcessor(use_cache=False)
+    legacy = processor.calculate_rolling_metrics(league_matches, window=3, engine='legacy')
+    vectorized = processor.calculate_rolling_metrics(league_matches, window=3, engine='vectorized')
+
+    columns = rolling_columns(LEGACY_METRICS)
+    assert_frame_equal(vectorized[columns], legacy[columns])
+
+
+def test_vectorized_matches_grouped_reference(league_matches):
+    # Referencia para todas las métricas (el legacy no calcula tarjetas ni encajados):
+    # media de los `window` partidos anteriores del equipo en el mismo campo
+    processor = FootballDataProcessor(use_cache=False)
+    vectorized = processor.calculate_rolling_metrics(league_matches, window=3, engine='vectorized')
+
+    ordered = league_matches.sort_values('Date', kind='stable')
+    expected = pd.DataFrame(index=league_matches.index)
+    for prefix, team_col, side in ROLLING_SIDES:
+        for name, cols in ROLLING_METRICS.items():
+            expected[f'{prefix}_Rolling_{name}'] = ordered.groupby(team_col)[cols[side]].transform(
+                lambda s: s.shift(1).rolling(3, min_periods=1).mean())
+
+    columns = rolling_columns(ROLLING_METRICS)
+    assert_frame_equal(vectorized[columns], expected[columns])
@@ -0,0 +1,66 @@
+"""Clasificación a fecha alrededor del parón de 2020: la 2019/20 terminó en julio."""
+
+import pandas as pd
+
+from standings import StandingsIndex
+
+
+def double_round_robin(teams: list, dates: list, season: str) -> pd.DataFrame:
+    """Doble vuelta (método del círculo) con una fecha por jornada; gana siempre el local."""
+    rows = []
+    rotation = teams[1:]
+    for leg in range(2):
+        for matchday in range(len(teams) - 1):
+            lineup = [teams[0]] + rotation
+            for i in range(len(teams) // 2):
+                home, away = lineup[i], lineup[-1 - i]
+                if leg:
+                    home, away = away, home
+                rows.append({'Date': dates[leg * (len(teams) - 1) + matchday], 'HomeTeam': home,
+                             'AwayTeam': away, 'FTHG': 1.0, 'FTAG': 0.0})
+            rotation = rotation[-1:] + rotation[:-1]
+    return pd.DataFrame(rows).assign(Div='SP1', Season=season)
+
+
+def covid_seasons() -> pd.DataFrame:
+    # 2019/20: cuatro jornadas antes del parón y las dos últimas en julio de 2020
+    delayed = double_round_robin(['Alaves', 'Betis', 'Cadiz', 'Leganes'],
+                                 pd.to_datetime(['2020-02-01', '2020-02-08', '2020-02-15',
+                                                 '2020-03-07', '2020-07-05', '2020-07-12']),
+                                 'SP1_1920')
+    # 2020/21: desciende Leganes y sube Elche
+    following = double_round_robin(['Alaves', 'Betis', 'Cadiz', 'Elche'],
+                                   pd.date_range('2020-09-13', periods=6, freq='7D'), 'SP1_2021')
+    return pd.concat([delayed, following], ignore_index=True)
+
+
+def test_july_matches_belong_to_previous_season():
+    index = StandingsIndex(covid_seasons())
+
+    assert set(index.tables) == {('SP1', 2019), ('SP1', 2020)}
+    assert index.tables[('SP1', 2019)]['teams'] == ['Alaves', 'Betis', 'Cadiz', 'Leganes']
+    assert index.tables[('SP1', 2020)]['teams'] == ['Alaves', 'Betis', 'Cadiz', 'Elche']
+
+    # Antes de la última jornada de julio: cinco jugados en la 2019/20
+    assert index.lookup('Alaves', '2020-07-12')['Jugados'] == 5
+    assert index.lookup('Leganes', '2020-07-20')['Jugados'] == 6
+    # Ya en la 2020/21, antes de su primer partido
+    assert index.lookup('Alaves', '2020-09-13')['Jugados'] == 0
+
+    table = index.table_at('SP1', '2020-09-30')
+    assert sorted(table['Equipo']) == ['Alaves', 'Betis', 'Cadiz', 'Elche']
+    assert index.table_at('SP1', '2020-07-06')['Jugados'].tolist() == [5, 5, 5, 5]
+
+
+def test_match_columns_use_source_season():
+    df = covid_seasons()
+    index = StandingsIndex(df)
+    columns = index.match_columns(df)
+
+    july = (df['Date'] == '2020-07-12').to_numpy()
+    expected = [index.lookup(team, '2020-07-12', season=2019)['Puntos']
+                for team in df.loc[july, 'HomeTeam']]
+    assert columns.loc[july, 'Home_Table_Points'].tolist() == expected
+
+    opening = (df['Date'] == '2020-09-13').to_numpy()
+    assert (columns.loc[opening, ['Home_Table_Points', 'Away_Table_Points']] == 0).all().all()
@@ -0,0 +1,25 @@
+"""Resolución de nombres de equipo: solo alias exactos o palabras completas de un único equipo."""
+
+from team_names import TeamNameResolver
+
+PLAYER_TEAMS = ['Mallorca', 'Real Madrid', 'Sevilla', 'Real Sociedad', 'Rayo Vallecano', 'Oviedo']
+
+
+def test_fallback_only_on_unique_whole_words():
+    resolver = TeamNameResolver(
+        ['Lorca', 'Real Madrid B', 'Sevilla B', 'Sociedad B', 'Sociedad', 'Vallecano', 'Oviedo', 'Real'],
+        PLAYER_TEAMS, aliases={'Oviedo': 'Real Oviedo'})
+
+    assert resolver.player_team('Sociedad') == 'Real Sociedad'
+    assert resolver.player_team('Vallecano') == 'Rayo Vallecano'
+    assert resolver.player_team('Oviedo') == 'Oviedo'
+    assert resolver.word_matches == {'Sociedad': 'Real Sociedad', 'Vallecano': 'Rayo Vallecano'}
+    # Ni trozos de palabra, ni filiales, ni nombres que encajan en varios equipos
+    assert resolver.unresolved == ['Lorca', 'Real', 'Real Madrid B', 'Sevilla B', 'Sociedad B']
+
+
+def test_report_lists_names(capsys):
+    TeamNameResolver(['Lorca', 'Sociedad'], PLAYER_TEAMS).report()
+    out = capsys.readouterr().out
+    assert 'Sociedad -> Real Sociedad' in out
+    assert 'Lorca' in out